@@ -1,13 +1,20 @@
-from flask import Flask, request, jsonify, send_from_directory
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, g, request, jsonify, send_from_directory
+from flask_socketio import SocketIO, emit, join_room
 from flask_cors import CORS
 import os
+import json
+import atexit
 import webbrowser
 import threading
 import time
 from dotenv import load_dotenv
 from contact_handler import ContactHandler
+from session_pool import SessionPool
 from modules import SimuLockSimulator
+from modules.async_engine import random_scenario
+from modules.sweep import MonteCarloSweep
+from modules.simulator import BankerContext
+from modules.metrics import registry, EMITS, ROUTE_LATENCY
 
 # Load environment variables
 load_dotenv()
@@ -15,13 +22,64 @@ load_dotenv()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'simulock_secret_2024'
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+
+class InstrumentedSocketIO(SocketIO):
+    """SocketIO that counts emits and their JSON payload size per event while metrics are on
+
+    flask_socketio.emit() inside handlers goes through socketio.emit as well.
+    """
+    def emit(self, event, *args, **kwargs):
+        if registry.enabled:
+            EMITS.observe(len(json.dumps(args, default=str)), event)
+        return super().emit(event, *args, **kwargs)
+
+socketio = InstrumentedSocketIO(app, cors_allowed_origins="*", async_mode='threading')
+
+# Prometheus-style metrics are collected once METRICS_ENABLED is set or /metrics is first scraped
+@app.before_request
+def start_request_timer():
+    if registry.enabled:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # the route pattern, not the path, keeps the label set bounded
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        ROUTE_LATENCY.time(started, route, request.method, str(response.status_code))
+    return response
 
 # Initialize contact handler
 contact_handler = ContactHandler()
 
-# Initialize simulator
-sim = SimuLockSimulator()
+# Per-session simulators in a bounded LRU pool. Each session's state deltas and log
+# lines are merged into one emit per window (0 disables coalescing) sent to its room.
+sessions = SessionPool(socketio,
+                       window=float(os.environ.get('BROADCAST_WINDOW_MS', 30)) / 1000,
+                       max_sessions=int(os.environ.get('SESSION_POOL_SIZE', 256)),
+                       idle_ttl=float(os.environ.get('SESSION_IDLE_TTL', 1800)),
+                       max_entities=int(os.environ.get('SESSION_MAX_ENTITIES', 500000)),
+                       # 'objects' (default) or 'table' (columnar arrays, for very large simulations)
+                       backend=os.environ.get('SIMULATOR_BACKEND', 'objects'),
+                       # JOURNAL_DIR makes sessions durable: actions are journaled and replayed on startup
+                       journal_dir=os.environ.get('JOURNAL_DIR') or None,
+                       journal_options={
+                           'snapshot_every': int(os.environ.get('JOURNAL_SNAPSHOT_EVERY', 1000)),
+                           'commit_interval': float(os.environ.get('JOURNAL_COMMIT_MS', 5)) / 1000
+                       })
+socket_sessions = {}  # Socket.IO sid -> session id
+registry.gauge('simulock_sessions', "Sessions held in the session pool", lambda: sessions.stats()['sessions'])
+registry.gauge('simulock_socket_clients', "Connected Socket.IO clients", lambda: len(socket_sessions))
+ENGINE_PROGRESS_SECONDS = float(os.environ.get('ENGINE_PROGRESS_MS', 250)) / 1000
+atexit.register(sessions.close_all)
+if sessions.journal_dir:
+    sessions.get('default')
+
+def current_session():
+    """Session named by the X-Session-Id header or ?session= (the shared 'default' one otherwise)"""
+    session_id = request.headers.get('X-Session-Id') or request.args.get('session') or 'default'
+    return sessions.get(session_id)
 
 class Process:
     def __init__(self, pid, name):
@@ -143,99 +201,223 @@ def serve_static(filename):
 # API Routes
 @app.route('/api/processes', methods=['GET'])
 def get_processes():
-    return jsonify(sim.get_system_state())
+    session = current_session()
+    with session.lock:
+        return jsonify(session.sim.get_system_state())
 
 @app.route('/api/add_process', methods=['POST'])
 def api_add_process():
+    session = current_session()
+    sim = session.sim
     data = request.json
-    name = data.get('name', f'Process {len(sim.processes) + 1}')
-    process = sim.add_process(name)
+    with session.lock:
+        name = data.get('name', f'Process {len(sim.processes) + 1}')
+        process = sim.add_process(name)
+        created = {
+            "pid": process.pid,
+            "name": process.name,
+            "state": process.state,
+            "allocated_resources": list(process.allocated_resources),
+            "requested_resources": list(process.requested_resources)
+        }
     
-    system_state = sim.get_system_state()
-    socketio.emit('system_update', system_state)
-    socketio.emit('log_message', {'message': f'✅ Process {name} created (PID: {process.pid})', 'type': 'success'})
+    session.broadcaster.state_changed()
+    session.broadcaster.log(f'✅ Process {name} created (PID: {process.pid})', 'success')
     
-    return jsonify({"status": "success", "process": {
-        "pid": process.pid,
-        "name": process.name,
-        "state": process.state,
-        "allocated_resources": process.allocated_resources,
-        "requested_resources": process.requested_resources
-    }})
+    return jsonify({"status": "success", "process": created})
 
 @app.route('/api/add_resource', methods=['POST'])
 def api_add_resource():
+    session = current_session()
+    sim = session.sim
     data = request.json
-    name = data.get('name', f'Resource {len(sim.resources) + 1}')
-    resource = sim.add_resource(name)
+    units = data.get('units', 1)
+    if not isinstance(units, int) or units < 1:
+        return jsonify({"status": "error", "message": "units must be a positive integer"}), 400
+    with session.lock:
+        name = data.get('name', f'Resource {len(sim.resources) + 1}')
+        try:
+            resource = sim.add_resource(name, units=units)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        created = sim.resource_state(resource)
     
-    system_state = sim.get_system_state()
-    socketio.emit('system_update', system_state)
-    socketio.emit('log_message', {'message': f'✅ Resource {name} created (RID: {resource.rid})', 'type': 'success'})
+    session.broadcaster.state_changed()
+    session.broadcaster.log(f'✅ Resource {name} created (RID: {resource.rid})', 'success')
     
-    return jsonify({"status": "success", "resource": {
-        "rid": resource.rid,
-        "name": resource.name,
-        "available": resource.available,
-        "held_by": resource.held_by
-    }})
+    return jsonify({"status": "success", "resource": created})
 
 @app.route('/api/request_resource', methods=['POST'])
 def api_request_resource():
+    session = current_session()
+    sim = session.sim
     data = request.json
     process_id = data['process_id']
     resource_id = data['resource_id']
+    count = data.get('count', 1)
+    if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+        return jsonify({"status": "error", "message": "count must be a positive integer"}), 400
     
-    success, message = sim.request_resource(process_id, resource_id)
+    with session.lock:
+        success, message = sim.request_resource(process_id, resource_id, count)
+        analysis = sim.analyze_deadlocks() if sim.has_deadlock() else None
     
-    system_state = sim.get_system_state()
-    socketio.emit('system_update', system_state)
-    socketio.emit('log_message', {'message': message, 'type': 'success' if success else 'warning'})
+    session.broadcaster.state_changed()
+    session.broadcaster.log(message, 'success' if success else 'warning')
+    if analysis is not None:
+        socketio.emit('deadlock_detected', analysis, to=session.session_id)
     
     return jsonify({"status": "success" if success else "waiting", "message": message})
 
 @app.route('/api/release_resource', methods=['POST'])
 def api_release_resource():
+    session = current_session()
+    sim = session.sim
     data = request.json
     process_id = data['process_id']
     resource_id = data['resource_id']
+    count = data.get('count')  # units to return from a multi-unit resource (all by default)
+    if count is not None and (not isinstance(count, int) or isinstance(count, bool) or count < 1):
+        return jsonify({"status": "error", "message": "count must be a positive integer"}), 400
     
-    success, message = sim.release_resource(process_id, resource_id)
+    with session.lock:
+        success, message = sim.release_resource(process_id, resource_id, count)
     
-    system_state = sim.get_system_state()
-    socketio.emit('system_update', system_state)
-    socketio.emit('log_message', {'message': message, 'type': 'success' if success else 'error'})
+    session.broadcaster.state_changed()
+    session.broadcaster.log(message, 'success' if success else 'error')
     
     return jsonify({"status": "success" if success else "error", "message": message})
 
 @app.route('/api/auto_simulate', methods=['POST'])
 def api_auto_simulate():
-    result = sim.auto_simulate_deadlock()
+    session = current_session()
+    with session.lock:
+        result = session.sim.auto_simulate_deadlock()
     
-    system_state = sim.get_system_state()
-    socketio.emit('system_update', system_state)
-    socketio.emit('log_message', {'message': '🤖 Auto simulation: Deadlock scenario created!', 'type': 'info'})
+    session.broadcaster.state_changed()
+    session.broadcaster.log('🤖 Auto simulation: Deadlock scenario created!', 'info')
     
     return jsonify({"status": "success", "message": result['message']})
 
 @app.route('/api/reset', methods=['POST'])
 def api_reset():
-    sim.reset_simulation()
+    session = current_session()
+    with session.lock:
+        session.sim.reset_simulation()
     
-    socketio.emit('system_update', sim.get_system_state())
-    socketio.emit('log_message', {'message': '🔄 Simulation reset', 'type': 'info'})
+    session.broadcaster.state_changed()
+    session.broadcaster.log('🔄 Simulation reset', 'info')
     
     return jsonify({"status": "success"})
 
+@app.route('/api/engine/async', methods=['POST'])
+def api_async_engine():
+    """Run a random scenario on the asyncio engine (virtual time) in the background
+    
+    Progress summaries ('engine_progress', at most one per ENGINE_PROGRESS_SECONDS of
+    real time), deadlocks (as log lines) and the final report ('engine_finished')
+    stream to the session's room.
+    """
+    session = current_session()
+    data = request.json or {}
+    try:
+        engine = random_scenario(processes=int(data.get('processes', 1000)),
+                                 resources=int(data.get('resources', 100)),
+                                 locks=int(data.get('locks', 2)),
+                                 hold=float(data.get('hold', 1.0)),
+                                 spread=float(data.get('spread', 0.0)),
+                                 seed=data.get('seed'),
+                                 watch_interval=float(data.get('watch_interval', 1.0)))
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    until = data.get('until')
+    room = session.session_id
+    last_progress = [0.0]
+    
+    def on_progress(summary):
+        now = time.monotonic()
+        if now - last_progress[0] >= ENGINE_PROGRESS_SECONDS:
+            last_progress[0] = now
+            socketio.emit('engine_progress', summary, to=room)
+    
+    def on_event(action_type, event):
+        if action_type == 'deadlock_detected':
+            session.broadcaster.log(f"💀 Deadlock among {len(event['processes'])} processes at t={event['at']:.1f}s, "
+                                    f"P{event['victim']} rolled back", 'error')
+    
+    def run():
+        report = engine.run_sync(until)
+        socketio.emit('engine_finished', report, to=room)
+        session.broadcaster.log(f"🏁 Async engine: {report['completed']} completed, {report['deadlocks']} deadlocks "
+                                f"in {report['now']:.1f} virtual seconds", 'success')
+    
+    engine.subscribe_progress(on_progress)
+    engine.subscribe(on_event)
+    socketio.start_background_task(run)
+    session.broadcaster.log(f"⚙️ Async engine started with {len(engine.processes)} processes", 'info')
+    return jsonify({"status": "started", "processes": len(engine.processes)})
+
+@app.route('/api/sweep', methods=['POST'])
+def api_sweep():
+    """Estimate deadlock probabilities over a parameter grid on a process pool, in the background
+    
+    Body: grid (parameter -> list of values, see modules.sweep.TRIAL_DEFAULTS), trials
+    per grid point, seed and workers. Partial estimates ('sweep_progress', throttled like
+    engine_progress) and the results ('sweep_finished') stream to the session's room.
+    """
+    session = current_session()
+    data = request.json or {}
+    try:
+        sweep = MonteCarloSweep(data.get('grid', {}),
+                                trials=int(data.get('trials', 1000)),
+                                seed=data.get('seed'),
+                                workers=int(data['workers']) if data.get('workers') else None)
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    room = session.session_id
+    last_progress = [0.0]
+    
+    def on_progress(snapshot):
+        now = time.monotonic()
+        if now - last_progress[0] >= ENGINE_PROGRESS_SECONDS or snapshot['done'] == snapshot['total']:
+            last_progress[0] = now
+            socketio.emit('sweep_progress', snapshot, to=room)
+    
+    def run():
+        results = sweep.run()
+        socketio.emit('sweep_finished', results, to=room)
+        session.broadcaster.log(f"🎲 Sweep finished: {len(sweep.points)} parameter sets x {sweep.trials} trials "
+                                f"in {results['elapsed']:.1f}s (seed {sweep.seed})", 'success')
+    
+    sweep.subscribe(on_progress)
+    socketio.start_background_task(run)
+    session.broadcaster.log(f"🎲 Sweep started: {len(sweep.points)} parameter sets on {sweep.workers} workers", 'info')
+    return jsonify({"status": "started", "points": len(sweep.points), "seed": sweep.seed})
+
 # WebSocket events
 @socketio.on('connect')
 def handle_connect():
     print('Client connected to SimuLock')
-    emit('system_update', sim.get_system_state())
+    session = current_session()
+    socket_sessions[request.sid] = session.session_id
+    join_room(session.session_id)
+    emit('system_update', session.state_feed.snapshot())
     emit('log_message', {'message': '🔗 Connected to SimuLock simulator', 'type': 'info'})
 
+@socketio.on('resync')
+def handle_resync(data):
+    """Client missed a delta: replay what it lacks, or fall back to a full snapshot"""
+    session = sessions.get(socket_sessions.get(request.sid, 'default'))
+    missed = session.state_feed.deltas_since((data or {}).get('seq'))
+    if missed is None:
+        emit('system_update', session.state_feed.snapshot())
+        return
+    for delta in missed:
+        emit('system_delta', delta)
+
 @socketio.on('disconnect')
 def handle_disconnect():
+    socket_sessions.pop(request.sid, None)
     print('Client disconnected')
 
 browser_opened = False
@@ -263,11 +445,44 @@ def api_request():
     mode = data.get('mode', 'banker')
     return jsonify({"granted": True, "reason": "success"})
 
+@app.route('/api/request/batch', methods=['POST'])
+def api_request_batch():
+    data = request.json or {}
+    items = data.get('requests')
+    if not isinstance(items, list):
+        return jsonify({"status": "error", "message": "requests must be a list of {pid, request}"}), 400
+    for index, item in enumerate(items):
+        if not (isinstance(item, dict) and isinstance(item.get('pid'), (int, str)) and not isinstance(item['pid'], bool)
+                and isinstance(item.get('request'), list)
+                and all(isinstance(n, int) and not isinstance(n, bool) and n >= 0 for n in item['request'])):
+            return jsonify({"status": "error", "index": index,
+                            "message": f"requests[{index}] must be {{pid, request: [non-negative integers]}}"}), 400
+    mode = data.get('mode', 'banker')
+    if mode not in BankerContext.MODES:
+        return jsonify({"status": "error", "message": f"mode must be one of {', '.join(BankerContext.MODES)}"}), 400
+    stop_on_denial = bool(data.get('stop_on_denial', False))
+    result = current_session().banker.handle_requests_batch(
+        [(item['pid'], item['request']) for item in items],
+        mode=mode, stop_on_denial=stop_on_denial)
+    if 'error' in result:
+        return jsonify({"status": "error", "index": result['index'],
+                        "message": f"requests[{result['index']}]: {result['error']}"}), 400
+    return jsonify(result)
+
 @app.route('/api/detect', methods=['GET'])
 def api_detect():
-    cycles = sim.detect_deadlocks()
+    session = current_session()
+    with session.lock:
+        cycles = session.sim.detect_deadlocks()
     return jsonify({"cycles": cycles})
 
+@app.route('/api/detect_deadlock', methods=['GET'])
+def api_detect_deadlock():
+    session = current_session()
+    include_graph = request.args.get('graph', '1') != '0'
+    with session.lock:
+        return jsonify(session.sim.analyze_deadlocks(include_graph=include_graph))
+
 @app.route('/api/recover', methods=['POST'])
 def api_recover():
     data = request.json or {}
@@ -284,7 +499,41 @@ def api_set_policy():
 
 @app.route('/api/snapshot', methods=['GET'])
 def api_snapshot():
-    return jsonify(sim.get_system_state())
+    session = current_session()
+    with session.lock:
+        return jsonify(session.sim.get_system_state())
+
+@app.route('/api/sessions', methods=['GET'])
+def api_sessions():
+    return jsonify(sessions.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # the first scrape turns collection on, so it reports from then on
+    registry.enabled = True
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/journal', methods=['GET'])
+def api_journal():
+    journal = current_session().journal
+    if journal is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(journal.status(), enabled=True))
+
+@app.route('/api/journal/replay', methods=['GET'])
+def api_journal_replay():
+    """System state as it was right after journal record ?seq= (the latest by default)"""
+    journal = current_session().journal
+    if journal is None:
+        return jsonify({"status": "error", "message": "journaling is disabled (set JOURNAL_DIR)"}), 404
+    seq = request.args.get('seq', type=int)
+    if seq is not None and (seq < 0 or seq > journal.seq):
+        return jsonify({"status": "error", "message": f"seq must be between 0 and {journal.seq}"}), 400
+    sim = SimuLockSimulator()
+    reached = journal.replay(sim, upto=seq)
+    state = sim.get_system_state()
+    state['seq'] = reached
+    return jsonify(state)
 
 @app.route('/api/banker', methods=['POST'])
 def api_banker():
@@ -292,16 +541,21 @@ def api_banker():
 
 @app.route('/api/locksmith/detect', methods=['POST'])
 def api_locksmith_detect():
-    cycles = sim.detect_deadlocks()
+    session = current_session()
+    with session.lock:
+        cycles = session.sim.detect_deadlocks()
     has_deadlock = cycles.get('has_deadlock', False)
     message = 'Deadlock detected' if has_deadlock else 'No deadlock detected'
-    socketio.emit('log_message', {'message': f'🔍 {message}', 'type': 'error' if has_deadlock else 'success'})
+    session.broadcaster.log(f'🔍 {message}', 'error' if has_deadlock else 'success')
     return jsonify({"status": "success", "has_deadlock": has_deadlock, "deadlocked_processes": []})
 
 @app.route('/api/locksmith/random', methods=['POST'])
 def api_locksmith_random():
-    result = sim.auto_simulate_deadlock()
-    socketio.emit('log_message', {'message': '🎲 Random scenario generated', 'type': 'info'})
+    session = current_session()
+    with session.lock:
+        result = session.sim.auto_simulate_deadlock()
+    session.broadcaster.state_changed()
+    session.broadcaster.log('🎲 Random scenario generated', 'info')
     return jsonify({"status": "success", "state": result})
 
 @app.route('/api/locksmith/configure', methods=['POST'])
@@ -310,7 +564,9 @@ def api_locksmith_configure():
 
 @app.route('/api/locksmith/state', methods=['GET'])
 def api_locksmith_state():
-    state = sim.get_system_state()
+    session = current_session()
+    with session.lock:
+        state = session.sim.get_system_state()
     return jsonify({"status": "success", "state": state})
 @app.route('/api/contact', methods=['POST'])
 def api_contact():
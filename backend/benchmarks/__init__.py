@@ -0,0 +1 @@
+"""Benchmark harnesses, run from backend/ as `python -m benchmarks.<name>`"""
@@ -0,0 +1,328 @@
+"""Microbenchmarks of the core algorithms over a size ladder, with regression tracking
+
+    python -m benchmarks.micro --save                    # measure and store the baseline
+    python -m benchmarks.micro                           # measure and compare with it
+
+Every case is timed at each size of the ladder (processes, 10 up to 100k) on state
+from a seeded synthetic generator. A size is skipped once the time per run, grown
+at the rate measured between the last two sizes, would go over --budget seconds;
+that is what keeps the quadratic paths from stalling the suite. Comparing with the
+baseline flags a case whose time grew by more than --tolerance at some size, or
+whose growth exponent (the log-log slope over the ladder) rose by more than
+--slope-tolerance, which is how a complexity regression shows up even on a slower
+machine. The exit status is 1 when anything regressed.
+"""
+import argparse
+import fnmatch
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from modules.banker import ResourceManager, MatrixResourceManager
+from modules.deadlock_detector import DeadlockDetector
+from modules.simulator import SimuLockSimulator
+
+SIZES = (10, 100, 1000, 10_000, 100_000)
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# operations per run for the cases that time a batch of calls
+BATCH = 100
+# runs faster than this are mostly timer and cache noise and never count as a regression
+NOISE_FLOOR = 1e-3
+
+CASES = {}
+
+
+def case(name, ops=1, fresh=False):
+    """Register setup(n, rng) -> run() as a benchmark case
+
+    ops: calls per run (times are reported per call too); fresh: the run changes the
+    state, so setup is repeated (untimed) before every run.
+    """
+    def register(setup):
+        CASES[name] = {'setup': setup, 'ops': ops, 'fresh': fresh}
+        return setup
+    return register
+
+
+# ---------- Synthetic generators ----------
+def banker_state(n, rng, resources=4, matrix=False, spare=0):
+    """Banker's state with n processes part way through their claims, safe in any order
+
+    Available covers the largest remaining need of every resource type (plus spare),
+    so every process can finish first.
+    """
+    pids = [f"P{k}" for k in range(n)]
+    claims = {pid: [rng.randint(0, 4) for _ in range(resources)] for pid in pids}
+    manager = (MatrixResourceManager if matrix else ResourceManager)([0] * resources, pids, claims)
+    largest_need = [0] * resources
+    for pid in pids:
+        allocation = [rng.randint(0, claim) for claim in claims[pid]]
+        need = [claim - held for claim, held in zip(claims[pid], allocation)]
+        manager.allocation[pid] = allocation
+        manager.need[pid] = need
+        largest_need = [max(a, b) for a, b in zip(largest_need, need)]
+    available = [units + spare for units in largest_need]
+    manager.available[:] = available
+    manager.total = [sum(manager.allocation[pid][i] for pid in pids) + available[i] for i in range(resources)]
+    return manager
+
+
+def wait_chains(n, rng, wait_share=0.5):
+    """Simulator with n processes and n resources: process k holds resource k and
+    every other process (wait_share of them) waits for a random resource
+
+    Each process waits for at most one resource, so the wait-for graph has out-degree
+    one and its cycles are disjoint; their number grows with n instead of exploding,
+    which keeps the cycle-enumeration path comparable across sizes.
+    """
+    sim = SimuLockSimulator(history_capacity=1)
+    for k in range(n):
+        sim.add_process(f"Process {k + 1}")
+        sim.add_resource(f"Resource {k + 1}")
+        sim.request_resource(k + 1, k + 1)
+    for pid in range(1, n + 1):
+        if rng.random() < wait_share:
+            rid = rng.randint(1, n)
+            if rid != pid:
+                sim.request_resource(pid, rid)
+    return sim
+
+
+# ---------- Cases ----------
+@case('banker.is_safe_state')
+def _safe_state(n, rng):
+    return banker_state(n, rng).is_safe_state
+
+
+@case('banker.is_safe_state[matrix]')
+def _safe_state_matrix(n, rng):
+    return banker_state(n, rng, matrix=True).is_safe_state
+
+
+def _grant_batch(manager, rng):
+    # requests of one unit the processes still need, decided against a cached safe sequence
+    requests = []
+    for pid in rng.sample(list(manager.processes), min(BATCH, len(manager.processes))):
+        need = manager.need[pid]
+        req = [0] * manager.m
+        wanted = [i for i in range(manager.m) if need[i] > 0]
+        if wanted:
+            req[rng.choice(wanted)] = 1
+        requests.append((pid, req))
+    manager.is_safe_state()
+
+    def run():
+        for pid, req in requests:
+            manager.request_resources(pid, req)
+    return run
+
+
+@case('banker.request_resources', ops=BATCH, fresh=True)
+def _request(n, rng):
+    return _grant_batch(banker_state(n, rng, spare=BATCH), rng)
+
+
+@case('banker.request_resources[matrix]', ops=BATCH, fresh=True)
+def _request_matrix(n, rng):
+    return _grant_batch(banker_state(n, rng, matrix=True, spare=BATCH), rng)
+
+
+@case('banker.detect_deadlock')
+def _banker_detect(n, rng):
+    return banker_state(n, rng).detect_deadlock
+
+
+@case('banker.find_deadlocked')
+def _banker_find(n, rng):
+    return banker_state(n, rng).find_deadlocked
+
+
+@case('detector.detect_deadlocks[scc]')
+def _detect_scc(n, rng):
+    sim = wait_chains(n, rng)
+    detector = DeadlockDetector()
+    return lambda: detector.detect_deadlocks(sim.processes, sim.resources, mode='scc')
+
+
+@case('detector.detect_deadlocks[cycles]')
+def _detect_cycles(n, rng):
+    sim = wait_chains(n, rng)
+    detector = DeadlockDetector()
+    return lambda: detector.detect_deadlocks(sim.processes, sim.resources, mode='cycles')
+
+
+@case('simulator.request_release', ops=2 * BATCH)
+def _request_release(n, rng):
+    sim = wait_chains(n, rng, wait_share=0.0)
+    # a free resource each to take and give back
+    free = [sim.add_resource(f"Spare {k}").rid for k in range(BATCH)]
+    pids = [rng.randint(1, n) for _ in range(BATCH)]
+
+    def run():
+        for pid, rid in zip(pids, free):
+            sim.request_resource(pid, rid)
+            sim.release_resource(pid, rid)
+    return run
+
+
+@case('simulator.get_system_state')
+def _system_state(n, rng):
+    sim = wait_chains(n, rng)
+    return lambda: json.dumps(sim.get_system_state())
+
+
+# ---------- Measuring ----------
+def measure(name, sizes=SIZES, budget=10.0, repeat=5, seed=0):
+    """Time one case over the size ladder. Returns {size: timing or skip reason}"""
+    spec = CASES[name]
+    results = {}
+    timed = []  # (size, seconds per run) measured so far
+    for n in sizes:
+        if timed:
+            slope = _slope(timed[-2:]) if len(timed) > 1 else 1.0
+            last_n, last = timed[-1]
+            estimate = last * (n / last_n) ** max(slope, 1.0)
+            if estimate > budget:
+                results[n] = {'skipped': f"estimated {estimate:.1f}s per run is over the budget"}
+                continue
+        rng = random.Random(f"{seed}:{name}:{n}")
+        run = spec['setup'](n, rng)
+        times = []
+        while True:
+            started = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - started)
+            # as many runs as fit in the budget, up to `repeat`
+            if len(times) >= repeat or sum(times) + times[-1] > budget:
+                break
+            if spec['fresh']:
+                run = spec['setup'](n, random.Random(f"{seed}:{name}:{n}"))
+        times.sort()
+        median = times[len(times) // 2]
+        results[n] = {'median': median, 'min': times[0], 'runs': len(times), 'per_op': median / spec['ops']}
+        timed.append((n, median))
+    return results
+
+
+def _slope(points):
+    """Least-squares slope of log(time) against log(size)"""
+    if len(points) < 2:
+        return None
+    xs = [math.log(n) for n, _ in points]
+    ys = [math.log(max(t, 1e-9)) for _, t in points]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var if var else None
+
+
+def scaling(results, min_size=1000):
+    """Growth exponent of a case's timings over the sizes >= min_size (about 1 for linear)"""
+    return _slope([(int(n), r['min']) for n, r in results.items()
+                   if 'min' in r and int(n) >= min_size and r['min'] >= NOISE_FLOOR])
+
+
+def run_suite(names, sizes=SIZES, budget=10.0, repeat=5, seed=0, log=None):
+    """Measure every named case; returns the results document (the baseline format)"""
+    cases = {}
+    for name in names:
+        started = time.perf_counter()
+        cases[name] = {'sizes': measure(name, sizes, budget, repeat, seed)}
+        cases[name]['scaling'] = scaling(cases[name]['sizes'])
+        if log:
+            log(f"{name}: {time.perf_counter() - started:.1f}s")
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'seed': seed,
+            'sizes': list(sizes),
+            'budget': budget
+        },
+        'cases': cases
+    }
+
+
+def compare(baseline, current, tolerance=1.5, slope_tolerance=0.3):
+    """Regressions of current against baseline: slower timings and steeper scaling"""
+    regressions = []
+    for name, result in current['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            continue
+        for n, timing in result['sizes'].items():
+            # sizes are ints here and strings once read back from JSON
+            before = base['sizes'].get(n) or base['sizes'].get(str(n)) or {}
+            # the fastest run is the one least disturbed by everything else on the machine
+            if 'min' not in timing or 'min' not in before:
+                continue
+            ratio = timing['min'] / before['min'] if before['min'] else float('inf')
+            if ratio > tolerance and timing['min'] > NOISE_FLOOR:
+                regressions.append({'case': name, 'size': int(n), 'kind': 'time', 'baseline': before['min'],
+                                    'current': timing['min'], 'ratio': ratio})
+        if result['scaling'] is not None and base.get('scaling') is not None:
+            if result['scaling'] - base['scaling'] > slope_tolerance:
+                regressions.append({'case': name, 'kind': 'scaling', 'baseline': base['scaling'],
+                                    'current': result['scaling']})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', nargs='+', default=['*'], help='case names or glob patterns')
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(SIZES))
+    parser.add_argument('--budget', type=float, default=10.0, help='seconds allowed per case and size')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--out', help='also write the results here')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='slowdown ratio that counts as a regression')
+    parser.add_argument('--slope-tolerance', type=float, default=0.3)
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    args = parser.parse_args(argv)
+    if args.list:
+        print('\n'.join(CASES))
+        return 0
+    names = [name for name in CASES if any(fnmatch.fnmatch(name, pattern) for pattern in args.cases)]
+    if not names:
+        parser.error(f"no case matches {args.cases}")
+    results = run_suite(names, args.sizes, args.budget, args.repeat, args.seed,
+                        log=lambda line: print(line, file=sys.stderr))
+    for name in names:
+        row = [f"{n}: {r['per_op'] * 1e6:.1f}us" if 'per_op' in r else f"{n}: skipped"
+               for n, r in results['cases'][name]['sizes'].items()]
+        scaling_text = f"{results['cases'][name]['scaling']:.2f}" if results['cases'][name]['scaling'] is not None else '-'
+        print(f"{name:36} slope {scaling_text:>5}  " + '  '.join(row))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save to create one")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(json.load(f), results, args.tolerance, args.slope_tolerance)
+    for regression in regressions:
+        if regression['kind'] == 'time':
+            print(f"REGRESSION {regression['case']} at {regression['size']}: "
+                  f"{regression['baseline'] * 1e3:.2f}ms -> {regression['current'] * 1e3:.2f}ms "
+                  f"(x{regression['ratio']:.2f})")
+        else:
+            print(f"REGRESSION {regression['case']} scaling: "
+                  f"n^{regression['baseline']:.2f} -> n^{regression['current']:.2f}")
+    if not regressions:
+        print("no regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
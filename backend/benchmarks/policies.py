@@ -0,0 +1,258 @@
+"""Replay one request trace through every admission mode and recovery strategy
+
+    python -m benchmarks.policies --processes 100 --resources 4 --units 20 --seed 1 --out policies.json
+
+Every (mode, strategy) pair gets a fresh BankerContext and the same trace, and the
+results are written as JSON: admitted throughput, denial rate, deadlocks hit,
+recovery cost and per-decision latency percentiles.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import deque
+from modules.simulator import BankerContext
+
+MODES = ('banker', 'prevention', 'direct')
+STRATEGIES = ('terminate_lowest', 'terminate_least_progress', 'preempt_min', 'rollback_checkpoint')
+
+
+def generate_trace(processes=50, resources=4, units=10, max_claim=0.5, steps=3, seed=None):
+    """Random request trace, JSON-serializable so it can be saved and replayed
+
+    Each process P0..Pn-1 claims up to max_claim of the units of each resource type and
+    asks for its claim in up to `steps` partial requests; the requests of all processes
+    are interleaved at random. A process has finished once it got its whole claim.
+    """
+    rng = random.Random(seed)
+    total = [units] * resources
+    limit = max(1, int(units * max_claim))
+    max_claims = {}
+    plans = {}
+    for k in range(processes):
+        pid = f"P{k}"
+        claim = [rng.randint(0, limit) for _ in range(resources)]
+        if not any(claim):
+            claim[rng.randrange(resources)] = 1
+        parts = [[0] * resources for _ in range(steps)]
+        for i, amount in enumerate(claim):
+            for _ in range(amount):
+                parts[rng.randrange(steps)][i] += 1
+        max_claims[pid] = claim
+        plans[pid] = deque(part for part in parts if any(part))
+    requests = []
+    pending = [pid for pid in plans]
+    while pending:
+        pid = pending[rng.randrange(len(pending))]
+        requests.append([pid, plans[pid].popleft()])
+        if not plans[pid]:
+            pending.remove(pid)
+    return {'seed': seed, 'total': total, 'max_claims': max_claims, 'requests': requests}
+
+
+def percentiles(samples):
+    """p50/p95/p99/max/mean of samples (nearest rank)"""
+    if not samples:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0, 'mean': 0.0}
+    ordered = sorted(samples)
+    rank = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+    return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99), 'max': ordered[-1],
+            'mean': sum(ordered) / len(ordered)}
+
+
+class Replay:
+    """One run of a trace under an admission mode and a recovery strategy
+
+    Requests are issued in trace order and each process's requests are served in
+    order. A request that is not granted leaves its process blocked; blocked processes
+    retry whenever units come back (a process finishing, or recovery). Policy
+    violations in prevention mode are final: the process is dropped. Deadlocks are
+    looked for (detection algorithm) each time a process starts waiting and at the end
+    of the trace, and are recovered with the strategy; when recovery stops letting processes
+    finish, the processes still blocked are reported as stalled.
+    """
+
+    def __init__(self, trace, mode, strategy, prevention_policy='resource_ordering', matrix=False,
+                 max_idle_recoveries=10):
+        self.trace = trace
+        self.mode = mode
+        self.strategy = strategy
+        self.max_idle_recoveries = max_idle_recoveries
+        self.context = BankerContext()
+        self.context.init_from_config(trace['total'], list(trace['max_claims']), trace['max_claims'], matrix)
+        if mode == 'prevention':
+            self.context.set_prevention_policy(prevention_policy)
+        self.manager = self.context.resource_manager
+        self.queues = {pid: deque() for pid in trace['max_claims']}
+        self.blocked = {}  # pid -> None, in blocking order
+        self.gone = set()
+        self.latencies = []
+        self.recovery_latencies = []
+        self.last_deadlock = None
+        self.stats = {'decisions': 0, 'granted': 0, 'denied': 0, 'policy_rejections': 0, 'completed': 0,
+                      'deadlocks': 0, 'recoveries': 0, 'processes_killed': 0, 'units_preempted': 0,
+                      'units_lost': 0, 'dropped_requests': 0, 'stalled': 0}
+
+    def run(self):
+        # strategies that pick a victim at random draw from the module-level generator
+        random.seed(self.trace['seed'])
+        started = time.perf_counter()
+        for pid, req in self.trace['requests']:
+            if pid in self.gone:
+                self.stats['dropped_requests'] += 1
+                continue
+            self.queues[pid].append(req)
+            if pid not in self.blocked and len(self.queues[pid]) == 1 and self._serve(pid):
+                self._retry_blocked()
+        # recover what is left until max_idle_recoveries rounds in a row let no process
+        # finish (partial preemption can just hand the units back into the same deadlock)
+        idle = 0
+        while self.blocked and idle < self.max_idle_recoveries:
+            gone = len(self.gone)
+            if self._recover(repeat=True):
+                self._retry_blocked()
+            idle = 0 if len(self.gone) > gone else idle + 1
+        self.stats['stalled'] = len(self.blocked)
+        elapsed = time.perf_counter() - started
+        decisions = self.stats['decisions']
+        return dict(self.stats,
+                    mode=self.mode,
+                    strategy=self.strategy,
+                    elapsed=elapsed,
+                    admitted_per_second=self.stats['granted'] / elapsed if elapsed else 0.0,
+                    denial_rate=self.stats['denied'] / decisions if decisions else 0.0,
+                    decision_latency_us=percentiles(self.latencies),
+                    recovery_latency_us=percentiles(self.recovery_latencies))
+
+    def _serve(self, pid):
+        """Put pid's queued requests to the context until one is not granted
+
+        Returns whether units came back (pid finished or was dropped, or recovery freed
+        some), in which case the blocked processes are worth retrying.
+        """
+        queue = self.queues[pid]
+        while queue:
+            started = time.perf_counter_ns()
+            granted, reason = self.context.handle_request(pid, queue[0], self.mode)
+            self.latencies.append((time.perf_counter_ns() - started) / 1000)
+            self.stats['decisions'] += 1
+            if not granted:
+                self.stats['denied'] += 1
+                if reason.startswith('policy'):
+                    self.stats['policy_rejections'] += 1
+                    self._drop(pid)
+                    return True
+                if pid in self.blocked:
+                    return False
+                # only a new wait can close a deadlock; a retry that fails again changes nothing
+                self.blocked[pid] = None
+                return self._recover()
+            self.stats['granted'] += 1
+            queue.popleft()
+            self.blocked.pop(pid, None)
+        if any(self.manager.need[pid]):
+            return False
+        # finished: terminating it hands its units back
+        self.manager.terminate_victim(pid)
+        self.gone.add(pid)
+        self.stats['completed'] += 1
+        return True
+
+    def _retry_blocked(self):
+        progress = True
+        while progress and self.blocked:
+            progress = False
+            for pid in list(self.blocked):
+                if pid in self.blocked:
+                    freed = self._serve(pid)
+                    progress = progress or freed or pid not in self.blocked
+
+    def _drop(self, pid):
+        """Remove pid for good (policy violation or killed), giving back what it holds"""
+        self.manager.terminate_victim(pid)  # a no-op if recovery already terminated it
+        self.gone.add(pid)
+        self.blocked.pop(pid, None)
+        self.stats['dropped_requests'] += len(self.queues[pid])
+        self.queues[pid].clear()
+
+    def _recover(self, repeat=False):
+        """Detect a deadlock and recover it once. Returns whether any units were freed"""
+        started = time.perf_counter_ns()
+        deadlocked = self.manager.find_deadlocked()
+        if not deadlocked:
+            return False
+        if set(deadlocked) == self.last_deadlock:
+            # the last recovery did not break it; trying again at once could just move units
+            # back and forth, so only the end-of-trace loop (which has a bound) retries
+            if not repeat:
+                return False
+        else:
+            self.stats['deadlocks'] += 1
+            self.last_deadlock = set(deadlocked)
+        held = {pid: list(self.manager.allocation[pid]) for pid in deadlocked}
+        self.context.recover_deadlock(self.strategy, deadlocked_set=deadlocked)
+        self.recovery_latencies.append((time.perf_counter_ns() - started) / 1000)
+        self.stats['recoveries'] += 1
+        freed = False
+        for pid, before in held.items():
+            if pid not in self.manager.processes:
+                self.stats['processes_killed'] += 1
+                self.stats['units_lost'] += sum(before)
+                freed = freed or any(before)
+                self._drop(pid)
+                continue
+            taken = [b - a for b, a in zip(before, self.manager.allocation[pid])]
+            if any(taken):
+                # the process has to get those units back before it goes on
+                self.queues[pid].appendleft(taken)
+                self.stats['units_preempted'] += sum(taken)
+                freed = True
+        return freed
+
+
+def compare(trace, modes=MODES, strategies=STRATEGIES, **options):
+    """Replay trace for every (mode, strategy) pair; options go to Replay"""
+    return {
+        'trace': {'seed': trace['seed'], 'processes': len(trace['max_claims']), 'total': trace['total'],
+                  'requests': len(trace['requests'])},
+        'results': [Replay(trace, mode, strategy, **options).run() for mode in modes for strategy in strategies]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=50)
+    parser.add_argument('--resources', type=int, default=4)
+    parser.add_argument('--units', type=int, default=10)
+    parser.add_argument('--max-claim', type=float, default=0.5, help='largest claim as a share of the units')
+    parser.add_argument('--steps', type=int, default=3, help='requests per process')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--strategies', nargs='+', default=list(STRATEGIES), choices=STRATEGIES)
+    parser.add_argument('--prevention-policy', default='resource_ordering')
+    parser.add_argument('--matrix', action='store_true', help='use MatrixResourceManager')
+    parser.add_argument('--trace', help='replay a trace saved with --save-trace instead of generating one')
+    parser.add_argument('--save-trace', help='write the trace used to this file')
+    parser.add_argument('--out', help='write the results here instead of stdout')
+    args = parser.parse_args(argv)
+    if args.trace:
+        with open(args.trace) as f:
+            trace = json.load(f)
+    else:
+        trace = generate_trace(args.processes, args.resources, args.units, args.max_claim, args.steps, args.seed)
+    if args.save_trace:
+        with open(args.save_trace, 'w') as f:
+            json.dump(trace, f)
+    results = compare(trace, args.modes, args.strategies, prevention_policy=args.prevention_policy,
+                      matrix=args.matrix)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
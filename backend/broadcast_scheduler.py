@@ -0,0 +1,67 @@
+from threading import Lock
+
+class BroadcastScheduler:
+    """Coalesces Socket.IO broadcasts into at most one flush per window
+
+    Routes mark the state as changed and queue log lines; the first mark in a window
+    starts a background task that sleeps for the window and then emits a single
+    'system_delta' (the state feed already merges every change made meanwhile) and a
+    single 'log_messages' array. Emit volume is thereby capped at one of each per
+    window however fast the simulator is mutated. With a room set, flushes go only
+    to that room's clients.
+    """
+
+    def __init__(self, socketio, state_feed, window=0.03, room=None):
+        self.socketio = socketio
+        self.state_feed = state_feed
+        self.window = window
+        self.room = room
+        self.lock = Lock()
+        self.pending_logs = []
+        self.state_dirty = False
+        self.scheduled = False
+        self.stats = {'requested': 0, 'flushes': 0, 'deltas_sent': 0, 'logs_sent': 0}
+
+    def state_changed(self):
+        """Queue a system_delta for the next flush"""
+        with self.lock:
+            self.state_dirty = True
+            self.stats['requested'] += 1
+        self._schedule()
+
+    def log(self, message, log_type='info'):
+        """Queue a log line for the next flush"""
+        with self.lock:
+            self.pending_logs.append({'message': message, 'type': log_type})
+            self.stats['requested'] += 1
+        self._schedule()
+
+    def _schedule(self):
+        if self.window <= 0:
+            self.flush()
+            return
+        with self.lock:
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        self.socketio.sleep(self.window)
+        self.flush()
+
+    def flush(self):
+        """Emit everything queued since the last flush"""
+        with self.lock:
+            logs, self.pending_logs = self.pending_logs, []
+            state_dirty, self.state_dirty = self.state_dirty, False
+            self.scheduled = False
+            self.stats['flushes'] += 1
+        if state_dirty:
+            delta = self.state_feed.next_delta()
+            if delta is not None:
+                self.socketio.emit('system_delta', delta, to=self.room)
+                self.stats['deltas_sent'] += 1
+        if logs:
+            self.socketio.emit('log_messages', logs, to=self.room)
+            self.stats['logs_sent'] += len(logs)
@@ -1,5 +1,13 @@
+from .async_engine import AsyncEngine
 from .deadlock_detector import DeadlockDetector
-from .process import Process
-from .resource import Resource
-from .semaphore import BinarySemaphore
-from .simulator import SimuLockSimulator
\ No newline at end of file
+from .event_kernel import EventKernel, Workload
+from .event_log import EventLog
+from .journal import Journal
+from .online_detector import OnlineDeadlockDetector
+from .process import Process, CompactProcess
+from .resource import Resource, CompactResource, CountingResource
+from .semaphore import BinarySemaphore, CompactBinarySemaphore, CountingSemaphore
+from .simulator import SimuLockSimulator
+from .sweep import MonteCarloSweep
+from .threaded_engine import ThreadedEngine
+from .wait_queue import WaitQueue, PriorityWaitQueue, AgingWaitQueue, create_wait_queue
\ No newline at end of file
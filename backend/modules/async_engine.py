@@ -0,0 +1,387 @@
+import asyncio
+import heapq
+import random
+from collections import deque
+from .deadlock_detector import DeadlockDetector
+from .semaphore import SemaphoreManager
+from .threaded_engine import check_program
+
+
+class VirtualClock:
+    """Simulated time for coroutines
+
+    sleep(delay) returns a future that completes when the clock is advanced past
+    now + delay. Nothing waits in real time: the engine advances the clock to the
+    next deadline once every coroutine is blocked, so simulated hours of holding
+    cost only the scheduling work.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.timers = []  # heap of (deadline, seq, future)
+        self.seq = 0
+
+    def sleep(self, delay):
+        future = asyncio.get_running_loop().create_future()
+        self.seq += 1
+        heapq.heappush(self.timers, (self.now + max(0.0, delay), self.seq, future))
+        return future
+
+    def next_deadline(self):
+        return self.timers[0][0] if self.timers else None
+
+    def advance(self, to):
+        """Move the clock to `to` and wake every sleeper due by then"""
+        self.now = to
+        while self.timers and self.timers[0][0] <= to:
+            future = heapq.heappop(self.timers)[2]
+            if not future.done():  # a cancelled sleeper's future is already done
+                future.set_result(None)
+
+
+class AsyncUnitSemaphore:
+    """asyncio semaphore whose acquire(count) takes count units at once
+
+    asyncio.Semaphore only takes one unit per call. Waiters are served strictly in
+    order, like asyncio.Semaphore, so a large request is never overtaken for good by
+    small ones and a release only looks at the head of the queue.
+    """
+
+    def __init__(self, units, free=None):
+        self.units = units
+        self.free = units if free is None else free
+        self.waiters = deque()  # (count, future)
+
+    def locked(self, count=1):
+        """Whether acquire(count) would have to wait"""
+        return self.free < count or bool(self.waiters)
+
+    async def acquire(self, count=1):
+        if not self.locked(count):
+            self.free -= count
+            return True
+        future = asyncio.get_running_loop().create_future()
+        entry = (count, future)
+        self.waiters.append(entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(count)  # granted just before the cancel landed
+            else:
+                self.waiters.remove(entry)
+                self._wake()
+            raise
+        return True
+
+    def release(self, count=1):
+        self.free += count
+        self._wake()
+
+    def _wake(self):
+        waiters = self.waiters
+        while waiters and waiters[0][0] <= self.free:
+            count, future = waiters.popleft()
+            self.free -= count
+            future.set_result(True)
+
+
+class AsyncProcess:
+    """A simulated process run as a coroutine"""
+
+    __slots__ = ('pid', 'name', 'program', 'priority', 'start', 'state', 'held', 'task', 'aborting',
+                 'restarts', 'acquisitions', 'wait_time', 'finished_at')
+
+    def __init__(self, pid, name, program, priority=1, start=0.0):
+        self.pid = pid
+        self.name = name
+        self.program = program
+        self.priority = priority
+        self.start = start  # virtual time the process arrives at
+        self.state = 'ready'
+        self.held = {}  # rid -> units held right now
+        self.task = None
+        self.aborting = False
+        self.restarts = 0
+        self.acquisitions = 0
+        self.wait_time = 0.0  # virtual seconds spent waiting for units
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'pid': self.pid,
+            'name': self.name,
+            'state': self.state,
+            'priority': self.priority,
+            'held': dict(self.held),
+            'restarts': self.restarts,
+            'acquisitions': self.acquisitions,
+            'wait_time': self.wait_time
+        }
+
+
+def random_program(rng, rids, locks=2, hold=1.0):
+    """Acquire `locks` random resources one after another (holding each a while), then release them all"""
+    program = []
+    for rid in rng.sample(list(rids), min(locks, len(rids))):
+        program.append(('acquire', rid))
+        program.append(('hold', rng.expovariate(1 / hold)))
+    for step in reversed(program[::2]):
+        program.append(('release', step[1]))
+    return program
+
+
+def random_scenario(processes=1000, resources=100, locks=2, hold=1.0, spread=0.0, seed=None, **options):
+    """AsyncEngine over `resources` binary semaphores with `processes` random_program processes
+
+    Arrivals are spread uniformly over the first `spread` virtual seconds. Other keyword
+    arguments go to AsyncEngine.
+    """
+    manager = SemaphoreManager(compact=True)
+    for rid in range(1, resources + 1):
+        manager.create_semaphore(rid)
+    engine = AsyncEngine(manager, **options)
+    rng = random.Random(seed)
+    engine.rng = rng
+    rids = range(1, resources + 1)
+    for i in range(processes):
+        engine.add_process(f"Process {i + 1}", random_program(rng, rids, locks, hold), start=rng.uniform(0, spread))
+    return engine
+
+
+class AsyncEngine:
+    """Runs scripted processes as asyncio coroutines in virtual time
+
+    The asyncio counterpart of ThreadedEngine, cheap enough for 100k+ processes.
+    Binary semaphores of the SemaphoreManager become asyncio.Semaphore objects and
+    counting ones AsyncUnitSemaphore; each process is a task running its step program
+    (see check_program), where hold sleeps on the VirtualClock.
+
+    The watchdog task drives the clock: whenever no process can move, it advances
+    time to the next deadline, and every watch_interval virtual seconds it runs
+    incremental deadlock detection on the wait-for graph the processes keep up to
+    date. Each deadlock loses one victim (lowest priority, newest among equals), which
+    is cancelled, drops what it holds, backs off and restarts, up to max_restarts
+    times. subscribe() listeners get every event (deadlock_detected included), progress
+    listeners a summary after each check.
+    """
+
+    def __init__(self, semaphore_manager, watch_interval=1.0, max_restarts=3, restart_backoff=1.0):
+        self.watch_interval = watch_interval
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.manager = semaphore_manager
+        self.semaphores = {}
+        self.units = {}
+        self.processes = []
+        self.process_index = {}
+        self.next_pid = 1
+        self.listeners = []
+        self.progress_listeners = []
+        self.detector = DeadlockDetector()
+        self.clock = VirtualClock()
+        self.rng = random.Random()
+        # bumped by every step a process takes; unchanged over a full loop pass means all are blocked
+        self.progress = 0
+        self.alive = 0
+        self.stats = {'completed': 0, 'aborted': 0, 'restarts': 0, 'deadlocks': 0,
+                      'acquisitions': 0, 'checks': 0, 'stalled': False}
+        self.deadlocks = []
+        self.subscribe(self.detector.handle_event)
+        for rid, semaphore in semaphore_manager.semaphores.items():
+            self.units[rid] = getattr(semaphore, 'units', 1)
+            self.record_action('resource_created', {'rid': rid, 'name': f"R{rid}", 'units': self.units[rid]})
+
+    def add_process(self, name, program, priority=1, start=0.0):
+        """Register a process running program (see check_program) from virtual time start on"""
+        process = AsyncProcess(self.next_pid, name, check_program(program, self.units), priority, start)
+        self.processes.append(process)
+        self.process_index[process.pid] = process
+        self.next_pid += 1
+        self.record_action('process_created', {'pid': process.pid, 'name': name, 'priority': priority})
+        return process
+
+    def record_action(self, action_type, data):
+        for listener in self.listeners:
+            listener(action_type, data)
+
+    def subscribe(self, listener):
+        """Register listener(action_type, data) for every engine event"""
+        self.listeners.append(listener)
+
+    def subscribe_progress(self, listener):
+        """Register listener(summary) called after every watchdog check"""
+        self.progress_listeners.append(listener)
+
+    async def run(self, until=None):
+        """Run every process to completion, or until virtual time `until`, and return the report"""
+        # asyncio primitives bind to the running loop, so they are made here
+        for rid, semaphore in self.manager.semaphores.items():
+            if self.units[rid] > 1:
+                self.semaphores[rid] = AsyncUnitSemaphore(self.units[rid], semaphore.value)
+            else:
+                self.semaphores[rid] = asyncio.Semaphore(semaphore.value)
+        ready = [p for p in self.processes if p.state == 'ready']
+        self.alive = len(ready)
+        for process in ready:
+            process.task = asyncio.create_task(self._run_process(process))
+        await asyncio.create_task(self._watchdog(until))
+        leftover = [p.task for p in ready if not p.task.done()]
+        for task in leftover:
+            task.cancel()
+        await asyncio.gather(*leftover, return_exceptions=True)
+        return self.report()
+
+    def run_sync(self, until=None):
+        """run() on a fresh event loop"""
+        return asyncio.run(self.run(until))
+
+    def summary(self):
+        return dict(self.stats,
+                    now=self.clock.now,
+                    alive=self.alive,
+                    waiting=len(self.detector.waiting))
+
+    def report(self):
+        """Throughput, deadlock and wait figures of the run (rates per virtual second)"""
+        elapsed = self.clock.now
+        return dict(self.summary(),
+                    throughput=self.stats['completed'] / elapsed if elapsed else 0.0,
+                    deadlock_rate=self.stats['deadlocks'] / elapsed if elapsed else 0.0,
+                    mean_wait=sum(p.wait_time for p in self.processes) / len(self.processes) if self.processes else 0.0,
+                    deadlock_samples=self.deadlocks[:20])
+
+    async def _watchdog(self, until):
+        """Advance the clock whenever every process is blocked, checking for deadlocks on the way"""
+        next_check = self.clock.now + self.watch_interval
+        while self.alive:
+            seen = self.progress
+            await asyncio.sleep(0)
+            if self.progress != seen:
+                continue
+            # every live process waits for a semaphore or for the clock
+            deadline = self.clock.next_deadline()
+            if deadline is None or deadline >= next_check:
+                if until is not None and next_check > until:
+                    break
+                self.clock.advance(next_check)
+                next_check += self.watch_interval
+                if not self._check() and deadline is None:
+                    # nothing will ever wake anyone
+                    self.stats['stalled'] = True
+                    break
+            else:
+                if until is not None and deadline > until:
+                    break
+                self.clock.advance(deadline)
+            self.progress += 1
+        if until is not None and self.clock.now < until and self.alive:
+            self.clock.advance(until)
+
+    def _check(self):
+        """Run detection and cancel one victim per new deadlock. Returns whether any was found"""
+        self.stats['checks'] += 1
+        found = False
+        result = self.detector.detect_incremental(include_graph=False)
+        for deadlock in result['deadlocks']:
+            members = [self.process_index[pid] for pid in deadlock['processes_involved']]
+            if any(p.aborting for p in members):
+                continue  # already being broken
+            victim = min(members, key=lambda p: (p.priority, -p.pid))
+            victim.aborting = True
+            victim.task.cancel()
+            found = True
+            self.stats['deadlocks'] += 1
+            deadlock = {'processes': sorted(p.pid for p in members), 'victim': victim.pid, 'at': self.clock.now}
+            self.deadlocks.append(deadlock)
+            self.record_action('deadlock_detected', deadlock)
+        for listener in self.progress_listeners:
+            listener(self.summary())
+        return found
+
+    async def _run_process(self, process):
+        """Task body: run the program, starting over after each abort"""
+        try:
+            if process.start > self.clock.now:
+                await self.clock.sleep(process.start - self.clock.now)
+            while True:
+                process.state = 'running'
+                try:
+                    await self._run_program(process)
+                except asyncio.CancelledError:
+                    if not process.aborting:
+                        process.state = 'stopped'
+                        raise
+                    self._release_all(process)
+                else:
+                    process.state = 'completed'
+                    process.finished_at = self.clock.now
+                    self.stats['completed'] += 1
+                    return
+                process.aborting = False
+                if process.restarts >= self.max_restarts:
+                    process.state = 'aborted'
+                    self.stats['aborted'] += 1
+                    return
+                process.restarts += 1
+                self.stats['restarts'] += 1
+                process.state = 'backing_off'
+                self.progress += 1
+                await self.clock.sleep(self.restart_backoff * 2 ** process.restarts * self.rng.uniform(0.5, 1.5))
+        finally:
+            self.alive -= 1
+            self.progress += 1
+
+    async def _run_program(self, process):
+        for step in process.program:
+            self.progress += 1
+            kind = step[0]
+            if kind == 'hold':
+                await self.clock.sleep(step[1])
+            elif kind == 'acquire':
+                await self._acquire(process, step[1], step[2] if len(step) > 2 else 1)
+            else:
+                self._release(process, step[1], step[2] if len(step) > 2 else 1)
+
+    async def _acquire(self, process, rid, count):
+        semaphore = self.semaphores[rid]
+        data = {'pid': process.pid, 'rid': rid, 'count': count}
+        waited = semaphore.locked(count) if count > 1 else semaphore.locked()
+        if waited:
+            process.state = 'waiting'
+            self.record_action('resource_waiting', dict(data, success=False))
+        since = self.clock.now
+        try:
+            if count > 1:
+                await semaphore.acquire(count)
+            else:
+                await semaphore.acquire()
+        except asyncio.CancelledError:
+            process.wait_time += self.clock.now - since
+            if waited:
+                self.record_action('request_withdrawn', data)
+            raise
+        self.progress += 1
+        if waited:
+            process.wait_time += self.clock.now - since
+            process.state = 'running'
+        process.held[rid] = process.held.get(rid, 0) + count
+        process.acquisitions += 1
+        self.stats['acquisitions'] += 1
+        self.record_action('resource_allocated', dict(data, success=True))
+
+    def _release(self, process, rid, count):
+        process.held[rid] -= count
+        if not process.held[rid]:
+            del process.held[rid]
+        self.record_action('resource_released', {'pid': process.pid, 'rid': rid, 'count': count})
+        semaphore = self.semaphores[rid]
+        if count > 1:
+            semaphore.release(count)
+        else:
+            semaphore.release()
+        self.progress += 1
+
+    def _release_all(self, process):
+        for rid, count in list(process.held.items()):
+            self._release(process, rid, count)
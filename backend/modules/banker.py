@@ -4,19 +4,31 @@ File: banker.py
 
 Features:
   - ResourceManager: Banker's avoidance (safety check + request handling)
+  - Incremental safety: the last safe sequence is cached and only the part of it a
+    grant can affect is revalidated; the full fixpoint runs only when that fails
+  - MatrixResourceManager: same API backed by contiguous NumPy matrices (needs numpy)
   - Deadlock detection via wait-for graph (cycle detection)
+  - Deadlock detection algorithm on Request/Allocation/Available (exact for multi-unit resources)
   - Recovery strategies: terminate victim, preempt resources, rollback to checkpoint
   - PreventionManager: prevention policies (resource ordering, no-hold-and-wait, direct allocation)
 """
 from copy import deepcopy
 import random
+import time
+from .metrics import registry, SAFETY_ITERATIONS, SAFETY_FAST_PATH, CYCLE_SEARCH
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for MatrixResourceManager
+    np = None
 
 class ResourceManager:
-    def __init__(self, total_resources, process_ids, max_claims):
+    def __init__(self, total_resources, process_ids, max_claims, incremental=True):
         """
         total_resources: list[int]      - total units per resource type
         process_ids: list[hashable]     - process identifiers
         max_claims: dict pid -> list[int] - maximum claim per process per resource
+        incremental: bool               - reuse the last safe sequence when checking grants
         """
         self.total = list(total_resources)
         self.m = len(total_resources)
@@ -27,16 +39,26 @@ class ResourceManager:
         self.max = {pid: list(max_claims[pid]) for pid in process_ids}
         self.allocation = {pid: [0]*self.m for pid in process_ids}
         self.need = {pid: [self.max[pid][i] - self.allocation[pid][i] for i in range(self.m)] for pid in process_ids}
+        # outstanding request a process is blocked on (zero while it is not waiting)
+        self.request = {pid: [0]*self.m for pid in process_ids}
 
         # simple checkpoints for rollback demonstration
         self.checkpoints = {pid: [] for pid in process_ids}
 
+        # incremental safety engine: last known safe sequence + pid -> position in it
+        self.incremental = incremental
+        self._safe_seq = None
+        self._safe_pos = {}
+        self.fast_path_hits = 0
+        self.full_safety_checks = 0
+
     def snapshot(self):
         """Return deep copy of manager state (for debugging/testing)."""
         return {
             'available': list(self.available),
             'allocation': deepcopy(self.allocation),
-            'need': deepcopy(self.need)
+            'need': deepcopy(self.need),
+            'request': deepcopy(self.request)
         }
 
     def take_checkpoint(self, pid):
@@ -61,16 +83,20 @@ class ResourceManager:
             self.available[i] += diff[i]
         self.allocation[pid] = alloc
         self.need[pid] = need
+        self._invalidate_safe_sequence()
         return True
 
     def is_safe_state(self):
         """Run safety algorithm to see if system is in safe state. Returns (True, seq) or (False, None)"""
+        self.full_safety_checks += 1
         work = list(self.available)
         finish = {pid: False for pid in self.processes}
         seq = []
+        passes = 0
         changed = True
         while changed:
             changed = False
+            passes += 1
             for pid in self.processes:
                 if not finish[pid]:
                     if all(self.need[pid][i] <= work[i] for i in range(self.m)):
@@ -80,20 +106,92 @@ class ResourceManager:
                         finish[pid] = True
                         seq.append(pid)
                         changed = True
+        if registry.enabled:
+            SAFETY_ITERATIONS.observe(passes)
         if all(finish.values()):
+            self._remember_safe_sequence(seq)
             return True, seq
+        self._invalidate_safe_sequence()
         return False, None
 
+    # ---------- Incremental safety engine ----------
+    def _remember_safe_sequence(self, seq):
+        self._safe_seq = list(seq)
+        self._safe_pos = {pid: k for k, pid in enumerate(self._safe_seq)}
+
+    def _invalidate_safe_sequence(self):
+        """Drop the cached safe sequence after a change it cannot be proven to survive."""
+        self._safe_seq = None
+        self._safe_pos = {}
+
+    def _revalidate_prefix(self, pid):
+        """
+        Check whether the cached safe sequence still holds after pid was (pretend) granted.
+        A grant of `req` lowers the work vector by `req` only until pid itself finishes,
+        when it gets the same units back. Processes after pid in the sequence therefore see
+        exactly the same work as before, and pid's own need shrank by `req` as well, so only
+        the processes ahead of pid have to be rechecked against the reduced work.
+        """
+        work = list(self.available)
+        for q in self._safe_seq[:self._safe_pos[pid]]:
+            if any(self.need[q][i] > work[i] for i in range(self.m)):
+                return False
+            for i in range(self.m):
+                work[i] += self.allocation[q][i]
+        return True
+
+    def _check_after_grant(self, pid):
+        """Safety check for the state right after pid was (pretend) granted. Returns (safe, seq)."""
+        if self.incremental and self._safe_seq is not None and pid in self._safe_pos:
+            if self._revalidate_prefix(pid):
+                self.fast_path_hits += 1
+                if registry.enabled:
+                    SAFETY_FAST_PATH.inc()
+                return True, self._safe_seq
+        return self.is_safe_state()
+
+    def get_safety_stats(self):
+        """Counters for how often a grant was decided without the full safety algorithm."""
+        decided = self.fast_path_hits + self.full_safety_checks
+        return {
+            'fast_path_hits': self.fast_path_hits,
+            'full_safety_checks': self.full_safety_checks,
+            'fast_path_ratio': self.fast_path_hits / decided if decided else 0.0,
+            'cached_sequence_length': len(self._safe_seq) if self._safe_seq is not None else 0
+        }
+
     def request_resources(self, pid, req):
         """
         Attempt to allocate req(list) to pid using Banker's algorithm.
         Returns (granted: bool, reason: str)
         """
+        granted, reason, seq = self._try_grant(pid, req)
+        if granted:
+            return True, f"{reason}, safe sequence: {seq}"
+        return False, reason
+
+    def request_resources_batch(self, requests, stop_on_denial=False):
+        """
+        Run an ordered list of (pid, req) through Banker's algorithm in one go.
+        Consecutive grants reuse the cached safe sequence, and the sequence is reported once
+        for the whole batch instead of being formatted into every reason.
+        Returns (verdicts: list[(pid, granted, reason)], safe_sequence or None)
+        """
+        verdicts = []
+        for pid, req in requests:
+            granted, reason, _ = self._try_grant(pid, req)
+            verdicts.append((pid, granted, reason))
+            if stop_on_denial and not granted:
+                break
+        return verdicts, (list(self._safe_seq) if self._safe_seq is not None else None)
+
+    def _try_grant(self, pid, req):
+        """Core of request_resources. Returns (granted, reason, safe_seq) with safe_seq None on denial."""
         # basic checks
         if pid not in self.processes:
-            return False, "unknown pid"
+            return False, "unknown pid", None
         if any(req[i] > self.need[pid][i] for i in range(self.m)):
-            return False, "request exceeds declared maximum need"
+            return False, "request exceeds declared maximum need", None
 
         if all(req[i] <= self.available[i] for i in range(self.m)):
             # pretend allocate
@@ -102,20 +200,27 @@ class ResourceManager:
                 self.allocation[pid][i] += req[i]
                 self.need[pid][i] -= req[i]
 
-            safe, seq = self.is_safe_state()
+            # a denied grant is rolled back, so the sequence cached for the current state stays valid
+            cached_seq, cached_pos = self._safe_seq, self._safe_pos
+            safe, seq = self._check_after_grant(pid)
             if safe:
                 # take a checkpoint (optional) for rollback
                 self.take_checkpoint(pid)
-                return True, f"granted, safe sequence: {seq}"
+                self.request[pid] = [0]*self.m
+                return True, "granted", seq
             else:
                 # rollback pretend allocation
                 for i in range(self.m):
                     self.available[i] += req[i]
                     self.allocation[pid][i] -= req[i]
                     self.need[pid][i] += req[i]
-                return False, "denied: would lead to unsafe state"
+                self._safe_seq, self._safe_pos = cached_seq, cached_pos
+                # the process has to wait for this request
+                self.request[pid] = list(req)
+                return False, "denied: would lead to unsafe state", None
         else:
-            return False, "blocked: not enough available resources"
+            self.request[pid] = list(req)
+            return False, "blocked: not enough available resources", None
 
     # ---------- Deadlock detection: wait-for graph approach ----------
     def build_wait_for_graph(self):
@@ -139,6 +244,7 @@ class ResourceManager:
 
     def detect_deadlock(self):
         """Detect cycles in wait-for graph. Returns list of cycles (each cycle is list of pids)."""
+        started = time.perf_counter() if registry.enabled else None
         g = self.build_wait_for_graph()
         visited = set()
         stack = []
@@ -161,8 +267,37 @@ class ResourceManager:
         for node in self.processes:
             if node not in visited:
                 dfs(node)
+        if started is not None:
+            CYCLE_SEARCH.time(started, 'banker', 'wait_for_graph')
         return cycles
 
+    # ---------- Deadlock detection: detection algorithm (multi-instance) ----------
+    def find_deadlocked(self):
+        """
+        Coffman/Shoshani detection algorithm. Starting from Available, repeatedly let any process
+        whose outstanding Request fits in work finish and return its Allocation. Processes left
+        unfinished are exactly the deadlocked ones. Processes holding nothing are skipped since
+        they cannot block anybody. Returns list of deadlocked pids.
+        """
+        started = time.perf_counter() if registry.enabled else None
+        work = list(self.available)
+        unfinished = [pid for pid in self.processes if any(self.allocation[pid][i] > 0 for i in range(self.m))]
+        changed = True
+        while changed and unfinished:
+            changed = False
+            blocked = []
+            for pid in unfinished:
+                if all(self.request[pid][i] <= work[i] for i in range(self.m)):
+                    for i in range(self.m):
+                        work[i] += self.allocation[pid][i]
+                    changed = True
+                else:
+                    blocked.append(pid)
+            unfinished = blocked
+        if started is not None:
+            CYCLE_SEARCH.time(started, 'banker', 'detection_algorithm')
+        return unfinished
+
     # ---------- Recovery strategies ----------
     def terminate_victim(self, pid):
         """Simulate termination: free pid's resources and remove from system."""
@@ -176,7 +311,12 @@ class ResourceManager:
         del self.allocation[pid]
         del self.need[pid]
         del self.max[pid]
+        del self.request[pid]
         del self.checkpoints[pid]
+        # its units went back to available, so the rest of the cached sequence stays safe
+        if pid in self._safe_pos:
+            self._safe_seq.remove(pid)
+            self._remember_safe_sequence(self._safe_seq)
         return True
 
     def preempt_resources(self, pid, amount=None):
@@ -190,6 +330,7 @@ class ResourceManager:
         if amount is None:
             amount = list(self.allocation[pid])
         freed = [0]*self.m
+        # available and pid's need grow by the same amount, so the cached safe sequence still holds
         for i in range(self.m):
             take = min(self.allocation[pid][i], amount[i])
             self.allocation[pid][i] -= take
@@ -199,7 +340,7 @@ class ResourceManager:
             self.need[pid][i] += take
         return freed
 
-    def recover(self, strategy='terminate_lowest', deadlocked_set=None):
+    def recover(self, strategy='terminate_lowest', deadlocked_set=None, detection='matrix'):
         """
         strategy options:
             - 'terminate_lowest': terminate process holding least resources
@@ -207,8 +348,13 @@ class ResourceManager:
             - 'preempt_min': preempt smallest resources from victim(s)
             - 'rollback_checkpoint': attempt rollback on victims
         deadlocked_set: list of pids in deadlock (if None, detect automatically)
+        detection: 'matrix' (detection algorithm, exact) or 'wait_for' (wait-for graph cycles)
         Returns list of actions performed.
         """
+        if deadlocked_set is None and detection == 'matrix':
+            deadlocked_set = self.find_deadlocked()
+            if not deadlocked_set:
+                return ['no_deadlock_detected']
         if deadlocked_set is None:
             cycles = self.detect_deadlock()
             if not cycles:
@@ -249,6 +395,235 @@ class ResourceManager:
         return ['unknown_strategy']
 
 
+# ---------- Array-backed state (large process / resource counts) ----------
+class _RowMap:
+    """
+    Read/write pid -> row view over one of MatrixResourceManager's matrices, so code written
+    against the dict-of-lists layout (manager.need[pid][i], manager.allocation[pid] = ...)
+    keeps working unchanged.
+    """
+    def __init__(self, manager, matrix_name):
+        self._rm = manager
+        self._name = matrix_name
+
+    def __getitem__(self, pid):
+        return getattr(self._rm, self._name)[self._rm.index[pid]]
+
+    def __setitem__(self, pid, row):
+        getattr(self._rm, self._name)[self._rm.index[pid]] = row
+
+    def __contains__(self, pid):
+        return pid in self._rm.index
+
+    def __iter__(self):
+        return iter(self._rm.row_pids)
+
+    def __len__(self):
+        return len(self._rm.row_pids)
+
+    def keys(self):
+        return list(self._rm.row_pids)
+
+    def items(self):
+        return [(pid, self[pid]) for pid in self._rm.row_pids]
+
+
+class MatrixResourceManager(ResourceManager):
+    """
+    ResourceManager with max/allocation/need stored as n x m int64 matrices plus a pid -> row index.
+    Safety checks, request validation, preemption and snapshots run as row/column operations.
+    `max`, `allocation` and `need` are still indexable by pid (returning row views), so
+    PreventionManager and the recovery strategies work on either representation.
+    """
+    def __init__(self, total_resources, process_ids, max_claims, incremental=True):
+        if np is None:
+            raise ImportError("MatrixResourceManager requires numpy")
+        self.total = list(total_resources)
+        self.m = len(total_resources)
+        self.processes = list(process_ids)
+
+        # row k of every matrix belongs to row_pids[k]
+        self.row_pids = list(process_ids)
+        self.index = {pid: k for k, pid in enumerate(self.row_pids)}
+        self.available = np.array(total_resources, dtype=np.int64)
+        self.max_matrix = np.array([max_claims[pid] for pid in process_ids], dtype=np.int64).reshape(len(self.row_pids), self.m)
+        self.alloc_matrix = np.zeros_like(self.max_matrix)
+        self.need_matrix = self.max_matrix - self.alloc_matrix
+        self.request_matrix = np.zeros_like(self.max_matrix)
+        self.max = _RowMap(self, 'max_matrix')
+        self.allocation = _RowMap(self, 'alloc_matrix')
+        self.need = _RowMap(self, 'need_matrix')
+        self.request = _RowMap(self, 'request_matrix')
+
+        self.checkpoints = {pid: [] for pid in process_ids}
+
+        self.incremental = incremental
+        self._safe_seq = None
+        self._safe_pos = {}
+        self._safe_rows = None
+        self.fast_path_hits = 0
+        self.full_safety_checks = 0
+
+    def snapshot(self):
+        """Return a plain-list copy of manager state."""
+        return {
+            'available': self.available.tolist(),
+            'allocation': dict(zip(self.row_pids, self.alloc_matrix.tolist())),
+            'need': dict(zip(self.row_pids, self.need_matrix.tolist())),
+            'request': dict(zip(self.row_pids, self.request_matrix.tolist()))
+        }
+
+    def take_checkpoint(self, pid):
+        """Save a lightweight checkpoint for pid (allocation + need rows)."""
+        if pid not in self.index:
+            return
+        row = self.index[pid]
+        self.checkpoints[pid].append((self.alloc_matrix[row].copy(), self.need_matrix[row].copy()))
+        if len(self.checkpoints[pid]) > 5:
+            self.checkpoints[pid].pop(0)
+
+    def rollback_to_checkpoint(self, pid):
+        """Restore most recent checkpoint for pid (if any). Returns True if rolled back."""
+        if pid not in self.index or not self.checkpoints[pid]:
+            return False
+        alloc, need = self.checkpoints[pid].pop()
+        row = self.index[pid]
+        self.available += self.alloc_matrix[row] - alloc
+        self.alloc_matrix[row] = alloc
+        self.need_matrix[row] = need
+        self._invalidate_safe_sequence()
+        return True
+
+    def is_safe_state(self):
+        """
+        Vectorized safety algorithm. Every pass finishes all processes whose need fits in the
+        current work vector at once; any order among them is valid since finishing only adds work.
+        """
+        self.full_safety_checks += 1
+        work = self.available.copy()
+        pending = np.arange(len(self.row_pids))
+        seq = []
+        passes = 0
+        while pending.size:
+            passes += 1
+            runnable = np.all(self.need_matrix[pending] <= work, axis=1)
+            if not runnable.any():
+                break
+            rows = pending[runnable]
+            work += self.alloc_matrix[rows].sum(axis=0)
+            seq.extend(self.row_pids[r] for r in rows.tolist())
+            pending = pending[~runnable]
+        if registry.enabled:
+            SAFETY_ITERATIONS.observe(passes)
+        if pending.size == 0:
+            self._remember_safe_sequence(seq)
+            return True, seq
+        self._invalidate_safe_sequence()
+        return False, None
+
+    def _remember_safe_sequence(self, seq):
+        super()._remember_safe_sequence(seq)
+        self._safe_rows = np.fromiter((self.index[pid] for pid in self._safe_seq), dtype=np.int64, count=len(self._safe_seq))
+
+    def _invalidate_safe_sequence(self):
+        super()._invalidate_safe_sequence()
+        self._safe_rows = None
+
+    def _revalidate_prefix(self, pid):
+        """Prefix recheck (see ResourceManager._revalidate_prefix) as one cumulative-sum comparison."""
+        rows = self._safe_rows[:self._safe_pos[pid]]
+        if rows.size == 0:
+            return True
+        alloc = self.alloc_matrix[rows]
+        work_before = self.available + np.cumsum(alloc, axis=0) - alloc
+        return bool(np.all(self.need_matrix[rows] <= work_before))
+
+    def _try_grant(self, pid, req):
+        """Vectorized core of request_resources. Returns (granted, reason, safe_seq)."""
+        if pid not in self.index:
+            return False, "unknown pid", None
+        row = self.index[pid]
+        req = np.asarray(req, dtype=np.int64)
+        if np.any(req > self.need_matrix[row]):
+            return False, "request exceeds declared maximum need", None
+        if not np.all(req <= self.available):
+            self.request_matrix[row] = req
+            return False, "blocked: not enough available resources", None
+
+        # pretend allocate
+        self.available -= req
+        self.alloc_matrix[row] += req
+        self.need_matrix[row] -= req
+
+        cached = self._safe_seq, self._safe_pos, self._safe_rows
+        safe, seq = self._check_after_grant(pid)
+        if safe:
+            self.take_checkpoint(pid)
+            self.request_matrix[row] = 0
+            return True, "granted", seq
+        # rollback pretend allocation
+        self.available += req
+        self.alloc_matrix[row] -= req
+        self.need_matrix[row] += req
+        self._safe_seq, self._safe_pos, self._safe_rows = cached
+        self.request_matrix[row] = req
+        return False, "denied: would lead to unsafe state", None
+
+    def terminate_victim(self, pid):
+        """Free pid's resources and drop its row (the last row is moved into the gap)."""
+        if pid not in self.index:
+            return False
+        row = self.index.pop(pid)
+        self.available += self.alloc_matrix[row]
+        last = len(self.row_pids) - 1
+        if row != last:
+            moved = self.row_pids[last]
+            for matrix in (self.max_matrix, self.alloc_matrix, self.need_matrix, self.request_matrix):
+                matrix[row] = matrix[last]
+            self.row_pids[row] = moved
+            self.index[moved] = row
+        self.row_pids.pop()
+        self.max_matrix = self.max_matrix[:last]
+        self.alloc_matrix = self.alloc_matrix[:last]
+        self.need_matrix = self.need_matrix[:last]
+        self.request_matrix = self.request_matrix[:last]
+        self.processes.remove(pid)
+        del self.checkpoints[pid]
+        if pid in self._safe_pos:
+            self._safe_seq.remove(pid)
+            self._remember_safe_sequence(self._safe_seq)
+        return True
+
+    def find_deadlocked(self):
+        """Detection algorithm (see ResourceManager.find_deadlocked) as a vectorized work/finish reduction."""
+        started = time.perf_counter() if registry.enabled else None
+        work = self.available.copy()
+        unfinished = np.flatnonzero(self.alloc_matrix.any(axis=1))
+        while unfinished.size:
+            runnable = np.all(self.request_matrix[unfinished] <= work, axis=1)
+            if not runnable.any():
+                break
+            work += self.alloc_matrix[unfinished[runnable]].sum(axis=0)
+            unfinished = unfinished[~runnable]
+        if started is not None:
+            CYCLE_SEARCH.time(started, 'banker', 'detection_algorithm')
+        return [self.row_pids[r] for r in unfinished.tolist()]
+
+    def preempt_resources(self, pid, amount=None):
+        """Preempt some or all resources from pid. Returns freed vector."""
+        if pid not in self.index:
+            return [0]*self.m
+        row = self.index[pid]
+        if amount is None:
+            take = self.alloc_matrix[row].copy()
+        else:
+            take = np.minimum(self.alloc_matrix[row], np.asarray(amount, dtype=np.int64))
+        self.alloc_matrix[row] -= take
+        self.available += take
+        self.need_matrix[row] += take
+        return take.tolist()
+
+
 # ---------- Prevention strategies (policies) ----------
 def enforce_global_resource_ordering(process_order, resource_order):
     """
@@ -339,6 +714,10 @@ class PreventionManager:
                 self.rm.allocation[pid][i] += req[i]
                 self.rm.need[pid][i] -= req[i]
             self.rm.take_checkpoint(pid)
+            self.rm.request[pid] = [0]*self.rm.m
+            # direct grants skip the safety check, so the cached safe sequence may no longer hold
+            self.rm._invalidate_safe_sequence()
             return True, "granted (direct)"
         else:
+            self.rm.request[pid] = list(req)
             return False, "blocked: not enough available"
@@ -1,16 +1,44 @@
 import networkx as nx
+import time
 from datetime import datetime
+from itertools import islice
+from .event_log import EventLog
+from .metrics import registry, GRAPH_BUILD, CYCLE_SEARCH
 
 class DeadlockDetector:
     """Detects deadlocks using Wait-For Graph analysis"""
     
-    def __init__(self):
+    # 'scc': strongly connected components, linear in graph size (default)
+    # 'cycles': enumerate every elementary cycle with nx.simple_cycles (exponential worst case)
+    MODES = ('scc', 'cycles')
+    
+    def __init__(self, mode='scc'):
         self.wait_for_graph = nx.DiGraph()
-        self.detection_history = []
+        self.detection_history = EventLog(100)
+        self.mode = mode
+        # incremental maintenance: nodes touched since the last check, and the
+        # non-trivial SCCs found by it (None means the next check scans everything)
+        self._dirty = set()
+        self._components = None
+        self._component_info = {}
+        # resource nodes with more than one unit; while there are any, a cycle is no longer
+        # proof of a deadlock and detection reduces the graph instead
+        self.multi_unit = set()
+        # process nodes with a pending request (only they can be deadlocked), and the number
+        # of resource nodes, so a check need not scan every node
+        self.waiting = set()
+        self.resource_count = 0
         
     def build_wait_for_graph(self, processes, resources):
         """Build Wait-For Graph from current system state"""
+        started = time.perf_counter() if registry.enabled else None
         self.wait_for_graph.clear()
+        self._dirty.clear()
+        self._components = None
+        self._component_info = {}
+        self.multi_unit.clear()
+        self.waiting.clear()
+        self.resource_count = 0
         
         # Add process nodes
         for process in processes:
@@ -18,63 +46,69 @@ class DeadlockDetector:
             self.wait_for_graph.add_node(node_id, type='process', pid=process.pid, name=process.name)
         
         # Add resource nodes
+        counting = {}
         for resource in resources:
-            node_id = f"R{resource.rid}"
-            self.wait_for_graph.add_node(node_id, type='resource', rid=resource.rid, name=resource.name)
+            self.add_resource_node(resource.rid, resource.name, resource.units)
+            if resource.units > 1:
+                counting[resource.rid] = resource
         
-        # Add edges based on resource allocation and requests
+        # Add edges based on resource allocation and requests; weights are units
         for process in processes:
             process_node = f"P{process.pid}"
             
             # Process -> Resource edges (process is waiting for resource)
             for resource_id in process.requested_resources:
                 resource_node = f"R{resource_id}"
+                units = counting[resource_id].pending.get(process.pid, 1) if resource_id in counting else 1
                 self.wait_for_graph.add_edge(process_node, resource_node, 
-                                           type='waiting_for', weight=1)
+                                           type='waiting_for', weight=units)
+                self.waiting.add(process_node)
             
             # Resource -> Process edges (resource is held by process)
             for resource_id in process.allocated_resources:
                 resource_node = f"R{resource_id}"
+                units = counting[resource_id].units_held(process.pid) if resource_id in counting else 1
                 self.wait_for_graph.add_edge(resource_node, process_node,
-                                           type='held_by', weight=1)
+                                           type='held_by', weight=units)
         
+        if started is not None:
+            GRAPH_BUILD.time(started, 'detector')
         return self.wait_for_graph
     
-    def detect_deadlocks(self, processes, resources):
-        """Detect deadlocks in the system"""
+    def detect_deadlocks(self, processes, resources, mode=None, max_cycles=0):
+        """Detect deadlocks in the system
+        
+        mode: 'scc' or 'cycles' (defaults to the detector's mode)
+        max_cycles: in 'scc' mode, also list up to this many concrete cycles per deadlock
+        """
+        mode = mode or self.mode
         # Build the current Wait-For Graph
         self.build_wait_for_graph(processes, resources)
         
-        # Find all cycles in the graph
         try:
-            cycles = list(nx.simple_cycles(self.wait_for_graph))
-            deadlocks = []
-            
-            for cycle in cycles:
-                if self.is_deadlock_cycle(cycle):
-                    deadlock_info = {
-                        'cycle': cycle,
-                        'description': self.format_cycle_description(cycle),
-                        'processes_involved': self.get_processes_from_cycle(cycle),
-                        'resources_involved': self.get_resources_from_cycle(cycle),
-                        'timestamp': datetime.now().isoformat(),
-                        'cycle_length': len(cycle)
-                    }
-                    deadlocks.append(deadlock_info)
+            started = time.perf_counter() if registry.enabled else None
+            if mode == 'scc':
+                deadlocks = self.find_deadlocked_components(max_cycles)
+                total_cycles = len(deadlocks)
+            elif mode == 'cycles':
+                # Find all cycles in the graph
+                cycles = list(nx.simple_cycles(self.wait_for_graph))
+                deadlocks = [self.build_deadlock_info(cycle) for cycle in cycles if self.is_deadlock_cycle(cycle)]
+                total_cycles = len(cycles)
+            else:
+                raise ValueError(f"unknown detection mode: {mode}")
+            if started is not None:
+                CYCLE_SEARCH.time(started, 'detector', mode)
             
             # Record detection attempt
             detection_record = {
-                'timestamp': datetime.now().isoformat(),
+                'mode': mode,
                 'deadlocks_found': len(deadlocks),
-                'total_cycles': len(cycles),
+                'total_cycles': total_cycles,
                 'graph_nodes': len(self.wait_for_graph.nodes()),
                 'graph_edges': len(self.wait_for_graph.edges())
             }
-            self.detection_history.append(detection_record)
-            
-            # Keep only last 100 records
-            if len(self.detection_history) > 100:
-                self.detection_history = self.detection_history[-100:]
+            self.detection_history.append('detection', detection_record)
             
             return {
                 'has_deadlock': len(deadlocks) > 0,
@@ -92,6 +126,328 @@ class DeadlockDetector:
                 'wait_for_graph': self.get_graph_data()
             }
     
+    def find_deadlocked_components(self, max_cycles=0):
+        """Report each strongly connected component with 2+ processes as one deadlock
+        
+        Every node of a non-trivial SCC lies on a cycle, so its processes are exactly the
+        deadlocked ones. One witness cycle per component keeps the 'cycle' field populated;
+        further cycles are only enumerated when max_cycles asks for them. With multi-unit
+        resources the SCCs are taken on what graph reduction leaves over.
+        """
+        graph = self.wait_for_graph
+        if self.multi_unit:
+            graph = graph.subgraph(self.blocked_region())
+        deadlocks = []
+        for component in nx.strongly_connected_components(graph):
+            if self.is_deadlock_component(component):
+                deadlocks.append(self.build_component_info(component, max_cycles))
+        return deadlocks
+    
+    def is_deadlock_component(self, component):
+        """A component is a deadlock if it holds a cycle through at least 2 processes"""
+        if len(component) < 2:
+            return False
+        return sum(1 for node in component if node.startswith('P')) >= 2
+    
+    def build_component_info(self, component, max_cycles=0):
+        """Describe a deadlocked component, using one witness cycle for the 'cycle' field"""
+        subgraph = self.wait_for_graph.subgraph(component)
+        start = min(component)
+        witness = [edge[0] for edge in nx.find_cycle(subgraph, source=start)]
+        deadlock_info = self.build_deadlock_info(witness)
+        deadlock_info['processes_involved'] = sorted(self.get_processes_from_cycle(component))
+        deadlock_info['resources_involved'] = sorted(self.get_resources_from_cycle(component))
+        deadlock_info['component_size'] = len(component)
+        if max_cycles:
+            deadlock_info['cycles'] = [cycle for cycle in islice(nx.simple_cycles(subgraph), max_cycles)]
+        return deadlock_info
+    
+    def find_cycles(self, limit=100):
+        """Enumerate up to `limit` concrete deadlock cycles of the current graph"""
+        cycles = []
+        for component in nx.strongly_connected_components(self.wait_for_graph):
+            if len(component) < 2:
+                continue
+            for cycle in nx.simple_cycles(self.wait_for_graph.subgraph(component)):
+                if len(cycles) >= limit:
+                    return cycles
+                if self.is_deadlock_cycle(cycle):
+                    cycles.append(cycle)
+        return cycles
+    
+    def build_deadlock_info(self, cycle):
+        """Describe one deadlock cycle in the shape the frontend expects"""
+        return {
+            'cycle': cycle,
+            'description': self.format_cycle_description(cycle),
+            'processes_involved': self.get_processes_from_cycle(cycle),
+            'resources_involved': self.get_resources_from_cycle(cycle),
+            'timestamp': datetime.now().isoformat(),
+            'cycle_length': len(cycle)
+        }
+    
+    # ---------- Incremental maintenance (driven by simulator events) ----------
+    def handle_event(self, action_type, data):
+        """Apply one simulator action to the wait-for graph in place"""
+        if action_type == 'process_created':
+            self.add_process_node(data['pid'], data.get('name'))
+        elif action_type == 'resource_created':
+            self.add_resource_node(data['rid'], data.get('name'), data.get('units', 1))
+        elif action_type == 'resource_waiting':
+            self.on_request(data['pid'], data['rid'], data.get('count', 1))
+        elif action_type == 'resource_allocated':
+            self.on_allocate(data['pid'], data['rid'], data.get('count', 1))
+        elif action_type == 'resource_released':
+            self.on_release(data['pid'], data['rid'], data.get('count'))
+        elif action_type == 'request_withdrawn':
+            self.on_withdraw(data['pid'], data['rid'])
+        elif action_type == 'process_terminated':
+            self.on_terminate(data['pid'])
+        elif action_type == 'system_reset':
+            self.wait_for_graph.clear()
+            self._dirty.clear()
+            self._components = []
+            self._component_info = {}
+            self.multi_unit.clear()
+            self.waiting.clear()
+            self.resource_count = 0
+    
+    def add_process_node(self, pid, name=None):
+        node_id = f"P{pid}"
+        self.wait_for_graph.add_node(node_id, type='process', pid=pid, name=name)
+    
+    def add_resource_node(self, rid, name=None, units=1):
+        node_id = f"R{rid}"
+        if node_id not in self.wait_for_graph:
+            self.resource_count += 1
+        self.wait_for_graph.add_node(node_id, type='resource', rid=rid, name=name, units=units)
+        if units > 1:
+            self.multi_unit.add(node_id)
+    
+    def on_request(self, pid, rid, count=1):
+        """Process -> Resource edge: pid is waiting for count units of rid"""
+        self.wait_for_graph.add_edge(f"P{pid}", f"R{rid}", type='waiting_for', weight=count)
+        self._dirty.update((f"P{pid}", f"R{rid}"))
+        self.waiting.add(f"P{pid}")
+    
+    def on_allocate(self, pid, rid, count=1):
+        """Resource -> Process edge, replacing a pending request edge if there was one"""
+        process_node, resource_node = f"P{pid}", f"R{rid}"
+        graph = self.wait_for_graph
+        if graph.has_edge(process_node, resource_node):
+            graph.remove_edge(process_node, resource_node)
+            if not graph._succ[process_node]:
+                self.waiting.discard(process_node)
+        if resource_node in self.multi_unit and graph.has_edge(resource_node, process_node):
+            count += graph[resource_node][process_node]['weight']
+        graph.add_edge(resource_node, process_node, type='held_by', weight=count)
+        self._dirty.update((process_node, resource_node))
+    
+    def on_withdraw(self, pid, rid):
+        """Drop a pending request edge: pid gave up waiting for rid"""
+        process_node, resource_node = f"P{pid}", f"R{rid}"
+        if self.wait_for_graph.has_edge(process_node, resource_node):
+            self.wait_for_graph.remove_edge(process_node, resource_node)
+            self._dirty.update((process_node, resource_node))
+            if not self.wait_for_graph._succ[process_node]:
+                self.waiting.discard(process_node)
+    
+    def on_release(self, pid, rid, count=None):
+        """Drop the held_by edge, or only lower its weight when some units are kept"""
+        process_node, resource_node = f"P{pid}", f"R{rid}"
+        graph = self.wait_for_graph
+        if graph.has_edge(resource_node, process_node):
+            held = graph[resource_node][process_node]['weight']
+            if count is not None and count < held:
+                graph[resource_node][process_node]['weight'] = held - count
+            else:
+                graph.remove_edge(resource_node, process_node)
+            self._dirty.update((process_node, resource_node))
+    
+    def on_terminate(self, pid):
+        """Drop the process node; its former neighbours are where cycles may have broken"""
+        process_node = f"P{pid}"
+        if process_node not in self.wait_for_graph:
+            return
+        self._dirty.update(self.wait_for_graph.predecessors(process_node))
+        self._dirty.update(self.wait_for_graph.successors(process_node))
+        self._dirty.add(process_node)
+        self.waiting.discard(process_node)
+        self.wait_for_graph.remove_node(process_node)
+    
+    def _reachable_from(self, seeds):
+        """All nodes reachable from seeds (inclusive); closed under successors"""
+        seen = set(seeds)
+        stack = list(seen)
+        while stack:
+            node = stack.pop()
+            for succ in self.wait_for_graph.successors(node):
+                if succ not in seen:
+                    seen.add(succ)
+                    stack.append(succ)
+        return seen
+    
+    def blocked_region(self, extra_request=None, nodes=None):
+        """Processes left over by graph reduction, with the resources they hold or wait for
+        
+        A process whose every request fits in the free units can finish and return what
+        it holds (Holt's reduction for multi-unit resources); processes are reduced until
+        none can, and the ones left are deadlocked or waiting on a deadlock. Linear in the
+        graph apart from sorting each resource's waiters by the units they need.
+        extra_request: a hypothetical (process node, resource node, units) wait to add.
+        nodes: reduce only this successor-closed node set (exact for the nodes in it,
+        since whether a process can finish only depends on what it can reach).
+        """
+        graph = self.wait_for_graph
+        # plain adjacency dicts: the reduction touches every edge, views cost several times more
+        succ, pred = graph._succ, graph._pred
+        free = {}
+        processes = []
+        for node in graph if nodes is None else nodes:
+            if node.startswith('R'):
+                free[node] = graph.nodes[node].get('units', 1) - sum(edge['weight'] for edge in succ[node].values())
+            else:
+                processes.append(node)
+        unmet = {}  # process -> number of requests that do not fit yet
+        waiters = {}  # resource -> [(units needed, process)]
+        ready = []
+        for node in processes:
+            needs = {r: edge['weight'] for r, edge in succ[node].items()}
+            if extra_request and extra_request[0] == node:
+                needs[extra_request[1]] = extra_request[2]
+            for r, w in needs.items():
+                if w > free[r]:
+                    unmet[node] = unmet.get(node, 0) + 1
+                    waiters.setdefault(r, []).append((w, node))
+            if node not in unmet:
+                ready.append(node)
+        for queue in waiters.values():
+            queue.sort(reverse=True)
+        while ready:
+            node = ready.pop()
+            for r, edge in pred[node].items():
+                if r not in free:
+                    continue  # outside nodes, so nobody in it waits for r
+                free[r] += edge['weight']
+                queue = waiters.get(r)
+                while queue and queue[-1][0] <= free[r]:
+                    waiter = queue.pop()[1]
+                    unmet[waiter] -= 1
+                    if not unmet[waiter]:
+                        del unmet[waiter]
+                        ready.append(waiter)
+        
+        region = set(unmet)
+        for node in unmet:
+            region.update(succ[node])
+            region.update(pred[node])
+        if extra_request and extra_request[0] in unmet:
+            region.add(extra_request[1])
+        return region
+    
+    def check_request(self, pid, rid=None, count=1):
+        """Cycle of the deadlock pid would join by waiting for count units of rid, or None
+        
+        Without rid, the deadlock pid is already in. Cheap checks come first: pid cannot
+        be on a cycle if it holds nothing, or if every request it has can be met from
+        units that are free or held by processes waiting for nothing. Otherwise only what
+        its requests can reach is reduced, since pid is on a cycle only if it is in there.
+        """
+        process_node = f"P{pid}"
+        graph = self.wait_for_graph
+        succ = graph._succ
+        if not graph._pred.get(process_node):
+            return None  # holds nothing, so nothing can wait on it
+        needs = {r: edge['weight'] for r, edge in succ[process_node].items()}
+        if rid is not None:
+            needs[f"R{rid}"] = count
+        if all(graph.nodes[r].get('units', 1) - sum(edge['weight'] for holder, edge in succ[r].items()
+                                                   if holder == process_node or succ[holder]) >= units
+               for r, units in needs.items()):
+            return None
+        reachable = set()
+        for r in needs:
+            if r not in reachable:
+                reachable |= nx.descendants(graph, r) | {r}
+        if process_node not in reachable:
+            return None
+        extra_request = (process_node, f"R{rid}", count) if rid is not None else None
+        region = self.blocked_region(extra_request, reachable)
+        if process_node not in region:
+            return None
+        residual = nx.DiGraph(graph.subgraph(region))
+        if rid is not None:
+            residual.add_edge(process_node, f"R{rid}")
+        component = (nx.descendants(residual, process_node) & nx.ancestors(residual, process_node)) | {process_node}
+        if not self.is_deadlock_component(component):
+            return None
+        return [edge[0] for edge in nx.find_cycle(residual.subgraph(component), source=process_node)]
+    
+    def detect_incremental(self, include_graph=True, max_cycles=0):
+        """Detect deadlocks on the event-maintained graph, rescanning only what changed
+        
+        A cycle that appeared or broke since the last check runs through a touched node, and
+        a strongly connected component lies entirely inside any successor-closed node set
+        that meets it. So SCCs are recomputed only on the nodes reachable from touched nodes
+        (plus survivors of components that lost a node); all other components are reused.
+        Returns the same shape as detect_deadlocks.
+        """
+        started = time.perf_counter() if registry.enabled else None
+        graph = self.wait_for_graph
+        if self.multi_unit:
+            # cycles through multi-unit resources need not be deadlocks: reduce the graph,
+            # or rather the part of it reachable from waiting processes (see blocked_region)
+            region = self.blocked_region(nodes=self._reachable_from(self.waiting))
+            kept = []
+        elif self._components is None:
+            region = set(graph.nodes())
+            kept = []
+        else:
+            seeds = {node for node in self._dirty if node in graph}
+            stale = [c for c in self._components if c & self._dirty]
+            for component in stale:
+                seeds.update(node for node in component if node in graph)
+            region = self._reachable_from(seeds)
+            kept = [c for c in self._components if not (c & self._dirty) and not (c & region)]
+        
+        fresh = [frozenset(c) for c in nx.strongly_connected_components(graph.subgraph(region)) if len(c) > 1]
+        self._components = kept + fresh
+        self._dirty.clear()
+        
+        # reuse descriptions of components that did not change
+        component_info = {}
+        deadlocks = []
+        for component in self._components:
+            if not self.is_deadlock_component(component):
+                continue
+            info = self._component_info.get(component)
+            if info is None or (max_cycles and 'cycles' not in info):
+                info = self.build_component_info(component, max_cycles)
+            component_info[component] = info
+            deadlocks.append(info)
+        self._component_info = component_info
+        if started is not None:
+            CYCLE_SEARCH.time(started, 'detector', 'incremental')
+        
+        # no edge count here: networkx computes it by walking every node
+        self.detection_history.append('detection', {
+            'mode': 'incremental',
+            'deadlocks_found': len(deadlocks),
+            'total_cycles': len(deadlocks),
+            'rescanned_nodes': len(region),
+            'graph_nodes': graph.number_of_nodes()
+        })
+        
+        result = {
+            'has_deadlock': len(deadlocks) > 0,
+            'deadlocks': deadlocks,
+            'total_processes': graph.number_of_nodes() - self.resource_count,
+            'total_resources': self.resource_count
+        }
+        if include_graph:
+            result['wait_for_graph'] = self.get_graph_data()
+        return result
+    
     def is_deadlock_cycle(self, cycle):
         """Check if a cycle represents a real deadlock"""
         if len(cycle) < 2:
@@ -153,6 +509,8 @@ class DeadlockDetector:
             # Add additional attributes
             if 'name' in self.wait_for_graph.nodes[node]:
                 node_data['name'] = self.wait_for_graph.nodes[node]['name']
+            if self.wait_for_graph.nodes[node].get('units', 1) > 1:
+                node_data['units'] = self.wait_for_graph.nodes[node]['units']
             
             nodes.append(node_data)
         
@@ -172,11 +530,18 @@ class DeadlockDetector:
             'total_edges': len(edges)
         }
     
-    def get_detection_history(self):
+    def get_detection_history(self, limit=100):
         """Get detection history"""
-        return self.detection_history
+        return [{'timestamp': record['timestamp'], **record['data']}
+                for record in self.detection_history.recent(limit)]
     
     def reset(self):
         """Reset detector"""
         self.wait_for_graph.clear()
-        self.detection_history.clear()
\ No newline at end of file
+        self.detection_history.clear()
+        self._dirty.clear()
+        self._components = None
+        self._component_info = {}
+        self.multi_unit.clear()
+        self.waiting.clear()
+        self.resource_count = 0
\ No newline at end of file
@@ -0,0 +1,259 @@
+import heapq
+import random
+import time
+from .wait_queue import WaitStats, create_wait_queue
+
+
+def make_distribution(spec):
+    """Sampler rng -> float for a distribution spec
+
+    A number is a constant; tuples name a distribution: ('exp', mean),
+    ('uniform', low, high), ('normal', mean, sd) (clipped at 0), ('int', low, high)
+    (inclusive) and ('choice', values). A callable is used as the sampler itself.
+    """
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda rng: spec
+    kind, *args = spec
+    if kind == 'exp':
+        rate = 1.0 / args[0]
+        return lambda rng: rng.expovariate(rate)
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+    if kind == 'int':
+        return lambda rng: rng.randint(args[0], args[1])
+    if kind == 'choice':
+        values = list(args[0])
+        return lambda rng: rng.choice(values)
+    raise ValueError(f"unknown distribution: {spec}")
+
+
+class Workload:
+    """How processes arrive and what they do, as distributions (see make_distribution)
+
+    arrival: time between arrivals; requests: how many distinct resources a process
+    asks for, one after another; hold: how long it keeps going after each grant before
+    the next request (or, after the last one, before releasing everything and
+    leaving); priority: its priority. ordered=True requests resources in rid order,
+    which rules out circular waits.
+    """
+
+    def __init__(self, arrival=('exp', 1.0), requests=('int', 1, 3), hold=('exp', 5.0), priority=1,
+                 ordered=False, max_processes=None):
+        self.arrival = make_distribution(arrival)
+        self.requests = make_distribution(requests)
+        self.hold = make_distribution(hold)
+        self.priority = make_distribution(priority)
+        self.ordered = ordered
+        self.max_processes = max_processes
+
+
+class Job:
+    """What the kernel tracks for one simulated process"""
+
+    __slots__ = ('pid', 'plan', 'step', 'priority', 'arrived_at', 'wait_since', 'waiting_for')
+
+    def __init__(self, pid, plan, priority, arrived_at):
+        self.pid = pid
+        self.plan = plan  # rids to request, in order
+        self.step = 0
+        self.priority = priority
+        self.arrived_at = arrived_at
+        self.wait_since = None
+        self.waiting_for = None
+
+
+class EventKernel:
+    """Discrete-event driver for a simulator: a heap of timed events and a virtual clock
+
+    Processes arrive and run the Workload through the simulator's own API
+    (add_process, request_resource, release_resource, terminate_process), so every
+    detector and listener sees them as usual. Virtual time jumps from one event to the
+    next, so an hour of simulated time costs only the events in it.
+
+    Both simulator backends hand released units to their next waiter themselves (a
+    handoff grant), which the kernel picks up as that job's grant. For simulators that
+    do not, the kernel keeps a wait queue per resource under the simulator's wakeup
+    policy and requests again for the next waiter whenever units are released.
+    Wait times are measured in virtual seconds either way. Deadlocks reported by the
+    simulator are recovered at once by terminating one process on the cycle (lowest
+    priority, newest among equals); its work is resubmitted as a new arrival. A process
+    denied a request (deadlock_policy='reject') releases what it holds and starts its
+    requests over after a hold time.
+
+    While attached, the simulator's get_system_statistics() includes metrics().
+    """
+
+    def __init__(self, sim, workload, seed=None):
+        self.sim = sim
+        self.workload = workload
+        self.rng = random.Random(seed)
+        self.now = 0.0
+        self.events = []  # heap of (time, seq, kind, arg)
+        self.seq = 0
+        self.jobs = {}  # pid -> Job
+        self.queues = {}  # rid -> wait queue
+        self.wait_stats = WaitStats()
+        self.units_total = sum(r.units for r in sim.resources)
+        self.units_held = sum(r.units - r.free_units if r.units > 1 else (0 if r.available else 1)
+                              for r in sim.resources)
+        self.held_area = 0.0  # integral of units_held over virtual time
+        self.last_change = 0.0
+        self.stats = {'events': 0, 'arrived': 0, 'completed': 0, 'deadlocks': 0, 'victims': 0,
+                      'denials': 0, 'grants': 0, 'response_time': 0.0, 'wall_seconds': 0.0}
+        self.arrivals_left = workload.max_processes
+        sim.subscribe(self.handle_event)
+        sim.event_kernel = self
+
+    def schedule(self, delay, kind, arg=None):
+        self.seq += 1
+        heapq.heappush(self.events, (self.now + delay, self.seq, kind, arg))
+
+    def run(self, until=3600.0):
+        """Process events up to virtual time until (seconds), or until none are left. Returns metrics()"""
+        started = time.perf_counter()
+        if not self.events:
+            self.schedule(0.0, 'arrival')
+        handlers = {'arrival': self._arrival, 'request': self._request, 'finish': self._finish,
+                    'wake': self._wake, 'recover': self._recover}
+        while self.events and self.events[0][0] <= until:
+            self.now, _, kind, arg = heapq.heappop(self.events)
+            self.stats['events'] += 1
+            handlers[kind](arg)
+        if self.events:
+            # time runs on to until; once nothing is left to happen, it stops at the last event
+            self._account()
+            self.now = max(self.now, until)
+        self._account()
+        self.stats['wall_seconds'] += time.perf_counter() - started
+        return self.metrics()
+
+    def metrics(self):
+        """Deadlock rate, wait time and utilization figures so far (rates per virtual hour)"""
+        hours = self.now / 3600 if self.now else 0
+        completed = self.stats['completed']
+        return dict(self.stats,
+                    virtual_seconds=self.now,
+                    deadlocks_per_hour=self.stats['deadlocks'] / hours if hours else 0.0,
+                    completed_per_hour=completed / hours if hours else 0.0,
+                    mean_response_time=self.stats['response_time'] / completed if completed else 0.0,
+                    utilization=self.held_area / (self.units_total * self.now) if self.units_total and self.now else 0.0,
+                    waiting_processes=sum(len(q) for q in self.queues.values()),
+                    wait=self.wait_stats.to_dict())
+
+    # Listener: track held units and react to releases and deadlocks
+    def handle_event(self, action_type, data):
+        if action_type == 'resource_allocated':
+            self._account()
+            self.units_held += data.get('count', 1)
+            job = self.jobs.get(data['pid'])
+            if data.get('handoff') and job is not None and job.waiting_for == data['rid']:
+                self.queues[data['rid']].take(job.pid)
+                self._granted(job)
+        elif action_type == 'resource_released':
+            self._account()
+            self.units_held -= data.get('count', 1)
+            self.schedule(0.0, 'wake', data['rid'])
+        elif action_type == 'deadlock_detected':
+            for cycle in data['deadlocks']:
+                self.schedule(0.0, 'recover', cycle)
+
+    def _account(self):
+        self.held_area += self.units_held * (self.now - self.last_change)
+        self.last_change = self.now
+
+    # Event handlers
+    def _arrival(self, plan=None):
+        workload = self.workload
+        if plan is None:
+            if self.arrivals_left is not None:
+                if not self.arrivals_left:
+                    return
+                self.arrivals_left -= 1
+            self.schedule(workload.arrival(self.rng), 'arrival')
+            rids = [r.rid for r in self.sim.resources]
+            plan = self.rng.sample(rids, min(len(rids), int(workload.requests(self.rng))))
+            if workload.ordered:
+                plan.sort()
+        priority = workload.priority(self.rng)
+        process = self.sim.add_process(f"Job {self.stats['arrived'] + 1}", priority)
+        self.stats['arrived'] += 1
+        self.jobs[process.pid] = Job(process.pid, plan, priority, self.now)
+        self.schedule(0.0, 'request', process.pid)
+
+    def _request(self, pid):
+        job = self.jobs.get(pid)
+        if job is None:
+            return  # terminated as a deadlock victim
+        rid = job.plan[job.step]
+        self.sim.request_resource(pid, rid)
+        self._after_request(job, rid)
+
+    def _after_request(self, job, rid):
+        process = self.sim.process_index[job.pid]
+        if rid in process.allocated_resources:
+            self._granted(job)
+        elif rid in process.requested_resources:
+            if job.waiting_for is None:
+                job.waiting_for = rid
+                job.wait_since = self.now
+                queue = self.queues.get(rid)
+                if queue is None:
+                    queue = self.queues[rid] = create_wait_queue(getattr(self.sim, 'wakeup_policy', 'fifo'),
+                                                                 clock=lambda: self.now)
+                queue.append(job.pid, job.priority)
+        else:
+            # denied: waiting on what it holds would deadlock, and retrying while holding it
+            # would keep the other side waiting forever, so give everything back and start over
+            self.stats['denials'] += 1
+            for held in list(process.allocated_resources):
+                self.sim.release_resource(job.pid, held)
+            job.step = 0
+            self.schedule(self.workload.hold(self.rng), 'request', job.pid)
+
+    def _granted(self, job):
+        if job.waiting_for is not None:
+            self.wait_stats.record(self.now - job.wait_since)
+            job.waiting_for = job.wait_since = None
+        self.stats['grants'] += 1
+        job.step += 1
+        self.schedule(self.workload.hold(self.rng), 'request' if job.step < len(job.plan) else 'finish', job.pid)
+
+    def _finish(self, pid):
+        job = self.jobs.pop(pid, None)
+        if job is None:
+            return
+        for rid in list(self.sim.process_index[pid].allocated_resources):
+            self.sim.release_resource(pid, rid)
+        self.sim.terminate_process(pid)
+        self.stats['completed'] += 1
+        self.stats['response_time'] += self.now - job.arrived_at
+
+    def _wake(self, rid):
+        queue = self.queues.get(rid)
+        resource = self.sim.resource_index[rid]
+        while queue and resource.available:
+            pid = queue.popleft()
+            job = self.jobs.get(pid)
+            if job is None or job.waiting_for != rid:
+                continue
+            self.sim.request_resource(pid, rid)
+            self._after_request(job, rid)
+
+    def _recover(self, cycle):
+        """Terminate one live process of a reported cycle and resubmit its work"""
+        jobs = [self.jobs[int(node[1:])] for node in cycle
+                if node.startswith('P') and int(node[1:]) in self.jobs]
+        if len(jobs) < 2:
+            return  # already broken by an earlier recovery
+        victim = min(jobs, key=lambda job: (job.priority, -job.pid))
+        self.stats['deadlocks'] += 1
+        self.stats['victims'] += 1
+        del self.jobs[victim.pid]
+        if victim.waiting_for is not None:
+            self.queues[victim.waiting_for].remove(victim.pid)
+        self.sim.terminate_process(victim.pid)
+        self.schedule(self.workload.hold(self.rng), 'arrival', victim.plan)
@@ -0,0 +1,83 @@
+import time
+from datetime import datetime
+from enum import IntEnum
+from threading import Lock
+
+class Action(IntEnum):
+    """Compact codes for the actions the simulator records"""
+    PROCESS_CREATED = 1
+    PROCESS_TERMINATED = 2
+    RESOURCE_CREATED = 3
+    RESOURCE_ALLOCATED = 4
+    RESOURCE_WAITING = 5
+    RESOURCE_RELEASED = 6
+    RESOURCE_DENIED = 7
+    DEADLOCK_DETECTED = 8
+    SYSTEM_RESET = 9
+    DETECTION = 10
+
+    @property
+    def label(self):
+        return self.name.lower()
+
+_ACTION_BY_LABEL = {action.label: action for action in Action}
+
+
+class EventLog:
+    """Fixed-capacity ring buffer of (monotonic ns, action, payload) records
+
+    Appending overwrites the oldest slot in O(1) and never copies the buffer. Records
+    keep a monotonic timestamp and an Action code (unknown action names are stored as
+    given); ISO timestamps and action names are only produced when records are read.
+
+    Request handlers, socket handlers and the broadcast task write concurrently, so
+    claiming a slot, filling it and moving the write counter happen under one lock,
+    which readers take only to copy the raw records (formatting runs outside it).
+    """
+
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self._timestamps = [0] * capacity
+        self._actions = [None] * capacity
+        self._payloads = [None] * capacity
+        self._written = 0
+        self._lock = Lock()
+        # anchors for turning monotonic readings into wall-clock time on read
+        self._wall_anchor_ns = time.time_ns()
+        self._mono_anchor_ns = time.monotonic_ns()
+
+    def append(self, action_type, data):
+        action = _ACTION_BY_LABEL.get(action_type, action_type)
+        with self._lock:
+            slot = self._written % self.capacity
+            self._timestamps[slot] = time.monotonic_ns()
+            self._actions[slot] = action
+            self._payloads[slot] = data
+            self._written += 1
+
+    def recent(self, limit=50):
+        """Up to `limit` newest records, oldest first, formatted as timestamp/action/data dicts"""
+        with self._lock:
+            end = self._written
+            start = max(0, end - min(limit, self.capacity))
+            raw = [(self._timestamps[i % self.capacity], self._actions[i % self.capacity],
+                    self._payloads[i % self.capacity])
+                   for i in range(start, end)]
+        return [self._format(ts, action, data) for ts, action, data in raw]
+
+    def _format(self, timestamp_ns, action, data):
+        wall_ns = self._wall_anchor_ns + (timestamp_ns - self._mono_anchor_ns)
+        return {
+            "timestamp": datetime.fromtimestamp(wall_ns / 1e9).isoformat(),
+            "action": action.label if isinstance(action, Action) else action,
+            "data": data
+        }
+
+    def clear(self):
+        with self._lock:
+            self._written = 0
+            self._actions = [None] * self.capacity
+            self._payloads = [None] * self.capacity
+
+    def __len__(self):
+        return min(self._written, self.capacity)
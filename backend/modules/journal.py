@@ -0,0 +1,245 @@
+import json
+import os
+import struct
+import time
+import zlib
+from threading import Condition, Thread
+
+# every record: seq, payload length, crc32 of the payload, then the JSON payload
+RECORD_HEADER = struct.Struct('<QII')
+
+def apply_action(sim, action_type, data):
+    """Re-run one journaled action against a simulator
+
+    Only actions that change state are replayed; denials and deadlock reports are
+    derived from the state and reappear on their own.
+    """
+    if action_type == 'process_created':
+        sim.add_process(data['name'], data.get('priority', 1))
+    elif action_type == 'resource_created':
+        sim.add_resource(data['name'], data.get('type', 'binary'), data.get('units', 1))
+    elif action_type == 'resource_allocated' and data.get('handoff'):
+        pass  # replaying the release before it hands the units over again
+    elif action_type in ('resource_allocated', 'resource_waiting'):
+        sim.request_resource(data['pid'], data['rid'], data.get('count', 1))
+    elif action_type == 'resource_released':
+        sim.release_resource(data['pid'], data['rid'], data.get('count'))
+    elif action_type == 'process_terminated':
+        sim.terminate_process(data['pid'])
+    elif action_type == 'system_reset':
+        sim.reset_simulation()
+
+
+class Journal:
+    """Durable append-only log of simulator actions with periodic snapshots
+
+    Layout of the journal directory:
+      segment-<first seq>.log   binary records (see RECORD_HEADER), appended only
+      snapshot-<seq>.snap       zlib-compressed export_state() taken after record <seq>
+
+    append() only encodes the record into an in-memory buffer; a writer thread commits
+    whatever has accumulated every commit_interval seconds with a single write + fsync
+    (group commit), so records from the last interval can be lost on a crash. Every
+    snapshot_every records the simulator state is captured and written by the writer
+    thread, which then starts a new segment. Restoring loads the newest snapshot and
+    replays the records after it; replay(upto=seq) rebuilds the state as of any seq.
+    """
+
+    def __init__(self, directory, snapshot_every=1000, commit_interval=0.005, fsync=True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.commit_interval = commit_interval
+        self.fsync = fsync
+        self.cond = Condition()
+        self.pending = bytearray()
+        self.pending_snapshot = None
+        self.state_source = None
+        self.closed = False
+        self.stats = {'appended': 0, 'commits': 0, 'bytes_written': 0, 'snapshots': 0, 'truncated_bytes': 0}
+
+        self.seq = self._recover_tail()
+        self.committed_seq = self.seq
+        snapshots = self._snapshot_seqs()
+        self.snapshot_seq = snapshots[-1] if snapshots else 0
+        self.segment = open(self._segment_path(self._segment_starts()[-1]), 'ab')
+        self.writer = Thread(target=self._commit_loop, daemon=True)
+        self.writer.start()
+
+    # Files
+    def _segment_path(self, first_seq):
+        return os.path.join(self.directory, f'segment-{first_seq:012d}.log')
+
+    def _snapshot_path(self, seq):
+        return os.path.join(self.directory, f'snapshot-{seq:012d}.snap')
+
+    def _list(self, prefix, suffix):
+        return sorted(int(name[len(prefix):-len(suffix)]) for name in os.listdir(self.directory)
+                      if name.startswith(prefix) and name.endswith(suffix))
+
+    def _segment_starts(self):
+        starts = self._list('segment-', '.log')
+        if not starts:
+            open(self._segment_path(1), 'ab').close()
+            starts = [1]
+        return starts
+
+    def _snapshot_seqs(self):
+        return self._list('snapshot-', '.snap')
+
+    def _recover_tail(self):
+        """Last intact seq on disk; a torn record left by a crash is cut off"""
+        first = self._segment_starts()[-1]
+        path = self._segment_path(first)
+        last_seq, good_end = first - 1, 0
+        for seq, _, _, end in self._read_segment(path):
+            last_seq, good_end = seq, end
+        size = os.path.getsize(path)
+        if size > good_end:
+            with open(path, 'r+b') as f:
+                f.truncate(good_end)
+            self.stats['truncated_bytes'] += size - good_end
+            print(f"Journal: dropped {size - good_end} bytes of incomplete records in {path}")
+        return last_seq
+
+    def _read_segment(self, path):
+        """Yield (seq, action, data, end offset) for each intact record of a segment"""
+        with open(path, 'rb') as f:
+            buf = f.read()
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(buf):
+            seq, length, crc = RECORD_HEADER.unpack_from(buf, offset)
+            start = offset + RECORD_HEADER.size
+            payload = buf[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            action_type, data = json.loads(payload)
+            offset = start + length
+            yield seq, action_type, data, offset
+
+    # Writing
+    def attach(self, sim):
+        """Journal every action the simulator records from now on"""
+        self.state_source = sim.export_state
+        sim.subscribe(self.append)
+
+    def append(self, action_type, data):
+        payload = json.dumps([action_type, data], separators=(',', ':')).encode()
+        with self.cond:
+            self.seq += 1
+            self.pending += RECORD_HEADER.pack(self.seq, len(payload), zlib.crc32(payload))
+            self.pending += payload
+            self.stats['appended'] += 1
+            if self.state_source is not None and self.seq - self.snapshot_seq >= self.snapshot_every:
+                # capture now, while the state matches self.seq; encoding and I/O happen on the writer
+                self.pending_snapshot = (self.seq, self.state_source())
+                self.snapshot_seq = self.seq
+            self.cond.notify()
+
+    def _commit_loop(self):
+        while True:
+            with self.cond:
+                while not self.pending and self.pending_snapshot is None and not self.closed:
+                    self.cond.wait()
+                if self.closed and not self.pending and self.pending_snapshot is None:
+                    return
+            if not self.closed:
+                # let concurrent appends join this group
+                time.sleep(self.commit_interval)
+            self._commit()
+
+    def _commit(self):
+        with self.cond:
+            data, self.pending = self.pending, bytearray()
+            snapshot, self.pending_snapshot = self.pending_snapshot, None
+            last_seq = self.seq
+        if data:
+            self.segment.write(data)
+            self.segment.flush()
+            if self.fsync:
+                os.fsync(self.segment.fileno())
+        if snapshot is not None:
+            self._write_snapshot(*snapshot)
+            # records after this point go to a fresh segment, so restores read little
+            self.segment.close()
+            self.segment = open(self._segment_path(last_seq + 1), 'ab')
+        with self.cond:
+            self.committed_seq = last_seq
+            self.stats['commits'] += 1
+            self.stats['bytes_written'] += len(data)
+            self.cond.notify_all()
+
+    def _write_snapshot(self, seq, state):
+        path = self._snapshot_path(seq)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(zlib.compress(json.dumps(state, separators=(',', ':')).encode()))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self.stats['snapshots'] += 1
+
+    def sync(self):
+        """Block until everything appended so far is on disk"""
+        with self.cond:
+            target = self.seq
+            self.cond.notify()
+            while self.committed_seq < target and self.writer.is_alive():
+                self.cond.wait()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.writer.join()
+        self.segment.close()
+
+    # Reading
+    def records(self, after=0, upto=None):
+        """Yield (seq, action, data) for after < seq <= upto from the segments on disk"""
+        starts = self._segment_starts()
+        # skip segments that end before `after`
+        first = max([s for s in starts if s <= after + 1] or [starts[0]])
+        for start in starts[starts.index(first):]:
+            if upto is not None and start > upto:
+                return
+            for seq, action_type, data, _ in self._read_segment(self._segment_path(start)):
+                if upto is not None and seq > upto:
+                    return
+                if seq > after:
+                    yield seq, action_type, data
+
+    def load_snapshot(self, upto=None):
+        """(seq, state) of the newest snapshot at or before upto, or (0, None)"""
+        seqs = [s for s in self._snapshot_seqs() if upto is None or s <= upto]
+        if not seqs:
+            return 0, None
+        with open(self._snapshot_path(seqs[-1]), 'rb') as f:
+            return seqs[-1], json.loads(zlib.decompress(f.read()))
+
+    def replay(self, sim, upto=None):
+        """Rebuild state as of seq upto (the latest by default) into sim. Returns the seq reached
+
+        sim must not be attached to this journal, or the replay would be journaled again.
+        """
+        self.sync()
+        snapshot_seq, state = self.load_snapshot(upto)
+        if state is not None:
+            sim.load_state(state)
+        reached = snapshot_seq
+        for seq, action_type, data in self.records(after=snapshot_seq, upto=upto):
+            apply_action(sim, action_type, data)
+            reached = seq
+        return reached
+
+    def status(self):
+        with self.cond:
+            return {
+                'seq': self.seq,
+                'committed_seq': self.committed_seq,
+                'snapshot_seq': self.snapshot_seq,
+                'snapshot_every': self.snapshot_every,
+                'commit_interval': self.commit_interval,
+                'stats': dict(self.stats)
+            }
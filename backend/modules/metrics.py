@@ -0,0 +1,144 @@
+import math
+import os
+import time
+from bisect import bisect_left
+from threading import Lock
+
+# latency buckets in seconds, 50us .. 10s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    """Metrics rendered in the Prometheus text format
+
+    Collection is off until `enabled` is set (the /metrics route does so on the first
+    scrape): hot paths test registry.enabled before reading a clock or touching a
+    metric, so an unscraped server pays one attribute check per instrumented call.
+    Gauges are callbacks evaluated at scrape time and cost nothing in between.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.metrics = []
+        self.gauges = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, read):
+        """Register read() -> number, or {((label, value), ...): number}, called at scrape time"""
+        self.gauges.append((name, help_text, read))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for name, help_text, read in self.gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            value = read()
+            if isinstance(value, dict):
+                for labels, sample in value.items():
+                    lines.append(f"{name}{_labels(labels)} {_number(sample)}")
+            else:
+                lines.append(f"{name} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}  # label values -> count
+        self.lock = Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self.lock:
+            values = list(self.values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_labels(tuple(zip(self.labels, label_values)))} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [per-bucket counts (+Inf last), sum]
+        self.lock = Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def time(self, started, *label_values):
+        """Observe the seconds since `started` (a time.perf_counter() reading)"""
+        self.observe(time.perf_counter() - started, *label_values)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self.lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self.series.items()]
+        for label_values, counts, total in series:
+            pairs = tuple(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(pairs + (('le', _number(float(bound))),))} {cumulative}"
+            yield f"{self.name}_sum{_labels(pairs)} {_number(total)}"
+            yield f"{self.name}_count{_labels(pairs)} {cumulative}"
+
+
+registry = Registry(enabled=os.environ.get('METRICS_ENABLED', '') not in ('', '0', 'false'))
+
+BANKER_DECISIONS = registry.histogram('simulock_banker_decision_seconds',
+                                      "Time to decide one resource request", ('mode', 'outcome'))
+SAFETY_ITERATIONS = registry.histogram('simulock_banker_safety_iterations',
+                                       "Passes over the processes per full safety check",
+                                       buckets=(1, 2, 3, 5, 10, 25, 50, 100, 250, 1000))
+SAFETY_FAST_PATH = registry.counter('simulock_banker_safety_fast_path_total',
+                                    "Grants proven safe by revalidating the cached safe sequence")
+MANAGER_LOCK_WAIT = registry.histogram('simulock_banker_lock_wait_seconds',
+                                       "Time a Banker's decision waited for its context lock (_manager_lock)")
+GRAPH_BUILD = registry.histogram('simulock_graph_build_seconds',
+                                 "Time to build a wait-for graph", ('detector',))
+CYCLE_SEARCH = registry.histogram('simulock_cycle_search_seconds',
+                                  "Time to search a wait-for graph for deadlocks", ('detector', 'mode'))
+EMITS = registry.histogram('simulock_socketio_emit_bytes', "Size of Socket.IO emit payloads (JSON)",
+                           ('event',), buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304))
+ROUTE_LATENCY = registry.histogram('simulock_http_request_duration_seconds', "HTTP request latency",
+                                   ('route', 'method', 'status'))
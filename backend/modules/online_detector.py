@@ -0,0 +1,205 @@
+class OnlineDeadlockDetector:
+    """Checks every wait-for edge as it is inserted, using a dynamic topological order
+
+    The wait-for graph (P -> R for a pending request, R -> P for a held resource) is
+    kept acyclic together with a topological order, maintained with the Pearce-Kelly
+    algorithm: an edge that already agrees with the order is O(1), otherwise only the
+    nodes whose order lies between the two endpoints are searched and renumbered.
+    An edge that would close a cycle is not added to the ordered graph. The caller
+    either drops it (reject) or it is kept aside as flagged until a removal breaks
+    the cycle.
+
+    Only single-unit resources take part: a cycle through a resource with several
+    units is not necessarily a deadlock, so edges to and from such resources are
+    left to the graph reduction in DeadlockDetector.
+    """
+
+    def __init__(self):
+        # adjacency sets exist only for nodes that have edges (most nodes have none)
+        self.succ = {}
+        self.pred = {}
+        self.order = {}
+        self.next_order = 0
+        # (u, v) -> cycle for edges that exist in the system but would close a cycle
+        self.flagged = {}
+        # resource nodes with more than one unit, kept out of the ordered graph
+        self.multi_unit = set()
+        self.stats = {'inserts': 0, 'reorders': 0, 'nodes_visited': 0, 'cycles_found': 0}
+
+    # Graph maintenance
+    def add_node(self, node):
+        if node not in self.order:
+            self.order[node] = self.next_order
+            self.next_order += 1
+
+    def remove_node(self, node):
+        """Remove node and every edge touching it"""
+        if node not in self.order:
+            return
+        for w in self.succ.pop(node, ()):
+            self._unlink(self.pred, w, node)
+        for w in self.pred.pop(node, ()):
+            self._unlink(self.succ, w, node)
+        del self.order[node]
+        self.flagged = {edge: cycle for edge, cycle in self.flagged.items() if node not in edge}
+        self._retry_flagged()
+
+    def add_edge(self, u, v, keep_if_cyclic=True):
+        """Insert u -> v. Returns None if it was added, or the cycle it would close
+
+        With keep_if_cyclic the edge is remembered as flagged, otherwise it is dropped.
+        """
+        if v in self.succ.get(u, ()) or (u, v) in self.flagged:
+            return None
+        self.add_node(u)
+        self.add_node(v)
+        self.stats['inserts'] += 1
+        cycle = self._insert(u, v)
+        if cycle is not None and sum(1 for node in cycle if node.startswith('P')) < 2:
+            # a process waiting on a resource it holds itself: like DeadlockDetector, a
+            # deadlock needs 2+ processes, so the edge is left out of the graph unflagged
+            return None
+        if cycle is not None:
+            self.stats['cycles_found'] += 1
+            if keep_if_cyclic:
+                self.flagged[(u, v)] = cycle
+        return cycle
+
+    def remove_edge(self, u, v):
+        if (u, v) in self.flagged:
+            del self.flagged[(u, v)]
+            return
+        if v in self.succ.get(u, ()):
+            self._unlink(self.succ, u, v)
+            self._unlink(self.pred, v, u)
+            # removals keep the order valid but may break a cycle a flagged edge was waiting on
+            self._retry_flagged()
+
+    def _unlink(self, adjacency, node, other):
+        neighbours = adjacency[node]
+        neighbours.discard(other)
+        if not neighbours:
+            del adjacency[node]
+
+    def _retry_flagged(self):
+        for (u, v) in list(self.flagged):
+            cycle = self._insert(u, v)
+            if cycle is None:
+                del self.flagged[(u, v)]
+            else:
+                self.flagged[(u, v)] = cycle
+
+    # Pearce-Kelly insertion
+    def _insert(self, u, v):
+        if u == v:
+            return [u]
+        lower, upper = self.order[v], self.order[u]
+        if lower < upper:
+            forward, cycle = self._search_forward(v, upper, u)
+            if cycle is not None:
+                return cycle
+            backward = self._search_backward(u, lower)
+            self._reorder(backward, forward)
+        self.succ.setdefault(u, set()).add(v)
+        self.pred.setdefault(v, set()).add(u)
+        return None
+
+    def _search_forward(self, start, upper, target):
+        """Nodes reachable from start with order below upper, or the cycle if target is reached"""
+        parent = {start: None}
+        stack = [start]
+        visited = []
+        while stack:
+            node = stack.pop()
+            visited.append(node)
+            for w in self.succ.get(node, ()):
+                if w == target:
+                    # u -> v closes: target, start, ..., node
+                    path = [node]
+                    while parent[path[-1]] is not None:
+                        path.append(parent[path[-1]])
+                    return visited, [target] + path[::-1]
+                if w not in parent and self.order[w] < upper:
+                    parent[w] = node
+                    stack.append(w)
+        self.stats['nodes_visited'] += len(visited)
+        return visited, None
+
+    def _search_backward(self, start, lower):
+        """Nodes that reach start with order above lower"""
+        seen = {start}
+        stack = [start]
+        visited = []
+        while stack:
+            node = stack.pop()
+            visited.append(node)
+            for w in self.pred.get(node, ()):
+                if w not in seen and self.order[w] > lower:
+                    seen.add(w)
+                    stack.append(w)
+        self.stats['nodes_visited'] += len(visited)
+        return visited
+
+    def _reorder(self, backward, forward):
+        """Give the backward set the lowest of the affected slots and the forward set the rest"""
+        self.stats['reorders'] += 1
+        backward.sort(key=self.order.__getitem__)
+        forward.sort(key=self.order.__getitem__)
+        nodes = backward + forward
+        slots = sorted(self.order[n] for n in nodes)
+        for node, slot in zip(nodes, slots):
+            self.order[node] = slot
+
+    # Simulator-level operations
+    def request(self, pid, rid, reject=False):
+        """pid starts waiting for rid. Returns the cycle it would close, or None"""
+        if f"R{rid}" in self.multi_unit:
+            return None
+        return self.add_edge(f"P{pid}", f"R{rid}", keep_if_cyclic=not reject)
+
+    def allocate(self, pid, rid):
+        """rid is granted to pid (replacing its request edge). Returns a closed cycle, or None"""
+        if f"R{rid}" in self.multi_unit:
+            return None
+        self.remove_edge(f"P{pid}", f"R{rid}")
+        return self.add_edge(f"R{rid}", f"P{pid}")
+
+    def release(self, pid, rid):
+        self.remove_edge(f"R{rid}", f"P{pid}")
+
+    def terminate(self, pid):
+        self.remove_node(f"P{pid}")
+
+    def handle_event(self, action_type, data):
+        """Keep the graph in step with simulator actions (idempotent for edges already added)"""
+        if action_type == 'process_created':
+            self.add_node(f"P{data['pid']}")
+        elif action_type == 'resource_created':
+            self.add_node(f"R{data['rid']}")
+            if data.get('units', 1) > 1:
+                self.multi_unit.add(f"R{data['rid']}")
+        elif action_type == 'resource_waiting':
+            self.request(data['pid'], data['rid'])
+        elif action_type == 'resource_allocated':
+            self.allocate(data['pid'], data['rid'])
+        elif action_type == 'resource_released':
+            self.release(data['pid'], data['rid'])
+        elif action_type == 'process_terminated':
+            self.terminate(data['pid'])
+        elif action_type == 'system_reset':
+            self.reset()
+
+    def get_flagged_cycles(self):
+        """Cycles currently closed by flagged edges"""
+        return list(self.flagged.values())
+
+    def has_deadlock(self):
+        return len(self.flagged) > 0
+
+    def reset(self):
+        self.succ.clear()
+        self.pred.clear()
+        self.order.clear()
+        self.next_order = 0
+        self.flagged.clear()
+        self.multi_unit.clear()
@@ -1,5 +1,7 @@
 import json
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from enum import IntEnum
 
 class Process:
     def __init__(self, pid, name, priority=1):
@@ -95,26 +97,158 @@ class Process:
         return f"Process(pid={self.pid}, name={self.name}, state={self.state})"
 
 
+class ProcessState(IntEnum):
+    READY = 0
+    RUNNING = 1
+    WAITING = 2
+    TERMINATED = 3
+
+STATE_NAMES = tuple(state.name.lower() for state in ProcessState)
+STATE_CODES = {name: ProcessState(code) for code, name in enumerate(STATE_NAMES)}
+
+
+def without(items, item):
+    """Copy of the tuple items with the first occurrence of item removed"""
+    i = items.index(item)
+    return items[:i] + items[i + 1:]
+
+
+class CompactProcess:
+    """Slotted, quiet variant of Process for large simulations
+    
+    The state is an integer ProcessState (exposed as the usual string through the
+    state property), timestamps are time.monotonic() floats, and the allocated and
+    requested resource sets are small tuples of rids (the shared empty tuple when
+    unused). Same methods and to_dict() as Process, without the per-transition print.
+    """
+    __slots__ = ('pid', 'name', 'priority', 'state_code', 'allocated_resources', 'requested_resources',
+                 'created_at', 'last_state_change')
+    # never accumulated in this codebase, so shared class-level zeros instead of slots
+    execution_time = 0
+    waiting_time = 0
+    
+    def __init__(self, pid, name, priority=1):
+        self.pid = pid
+        self.name = name
+        self.priority = priority
+        self.state_code = ProcessState.READY
+        self.allocated_resources = ()
+        self.requested_resources = ()
+        self.created_at = self.last_state_change = time.monotonic()
+    
+    @property
+    def state(self):
+        return STATE_NAMES[self.state_code]
+    
+    @state.setter
+    def state(self, new_state):
+        # the simulator assigns state directly, so timing is tracked here as in set_state
+        self.state_code = STATE_CODES[new_state]
+        self.last_state_change = time.monotonic()
+    
+    def set_state(self, new_state):
+        """Update process state and track timing"""
+        self.state = new_state
+        return True
+    
+    # Raw set updates (no state change)
+    def add_allocated(self, resource_id):
+        self.allocated_resources += (resource_id,)
+    
+    def remove_allocated(self, resource_id):
+        self.allocated_resources = without(self.allocated_resources, resource_id)
+    
+    def add_requested(self, resource_id):
+        self.requested_resources += (resource_id,)
+    
+    def remove_requested(self, resource_id):
+        self.requested_resources = without(self.requested_resources, resource_id)
+    
+    def allocate_resource(self, resource_id):
+        """Allocate a resource to this process"""
+        if resource_id not in self.allocated_resources:
+            self.add_allocated(resource_id)
+            self.set_state("running")
+            return True
+        return False
+    
+    def release_resource(self, resource_id):
+        """Release a resource from this process"""
+        if resource_id in self.allocated_resources:
+            self.remove_allocated(resource_id)
+            if not self.allocated_resources and self.state_code == ProcessState.RUNNING:
+                self.set_state("ready")
+            return True
+        return False
+    
+    def request_resource(self, resource_id):
+        """Request a resource"""
+        if resource_id not in self.requested_resources:
+            self.add_requested(resource_id)
+            self.set_state("waiting")
+            return True
+        return False
+    
+    def cancel_request(self, resource_id):
+        """Cancel a resource request"""
+        if resource_id in self.requested_resources:
+            self.remove_requested(resource_id)
+            if not self.requested_resources and not self.allocated_resources:
+                self.set_state("ready")
+            return True
+        return False
+    
+    def terminate(self):
+        """Terminate the process"""
+        self.set_state("terminated")
+        self.allocated_resources = ()
+        self.requested_resources = ()
+        return True
+    
+    def get_waiting_time(self):
+        """Calculate total waiting time"""
+        if self.state_code == ProcessState.WAITING:
+            return self.waiting_time + (time.monotonic() - self.last_state_change)
+        return self.waiting_time
+    
+    def to_dict(self):
+        """Convert process to dictionary for JSON serialization"""
+        return {
+            "pid": self.pid,
+            "name": self.name,
+            "state": self.state,
+            "priority": self.priority,
+            "allocated_resources": list(self.allocated_resources),
+            "requested_resources": list(self.requested_resources),
+            "created_at": (datetime.now() - timedelta(seconds=time.monotonic() - self.created_at)).isoformat(),
+            "waiting_time": self.get_waiting_time(),
+            "execution_time": self.execution_time
+        }
+    
+    def __repr__(self):
+        return f"CompactProcess(pid={self.pid}, name={self.name}, state={self.state})"
+
+
 class ProcessManager:
     """Manages all processes in the system"""
     
-    def __init__(self):
+    def __init__(self, compact=False):
+        self.process_class = CompactProcess if compact else Process
         self.processes = []
+        self.process_index = {}  # pid -> Process
         self.next_pid = 1
     
     def create_process(self, name, priority=1):
         """Create a new process"""
-        process = Process(self.next_pid, name, priority)
+        process = self.process_class(self.next_pid, name, priority)
         self.processes.append(process)
+        self.process_index[process.pid] = process
         self.next_pid += 1
         return process
     
     def get_process(self, pid):
         """Get process by PID"""
-        for process in self.processes:
-            if process.pid == pid:
-                return process
-        return None
+        return self.process_index.get(pid)
     
     def get_processes_by_state(self, state):
         """Get all processes in a specific state"""
@@ -138,6 +272,7 @@ class ProcessManager:
     def reset(self):
         """Reset all processes"""
         self.processes.clear()
+        self.process_index.clear()
         self.next_pid = 1
     
     def to_dict(self):
@@ -1,27 +1,39 @@
 import json
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from .wait_queue import WaitQueue, WaitStats, create_wait_queue
 
 class Resource:
-    def __init__(self, rid, name, resource_type="binary"):
+    units = 1  # multi-unit resources are CountingResource
+    
+    def __init__(self, rid, name, resource_type="binary", wakeup_policy='fifo'):
         self.rid = rid
         self.name = name
         self.resource_type = resource_type  # binary, counting, etc.
         self.available = True
         self.held_by = None  # PID of process holding this resource
-        self.waiting_queue = []  # List of PIDs waiting for this resource
+        # PIDs waiting for this resource, ordered by the wakeup policy (fifo, priority, aging)
+        self.waiting_queue = create_wait_queue(wakeup_policy)
         self.created_at = datetime.now()
         self.usage_count = 0
+        # called as listener(resource, old_holder, new_holder) when held_by changes
+        self.holder_listener = None
+        
+    def _set_holder(self, process_id):
+        previous_holder = self.held_by
+        self.held_by = process_id
+        if self.holder_listener:
+            self.holder_listener(self, previous_holder, process_id)
         
     def allocate(self, process_id):
         """Allocate resource to a process"""
         if self.available:
             self.available = False
-            self.held_by = process_id
+            self._set_holder(process_id)
             self.usage_count += 1
             
             # Remove from waiting queue if present
-            if process_id in self.waiting_queue:
-                self.waiting_queue.remove(process_id)
+            self.waiting_queue.take(process_id)
                 
             print(f"Resource {self.rid} allocated to Process {process_id}")
             return True
@@ -32,30 +44,26 @@ class Resource:
         if not self.available:
             previous_holder = self.held_by
             self.available = True
-            self.held_by = None
+            self._set_holder(None)
             print(f"Resource {self.rid} released by Process {previous_holder}")
             return previous_holder
         return None
     
-    def add_to_waiting_queue(self, process_id):
+    def add_to_waiting_queue(self, process_id, priority=1):
         """Add process to waiting queue"""
-        if process_id not in self.waiting_queue:
-            self.waiting_queue.append(process_id)
-            return True
-        return False
+        return self.waiting_queue.append(process_id, priority)
     
     def remove_from_waiting_queue(self, process_id):
         """Remove process from waiting queue"""
-        if process_id in self.waiting_queue:
-            self.waiting_queue.remove(process_id)
-            return True
-        return False
+        return self.waiting_queue.remove(process_id)
     
     def get_next_waiting_process(self):
-        """Get the next process in waiting queue (FIFO)"""
-        if self.waiting_queue:
-            return self.waiting_queue[0]
-        return None
+        """Get the process the wakeup policy serves next"""
+        return self.waiting_queue.peek()
+    
+    def wait_stats(self):
+        """Wait times of the processes that got the resource after queueing"""
+        return self.waiting_queue.stats.to_dict()
     
     def is_available(self):
         """Check if resource is available"""
@@ -77,8 +85,10 @@ class Resource:
             "type": self.resource_type,
             "available": self.available,
             "held_by": self.held_by,
-            "waiting_queue": self.waiting_queue.copy(),
+            "waiting_queue": list(self.waiting_queue),
             "waiting_count": len(self.waiting_queue),
+            "wakeup_policy": self.waiting_queue.policy,
+            "wait_stats": self.wait_stats(),
             "usage_count": self.usage_count,
             "created_at": self.created_at.isoformat()
         }
@@ -91,26 +101,258 @@ class Resource:
         return f"Resource(rid={self.rid}, name={self.name}, available={self.available})"
 
 
+class CompactResource:
+    """Slotted, quiet variant of Resource for large simulations
+    
+    available is derived from held_by instead of stored, the waiting queue is only
+    allocated once a process waits and created_at is a time.monotonic() float. Same
+    methods and to_dict() as Resource, without the per-operation print.
+    """
+    __slots__ = ('rid', 'name', 'resource_type', 'held_by', 'waiting_queue', 'wakeup_policy',
+                 'usage_count', 'created_at', 'holder_listener')
+    units = 1
+    
+    def __init__(self, rid, name, resource_type="binary", wakeup_policy='fifo'):
+        self.rid = rid
+        self.name = name
+        self.resource_type = resource_type
+        self.held_by = None
+        self.waiting_queue = ()
+        self.wakeup_policy = wakeup_policy
+        self.usage_count = 0
+        self.created_at = time.monotonic()
+        self.holder_listener = None
+    
+    @property
+    def available(self):
+        return self.held_by is None
+    
+    def _set_holder(self, process_id):
+        previous_holder = self.held_by
+        self.held_by = process_id
+        if self.holder_listener:
+            self.holder_listener(self, previous_holder, process_id)
+    
+    def allocate(self, process_id):
+        """Allocate resource to a process"""
+        if self.held_by is None:
+            self._set_holder(process_id)
+            self.usage_count += 1
+            if process_id in self.waiting_queue:
+                self.waiting_queue.take(process_id)
+            return True
+        return False
+    
+    def release(self):
+        """Release the resource"""
+        previous_holder = self.held_by
+        if previous_holder is not None:
+            self._set_holder(None)
+        return previous_holder
+    
+    def add_to_waiting_queue(self, process_id, priority=1):
+        """Add process to waiting queue"""
+        if not isinstance(self.waiting_queue, WaitQueue):
+            self.waiting_queue = create_wait_queue(self.wakeup_policy)
+        return self.waiting_queue.append(process_id, priority)
+    
+    def remove_from_waiting_queue(self, process_id):
+        """Remove process from waiting queue"""
+        return process_id in self.waiting_queue and self.waiting_queue.remove(process_id)
+    
+    def get_next_waiting_process(self):
+        """Get the process the wakeup policy serves next"""
+        return self.waiting_queue.peek() if self.waiting_queue else None
+    
+    def wait_stats(self):
+        queue = self.waiting_queue
+        return (queue.stats if isinstance(queue, WaitQueue) else WaitStats()).to_dict()
+    
+    def is_available(self):
+        return self.held_by is None
+    
+    def get_holder(self):
+        return self.held_by
+    
+    def get_waiting_count(self):
+        return len(self.waiting_queue)
+    
+    def to_dict(self):
+        """Convert resource to dictionary for JSON serialization"""
+        return {
+            "rid": self.rid,
+            "name": self.name,
+            "type": self.resource_type,
+            "available": self.available,
+            "held_by": self.held_by,
+            "waiting_queue": list(self.waiting_queue),
+            "waiting_count": len(self.waiting_queue),
+            "wakeup_policy": self.waiting_queue.policy if isinstance(self.waiting_queue, WaitQueue) else self.wakeup_policy,
+            "wait_stats": self.wait_stats(),
+            "usage_count": self.usage_count,
+            "created_at": (datetime.now() - timedelta(seconds=time.monotonic() - self.created_at)).isoformat()
+        }
+    
+    def __repr__(self):
+        return f"CompactResource(rid={self.rid}, name={self.name}, available={self.available})"
+
+
+class CountingResource:
+    """Resource made of `units` identical units (connection pool, buffer slots)
+    
+    Any number of processes can hold units at the same time: holders maps pid -> units
+    held and pending maps each waiting pid to the units it asked for. held_by lists the
+    holding pids (None when no unit is held) so views written for binary resources keep
+    working. Slotted and quiet like CompactResource.
+    """
+    __slots__ = ('rid', 'name', 'resource_type', 'units', 'free_units', 'holders', 'pending',
+                 'waiting_queue', 'usage_count', 'created_at', 'holder_listener')
+    
+    def __init__(self, rid, name, resource_type="counting", units=1, wakeup_policy='fifo'):
+        if units < 1:
+            raise ValueError(f"a resource needs at least one unit, got {units}")
+        self.rid = rid
+        self.name = name
+        self.resource_type = resource_type
+        self.units = units
+        self.free_units = units
+        self.holders = {}
+        self.pending = {}
+        self.waiting_queue = create_wait_queue(wakeup_policy)
+        self.usage_count = 0
+        self.created_at = time.monotonic()
+        # called as listener(resource, old_holder, new_holder) when a pid starts or stops holding units
+        self.holder_listener = None
+    
+    @property
+    def available(self):
+        return self.free_units > 0
+    
+    @property
+    def held_by(self):
+        return sorted(self.holders) or None
+    
+    def allocate(self, process_id, count=1):
+        """Grant count units to a process if they are all free"""
+        if count > self.free_units:
+            return False
+        self.free_units -= count
+        held = self.holders.get(process_id, 0)
+        self.holders[process_id] = held + count
+        self.usage_count += 1
+        self.pending.pop(process_id, None)
+        self.waiting_queue.take(process_id)
+        if not held and self.holder_listener:
+            self.holder_listener(self, None, process_id)
+        return True
+    
+    def release(self, process_id, count=None):
+        """Return count units held by a process (all of them by default). Returns the units released"""
+        if count is not None and (not isinstance(count, int) or isinstance(count, bool) or count < 1):
+            raise ValueError(f"cannot release {count!r} unit(s), the count must be a positive integer")
+        held = self.holders.get(process_id, 0)
+        count = held if count is None else min(count, held)
+        if not count:
+            return 0
+        self.free_units += count
+        if count == held:
+            del self.holders[process_id]
+            if self.holder_listener:
+                self.holder_listener(self, process_id, None)
+        else:
+            self.holders[process_id] = held - count
+        return count
+    
+    def units_held(self, process_id):
+        return self.holders.get(process_id, 0)
+    
+    def add_to_waiting_queue(self, process_id, count=1, priority=1):
+        """Add process to waiting queue (a repeated call updates the units it waits for)"""
+        self.pending[process_id] = count
+        return self.waiting_queue.append(process_id, priority)
+    
+    def remove_from_waiting_queue(self, process_id):
+        """Remove process from waiting queue"""
+        self.pending.pop(process_id, None)
+        return self.waiting_queue.remove(process_id)
+    
+    def get_next_waiting_process(self):
+        """Get the process the wakeup policy serves next"""
+        return self.waiting_queue.peek()
+    
+    def wait_stats(self):
+        return self.waiting_queue.stats.to_dict()
+    
+    def is_available(self):
+        return self.free_units > 0
+    
+    def get_holder(self):
+        return self.held_by
+    
+    def get_waiting_count(self):
+        return len(self.waiting_queue)
+    
+    def to_dict(self):
+        """Convert resource to dictionary for JSON serialization"""
+        return {
+            "rid": self.rid,
+            "name": self.name,
+            "type": self.resource_type,
+            "available": self.available,
+            "held_by": self.held_by,
+            "units": self.units,
+            "available_units": self.free_units,
+            "holders": dict(sorted(self.holders.items())),
+            "waiting_queue": list(self.waiting_queue),
+            "pending": {pid: self.pending[pid] for pid in self.waiting_queue},
+            "waiting_count": len(self.waiting_queue),
+            "wakeup_policy": self.waiting_queue.policy,
+            "wait_stats": self.wait_stats(),
+            "usage_count": self.usage_count,
+            "created_at": (datetime.now() - timedelta(seconds=time.monotonic() - self.created_at)).isoformat()
+        }
+    
+    def __repr__(self):
+        return f"CountingResource(rid={self.rid}, name={self.name}, free={self.free_units}/{self.units})"
+
+
 class ResourceManager:
     """Manages all resources in the system"""
     
-    def __init__(self):
+    def __init__(self, compact=False, wakeup_policy='fifo'):
+        self.resource_class = CompactResource if compact else Resource
+        self.wakeup_policy = wakeup_policy
         self.resources = []
+        self.resource_index = {}  # rid -> Resource
+        self.holder_index = {}  # pid -> set of rids held
         self.next_rid = 1
     
-    def create_resource(self, name, resource_type="binary"):
-        """Create a new resource"""
-        resource = Resource(self.next_rid, name, resource_type)
+    def create_resource(self, name, resource_type="binary", units=1):
+        """Create a new resource (a CountingResource when it has several units)"""
+        if units > 1:
+            resource = CountingResource(self.next_rid, name, "counting", units, self.wakeup_policy)
+        else:
+            resource = self.resource_class(self.next_rid, name, resource_type, self.wakeup_policy)
+        resource.holder_listener = self._on_holder_change
         self.resources.append(resource)
+        self.resource_index[resource.rid] = resource
         self.next_rid += 1
         return resource
     
+    def _on_holder_change(self, resource, old_holder, new_holder):
+        """Keep holder_index in step with Resource.allocate/release"""
+        if old_holder is not None:
+            held = self.holder_index.get(old_holder)
+            if held is not None:
+                held.discard(resource.rid)
+                if not held:
+                    del self.holder_index[old_holder]
+        if new_holder is not None:
+            self.holder_index.setdefault(new_holder, set()).add(resource.rid)
+    
     def get_resource(self, rid):
         """Get resource by RID"""
-        for resource in self.resources:
-            if resource.rid == rid:
-                return resource
-        return None
+        return self.resource_index.get(rid)
     
     def get_available_resources(self):
         """Get all available resources"""
@@ -120,16 +362,18 @@ class ResourceManager:
         """Get all allocated resources"""
         return [r for r in self.resources if not r.available]
     
-    def release_resource(self, rid):
-        """Release a resource"""
+    def release_resource(self, rid, process_id=None, count=None):
+        """Release a resource (a CountingResource needs the process and optionally the units)"""
         resource = self.get_resource(rid)
         if resource:
+            if resource.units > 1:
+                return resource.release(process_id, count)
             return resource.release()
         return None
     
     def get_resources_by_holder(self, process_id):
         """Get all resources held by a specific process"""
-        return [r for r in self.resources if r.held_by == process_id]
+        return [self.resource_index[rid] for rid in sorted(self.holder_index.get(process_id, ()))]
     
     def get_all_resources(self):
         """Get all resources"""
@@ -139,9 +383,15 @@ class ResourceManager:
         """Get total number of resources"""
         return len(self.resources)
     
+    def wait_stats(self):
+        """Wait-time statistics of every resource's queue"""
+        return {r.rid: r.wait_stats() for r in self.resources}
+    
     def reset(self):
         """Reset all resources"""
         self.resources.clear()
+        self.resource_index.clear()
+        self.holder_index.clear()
         self.next_rid = 1
     
     def to_dict(self):
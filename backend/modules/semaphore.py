@@ -1,12 +1,18 @@
+from .wait_queue import WaitQueue, WaitStats, create_wait_queue
+
 class BinarySemaphore:
-    """Binary semaphore implementation for resource management"""
+    """Binary semaphore implementation for resource management
+    
+    wakeup_policy picks which waiter signal() wakes: 'fifo', 'priority' or 'aging'
+    (see wait_queue.WAKEUP_POLICIES), or a factory returning a wait queue.
+    """
     
-    def __init__(self, initial_value=1):
+    def __init__(self, initial_value=1, wakeup_policy='fifo'):
         self.value = initial_value  # 0 or 1
-        self.waiting_queue = []  # List of process IDs waiting for the semaphore
+        self.waiting_queue = create_wait_queue(wakeup_policy)  # process IDs waiting for the semaphore
         self.name = "BinarySemaphore"
         
-    def wait(self, process_id):
+    def wait(self, process_id, priority=1):
         """P operation - Request semaphore"""
         if self.value == 1:
             self.value = 0
@@ -15,15 +21,15 @@ class BinarySemaphore:
         else:
             # Add to waiting queue if not already there
             if process_id not in self.waiting_queue:
-                self.waiting_queue.append(process_id)
+                self.waiting_queue.append(process_id, priority)
                 print(f"Process {process_id} added to semaphore waiting queue")
             return False
     
     def signal(self):
         """V operation - Release semaphore"""
         if self.waiting_queue:
-            # Wake up the first process in the queue
-            next_process = self.waiting_queue.pop(0)
+            # Wake up the process the wakeup policy picks
+            next_process = self.waiting_queue.popleft()
             print(f"Semaphore released, waking up Process {next_process}")
             return next_process
         else:
@@ -31,10 +37,18 @@ class BinarySemaphore:
             print("Semaphore released, no processes waiting")
             return None
     
+    def cancel(self, process_id):
+        """Withdraw a waiting process from the queue"""
+        return self.waiting_queue.remove(process_id)
+    
     def get_waiting_count(self):
         """Get number of processes waiting"""
         return len(self.waiting_queue)
     
+    def wait_stats(self):
+        """Wait times of the processes woken so far"""
+        return self.waiting_queue.stats.to_dict()
+    
     def is_available(self):
         """Check if semaphore is available"""
         return self.value == 1
@@ -43,21 +57,160 @@ class BinarySemaphore:
         """Convert semaphore to dictionary"""
         return {
             "value": self.value,
-            "waiting_queue": self.waiting_queue.copy(),
+            "waiting_queue": list(self.waiting_queue),
+            "waiting_count": len(self.waiting_queue),
+            "available": self.is_available(),
+            "wakeup_policy": self.waiting_queue.policy,
+            "wait_stats": self.wait_stats()
+        }
+
+
+class CompactBinarySemaphore:
+    """Slotted, quiet variant of BinarySemaphore: the waiting queue is only allocated once someone waits"""
+    __slots__ = ('value', 'waiting_queue', 'wakeup_policy')
+    name = "BinarySemaphore"
+    
+    def __init__(self, initial_value=1, wakeup_policy='fifo'):
+        self.value = initial_value
+        self.waiting_queue = ()
+        self.wakeup_policy = wakeup_policy
+    
+    def wait(self, process_id, priority=1):
+        """P operation - Request semaphore"""
+        if self.value == 1:
+            self.value = 0
+            return True
+        if not isinstance(self.waiting_queue, WaitQueue):
+            self.waiting_queue = create_wait_queue(self.wakeup_policy)
+        self.waiting_queue.append(process_id, priority)
+        return False
+    
+    def signal(self):
+        """V operation - Release semaphore"""
+        if self.waiting_queue:
+            return self.waiting_queue.popleft()
+        self.value = 1
+        return None
+    
+    def cancel(self, process_id):
+        return process_id in self.waiting_queue and self.waiting_queue.remove(process_id)
+    
+    def get_waiting_count(self):
+        return len(self.waiting_queue)
+    
+    def wait_stats(self):
+        queue = self.waiting_queue
+        return (queue.stats if isinstance(queue, WaitQueue) else WaitStats()).to_dict()
+    
+    def is_available(self):
+        return self.value == 1
+    
+    def to_dict(self):
+        """Convert semaphore to dictionary"""
+        queue = self.waiting_queue
+        return {
+            "value": self.value,
+            "waiting_queue": list(queue),
+            "waiting_count": len(queue),
+            "available": self.is_available(),
+            "wakeup_policy": queue.policy if isinstance(queue, WaitQueue) else self.wakeup_policy,
+            "wait_stats": self.wait_stats()
+        }
+
+
+class CountingSemaphore:
+    """Counting semaphore over `units` identical units with batched P(k)/V(k)
+    
+    A waiter asks for a number of units at once. signal(k) hands the returned units to
+    waiters in strict wakeup-policy order: it stops at the first waiter whose request
+    does not fit yet, so only the woken waiters are looked at (no scan of the queue)
+    and a large request cannot be starved by smaller ones behind it. For the same
+    reason wait() does not grant past queued waiters.
+    """
+    
+    def __init__(self, units, initial_value=None, wakeup_policy='fifo'):
+        self.units = units
+        self.value = units if initial_value is None else initial_value  # free units
+        self.waiting_queue = create_wait_queue(wakeup_policy)  # process IDs waiting for units
+        self.pending = {}  # process ID -> units it is waiting for
+        self.name = "CountingSemaphore"
+    
+    def wait(self, process_id, count=1, priority=1):
+        """P(count) - take count units at once, or queue until they can all be granted"""
+        if count < 1 or count > self.units:
+            raise ValueError(f"cannot wait for {count} of {self.units} units")
+        if self.value >= count and not self.waiting_queue:
+            self.value -= count
+            print(f"Semaphore: {count} unit(s) acquired by Process {process_id}")
+            return True
+        if self.waiting_queue.append(process_id, priority):
+            print(f"Process {process_id} added to semaphore waiting queue for {count} unit(s)")
+        self.pending[process_id] = count
+        return False
+    
+    def signal(self, count=1):
+        """V(count) - return count units. Returns the (process ID, units) pairs woken, in wakeup order"""
+        if count < 1 or self.value + count > self.units:
+            raise ValueError(f"cannot return {count} units with {self.value} of {self.units} free")
+        self.value += count
+        woken = []
+        while self.waiting_queue:
+            process_id = self.waiting_queue.peek()
+            wanted = self.pending[process_id]
+            if wanted > self.value:
+                break
+            self.value -= wanted
+            self.waiting_queue.popleft()
+            del self.pending[process_id]
+            woken.append((process_id, wanted))
+        print(f"Semaphore: {count} unit(s) released, woke {len(woken)} process(es)")
+        return woken
+    
+    def cancel(self, process_id):
+        """Withdraw a waiting process from the queue"""
+        self.pending.pop(process_id, None)
+        return self.waiting_queue.remove(process_id)
+    
+    def get_waiting_count(self):
+        """Get number of processes waiting"""
+        return len(self.waiting_queue)
+    
+    def wait_stats(self):
+        """Wait times of the processes woken so far"""
+        return self.waiting_queue.stats.to_dict()
+    
+    def is_available(self):
+        """Check if at least one unit is free"""
+        return self.value > 0
+    
+    def to_dict(self):
+        """Convert semaphore to dictionary"""
+        return {
+            "value": self.value,
+            "units": self.units,
+            "waiting_queue": list(self.waiting_queue),
+            "pending": {pid: self.pending[pid] for pid in self.waiting_queue},
             "waiting_count": len(self.waiting_queue),
-            "available": self.is_available()
+            "available": self.is_available(),
+            "wakeup_policy": self.waiting_queue.policy,
+            "wait_stats": self.wait_stats()
         }
 
 
 class SemaphoreManager:
     """Manages semaphores for resources"""
     
-    def __init__(self):
-        self.semaphores = {}  # resource_id -> BinarySemaphore
+    def __init__(self, compact=False, wakeup_policy='fifo'):
+        self.semaphore_class = CompactBinarySemaphore if compact else BinarySemaphore
+        self.wakeup_policy = wakeup_policy
+        self.semaphores = {}  # resource_id -> BinarySemaphore or CountingSemaphore
     
-    def create_semaphore(self, resource_id, initial_value=1):
-        """Create a semaphore for a resource"""
-        semaphore = BinarySemaphore(initial_value)
+    def create_semaphore(self, resource_id, initial_value=1, units=1):
+        """Create a semaphore for a resource (a counting one when it has several units)"""
+        if units > 1:
+            semaphore = CountingSemaphore(units, wakeup_policy=self.wakeup_policy)
+        else:
+            semaphore = self.semaphore_class(initial_value, self.wakeup_policy)
         self.semaphores[resource_id] = semaphore
         return semaphore
     
@@ -65,18 +218,36 @@ class SemaphoreManager:
         """Get semaphore for a resource"""
         return self.semaphores.get(resource_id)
     
-    def request_resource(self, resource_id, process_id):
-        """Request resource using semaphore"""
+    def request_resource(self, resource_id, process_id, count=1, priority=1):
+        """Request resource using semaphore (count units at once from a counting semaphore)
+        
+        priority only matters under the 'priority' and 'aging' wakeup policies.
+        """
+        semaphore = self.get_semaphore(resource_id)
+        if semaphore:
+            if count == 1:
+                return semaphore.wait(process_id, priority=priority)
+            return semaphore.wait(process_id, count, priority)
+        return False
+    
+    def cancel_request(self, resource_id, process_id):
+        """Withdraw a process from a semaphore's waiting queue"""
         semaphore = self.get_semaphore(resource_id)
         if semaphore:
-            return semaphore.wait(process_id)
+            return semaphore.cancel(process_id)
         return False
     
-    def release_resource(self, resource_id):
-        """Release resource using semaphore"""
+    def release_resource(self, resource_id, count=1):
+        """Release resource using semaphore
+        
+        Returns the woken process ID (or None) for a binary semaphore, and the list of
+        (process ID, units) woken for a counting one.
+        """
         semaphore = self.get_semaphore(resource_id)
         if semaphore:
-            return semaphore.signal()
+            if count == 1:
+                return semaphore.signal()
+            return semaphore.signal(count)
         return None
     
     def get_semaphore_status(self, resource_id):
@@ -86,6 +257,13 @@ class SemaphoreManager:
             return semaphore.to_dict()
         return None
     
+    def wait_stats(self):
+        """Wait-time statistics of every semaphore's queue"""
+        return {
+            resource_id: semaphore.wait_stats()
+            for resource_id, semaphore in self.semaphores.items()
+        }
+    
     def reset(self):
         """Reset all semaphores"""
         self.semaphores.clear()
@@ -1,29 +1,47 @@
 from datetime import datetime
+from modules.deadlock_detector import DeadlockDetector
+from modules.online_detector import OnlineDeadlockDetector
+from modules.event_log import EventLog
+from modules.process import CompactProcess
+from modules.resource import CompactResource, CountingResource
 
 class SimuLockSimulator:
     """Main simulator class that coordinates all components"""
     
-    def __init__(self):
-        self.simulation_history = []
+    # what request_resource does with a wait that would close a cycle
+    DEADLOCK_POLICIES = ('flag', 'reject')
+    
+    def __init__(self, deadlock_policy='flag', history_capacity=200, wakeup_policy='fifo'):
+        # ring buffer: O(1) appends, the oldest records are overwritten in place
+        self.simulation_history = EventLog(history_capacity)
         self.is_running = False
         self.processes = []
         self.resources = []
+        # pid -> process, rid -> resource (kept in step with the lists above)
+        self.process_index = {}
+        self.resource_index = {}
         self.next_pid = 1
         self.next_rid = 1
+        # order in which waiting processes are served (see wait_queue.WAKEUP_POLICIES)
+        self.wakeup_policy = wakeup_policy
+        # callbacks(action_type, data) fed by record_action
+        self.listeners = []
+        # wait-for graph kept up to date from the action stream instead of rebuilt per check
+        self.deadlock_detector = DeadlockDetector()
+        self.subscribe(self.deadlock_detector.handle_event)
+        # checked on every edge insert, so deadlocks surface on the request that causes them
+        self.deadlock_policy = deadlock_policy
+        self.online_detector = OnlineDeadlockDetector()
+        self.subscribe(self.online_detector.handle_event)
+        # EventKernel driving this simulator in virtual time, if any (it attaches itself)
+        self.event_kernel = None
         
     # Process Management
     def add_process(self, name, priority=1):
         """Add a new process to the simulation"""
-        class SimpleProcess:
-            def __init__(self, pid, name):
-                self.pid = pid
-                self.name = name
-                self.state = "ready"
-                self.allocated_resources = []
-                self.requested_resources = []
-        
-        process = SimpleProcess(self.next_pid, name)
+        process = CompactProcess(self.next_pid, name, priority)
         self.processes.append(process)
+        self.process_index[process.pid] = process
         self.next_pid += 1
         
         self.record_action("process_created", {
@@ -36,58 +54,101 @@ class SimuLockSimulator:
     
     def terminate_process(self, pid):
         """Terminate a process"""
-        success = self.process_manager.terminate_process(pid)
-        if success:
-            # Release all resources held by this process
-            resources = self.resource_manager.get_resources_by_holder(pid)
-            for resource in resources:
-                self.release_resource(pid, resource.rid)
-            
-            self.record_action("process_terminated", {"pid": pid})
+        process = self.process_index.get(pid)
+        if not process or process.state == "terminated":
+            return False
+        
+        # Withdraw its waits first, so releasing below cannot hand units back to it
+        for rid in process.requested_resources:
+            self.resource_index[rid].remove_from_waiting_queue(pid)
+        process.requested_resources = ()
+        # Release all resources held by this process
+        for rid in list(process.allocated_resources):
+            self.release_resource(pid, rid)
+        process.state = "terminated"
         
-        return success
+        self.record_action("process_terminated", {"pid": pid})
+        
+        return True
     
     # Resource Management
-    def add_resource(self, name, resource_type="binary"):
-        """Add a new resource to the simulation"""
-        class SimpleResource:
-            def __init__(self, rid, name):
-                self.rid = rid
-                self.name = name
-                self.available = True
-                self.held_by = None
-        
-        resource = SimpleResource(self.next_rid, name)
+    def add_resource(self, name, resource_type="binary", units=1):
+        """Add a new resource to the simulation (units > 1 makes a counting resource)"""
+        if units > 1:
+            resource_type = "counting"
+            resource = CountingResource(self.next_rid, name, resource_type, units, self.wakeup_policy)
+        elif units == 1:
+            resource = CompactResource(self.next_rid, name, resource_type, self.wakeup_policy)
+        else:
+            raise ValueError(f"a resource needs at least one unit, got {units}")
         self.resources.append(resource)
+        self.resource_index[resource.rid] = resource
         self.next_rid += 1
         
-        self.record_action("resource_created", {
+        data = {
             "rid": resource.rid,
             "name": name,
             "type": resource_type
-        })
+        }
+        if units > 1:
+            data["units"] = units
+        self.record_action("resource_created", data)
         
         return resource
     
-    def request_resource(self, process_id, resource_id):
-        """Request a resource for a process"""
-        process = next((p for p in self.processes if p.pid == process_id), None)
-        resource = next((r for r in self.resources if r.rid == resource_id), None)
+    def request_resource(self, process_id, resource_id, count=1):
+        """Request a resource for a process (count units of a multi-unit resource)"""
+        process = self.process_index.get(process_id)
+        resource = self.resource_index.get(resource_id)
         
         if not process or not resource:
             return False, "Process or resource not found"
         
-        if resource.available:
-            resource.available = False
-            resource.held_by = process_id
-            process.allocated_resources.append(resource_id)
+        if process.state == "terminated":
+            return False, f"Process {process.name} is terminated"
+        
+        if count < 1 or count > resource.units:
+            return False, f"{process.name} cannot request {count} of the {resource.units} unit(s) of {resource.name}"
+        
+        if resource.units > 1:
+            return self._request_units(process, resource, count)
+        
+        if resource.held_by == process_id:
+            return False, f"{process.name} already holds {resource.name}"
+        
+        if process_id in resource.waiting_queue:
+            return False, f"{process.name} is already waiting for {resource.name}"
+        
+        # a free resource still goes to queued waiters first (release hands it over)
+        if resource.available and not resource.waiting_queue:
+            resource.allocate(process_id)
+            process.add_allocated(resource_id)
+            if resource_id in process.requested_resources:
+                process.remove_requested(resource_id)
             process.state = "running"
             message = f"Resource {resource.name} allocated to {process.name}"
             action_type = "resource_allocated"
             success = True
+            cycle = self.online_detector.allocate(process_id, resource_id)
         else:
+            cycle = self.online_detector.request(process_id, resource_id,
+                                                 reject=self.deadlock_policy == 'reject')
+            if cycle is None and self.deadlock_detector.multi_unit:
+                # the online detector does not see cycles through multi-unit resources
+                cycle = self.deadlock_detector.check_request(process_id, resource_id)
+                if cycle is not None and self.deadlock_policy == 'reject':
+                    self.online_detector.remove_edge(f"P{process_id}", f"R{resource_id}")
+            if cycle is not None and self.deadlock_policy == 'reject':
+                message = f"Request denied: {process.name} waiting for {resource.name} would cause a deadlock"
+                self.record_action("resource_denied", {
+                    "pid": process_id,
+                    "rid": resource_id,
+                    "cycle": cycle
+                })
+                return False, message
+            resource.add_to_waiting_queue(process_id, process.priority)
             process.state = "waiting"
-            process.requested_resources.append(resource_id)
+            process.add_requested(resource_id)
             message = f"{process.name} waiting for {resource.name}"
             action_type = "resource_waiting"
             success = False
@@ -97,13 +158,72 @@ class SimuLockSimulator:
             "rid": resource_id,
             "success": success
         })
+        if cycle is None and success and process.requested_resources and self.deadlock_detector.multi_unit:
+            cycle = self.deadlock_detector.check_request(process_id)
+        
+        if cycle is not None:
+            self.record_action("deadlock_detected", {
+                "deadlocks": [cycle],
+                "total_deadlocks": 1,
+                "online": True
+            })
         
         return success, message
     
-    def release_resource(self, process_id, resource_id):
-        """Release a resource from a process"""
-        process = next((p for p in self.processes if p.pid == process_id), None)
-        resource = next((r for r in self.resources if r.rid == resource_id), None)
+    def _request_units(self, process, resource, count):
+        """request_resource for a multi-unit resource
+        
+        The units are granted all at once or not at all, and not past other queued
+        waiters. A wait is checked by reducing the wait-for graph, since a cycle alone
+        does not make a deadlock here.
+        """
+        if resource.units_held(process.pid) + count > resource.units:
+            return False, f"{process.name} cannot hold more than the {resource.units} unit(s) of {resource.name}"
+        data = {
+            "pid": process.pid,
+            "rid": resource.rid,
+            "count": count
+        }
+        queue = resource.waiting_queue
+        if (not queue or queue.peek() == process.pid) and resource.allocate(process.pid, count):
+            if resource.rid not in process.allocated_resources:
+                process.add_allocated(resource.rid)
+            if resource.rid in process.requested_resources:
+                process.remove_requested(resource.rid)
+            process.state = "running"
+            self.record_action("resource_allocated", dict(data, success=True))
+            # units granted to a process that still waits elsewhere can close a cycle
+            cycle = self.deadlock_detector.check_request(process.pid) if process.requested_resources else None
+            if cycle is not None:
+                self.record_action("deadlock_detected", {
+                    "deadlocks": [cycle],
+                    "total_deadlocks": 1,
+                    "online": True
+                })
+            return True, f"{count} unit(s) of {resource.name} allocated to {process.name}"
+        
+        cycle = self.deadlock_detector.check_request(process.pid, resource.rid, count)
+        if cycle is not None and self.deadlock_policy == 'reject':
+            self.record_action("resource_denied", dict(data, cycle=cycle))
+            return False, f"Request denied: {process.name} waiting for {resource.name} would cause a deadlock"
+        
+        resource.add_to_waiting_queue(process.pid, count, process.priority)
+        if resource.rid not in process.requested_resources:
+            process.add_requested(resource.rid)
+        process.state = "waiting"
+        self.record_action("resource_waiting", dict(data, success=False))
+        if cycle is not None:
+            self.record_action("deadlock_detected", {
+                "deadlocks": [cycle],
+                "total_deadlocks": 1,
+                "online": True
+            })
+        return False, f"{process.name} waiting for {count} unit(s) of {resource.name}"
+    
+    def release_resource(self, process_id, resource_id, count=None):
+        """Release a resource from a process (count units of a multi-unit resource, all by default)"""
+        process = self.process_index.get(process_id)
+        resource = self.resource_index.get(resource_id)
         
         if not process or not resource:
             return False, "Process or resource not found"
@@ -111,19 +231,75 @@ class SimuLockSimulator:
         if resource_id not in process.allocated_resources:
             return False, f"Process {process.name} doesn't hold resource {resource.name}"
         
-        process.allocated_resources.remove(resource_id)
-        resource.available = True
-        resource.held_by = None
-        process.state = "ready"
-        
-        message = f"Resource {resource.name} released by {process.name}"
-        self.record_action("resource_released", {
+        data = {
             "pid": process_id,
             "rid": resource_id
-        })
+        }
+        if resource.units > 1:
+            try:
+                data["count"] = resource.release(process_id, count)
+            except ValueError as e:
+                return False, str(e)
+            if not resource.units_held(process_id):
+                process.remove_allocated(resource_id)
+            message = f"{data['count']} unit(s) of {resource.name} released by {process.name}"
+        else:
+            process.remove_allocated(resource_id)
+            resource.release()
+            message = f"Resource {resource.name} released by {process.name}"
+        process.state = "ready"
+        
+        self.record_action("resource_released", data)
+        self._hand_over(resource)
         
         return True, message
     
+    def _queue_wait(self, resource, pid, count=None):
+        """Put pid on resource's wait queue at its priority (count units of a multi-unit resource)"""
+        priority = self.process_index[pid].priority
+        if count is None:
+            resource.add_to_waiting_queue(pid, priority)
+        else:
+            resource.add_to_waiting_queue(pid, count, priority)
+    
+    def _hand_over(self, resource):
+        """Grant freed units to the waiters the wakeup policy serves first
+        
+        Strict policy order: the first waiter whose request does not fit stops the
+        hand-over. Each grant ends that wait through WaitQueue.take (so it counts in the
+        queue's wait statistics) and is recorded as a resource_allocated action marked
+        handoff, which the detectors and listeners apply like any other grant.
+        """
+        while resource.waiting_queue:
+            pid = resource.get_next_waiting_process()
+            process = self.process_index[pid]
+            data = {
+                "pid": pid,
+                "rid": resource.rid
+            }
+            if resource.units > 1:
+                data["count"] = resource.pending[pid]
+                if not resource.allocate(pid, data["count"]):
+                    break
+            elif not resource.allocate(pid):
+                break
+            if resource.rid not in process.allocated_resources:
+                process.add_allocated(resource.rid)
+            if resource.rid in process.requested_resources:
+                process.remove_requested(resource.rid)
+            process.state = "waiting" if process.requested_resources else "running"
+            cycle = self.online_detector.allocate(pid, resource.rid)
+            self.record_action("resource_allocated", dict(data, success=True, handoff=True))
+            # units granted to a process that still waits elsewhere can close a cycle
+            if cycle is None and process.requested_resources and self.deadlock_detector.multi_unit:
+                cycle = self.deadlock_detector.check_request(pid)
+            if cycle is not None:
+                self.record_action("deadlock_detected", {
+                    "deadlocks": [cycle],
+                    "total_deadlocks": 1,
+                    "online": True
+                })
+    
     # Deadlock Detection
     def detect_deadlocks(self):
         """Detect deadlocks in the current system state"""
@@ -132,11 +308,13 @@ class SimuLockSimulator:
         for p in self.processes:
             if p.state == "waiting" and p.requested_resources:
                 for req_rid in p.requested_resources:
-                    resource = next((r for r in self.resources if r.rid == req_rid), None)
+                    resource = self.resource_index.get(req_rid)
                     if resource and resource.held_by:
-                        holder = next((pp for pp in self.processes if pp.pid == resource.held_by), None)
-                        if holder and holder.state == "waiting":
-                            deadlocks.append([p.name, holder.name])
+                        holders = resource.held_by if resource.units > 1 else [resource.held_by]
+                        for holder_pid in holders:
+                            holder = self.process_index.get(holder_pid)
+                            if holder and holder.state == "waiting":
+                                deadlocks.append([p.name, holder.name])
         
         result = {
             'has_deadlock': len(deadlocks) > 0,
@@ -151,33 +329,62 @@ class SimuLockSimulator:
         
         return result
     
+    def analyze_deadlocks(self, include_graph=True):
+        """Wait-for graph deadlock analysis on the incrementally maintained graph"""
+        return self.deadlock_detector.detect_incremental(include_graph=include_graph)
+    
     # System State Management
     def get_system_state(self):
         """Get complete system state"""
         return {
-            "processes": [{
-                "pid": p.pid,
-                "name": p.name,
-                "state": p.state,
-                "allocated_resources": p.allocated_resources,
-                "requested_resources": p.requested_resources
-            } for p in self.processes],
-            "resources": [{
-                "rid": r.rid,
-                "name": r.name,
-                "available": r.available,
-                "held_by": r.held_by
-            } for r in self.resources],
+            "processes": [self.process_state(p) for p in self.processes],
+            "resources": [self.resource_state(r) for r in self.resources],
             "timestamp": datetime.now().isoformat()
         }
     
+    def process_state(self, process):
+        """Serializable view of one process"""
+        return {
+            "pid": process.pid,
+            "name": process.name,
+            "state": process.state,
+            "allocated_resources": list(process.allocated_resources),
+            "requested_resources": list(process.requested_resources)
+        }
+    
+    def resource_state(self, resource):
+        """Serializable view of one resource"""
+        state = {
+            "rid": resource.rid,
+            "name": resource.name,
+            "available": resource.available,
+            "held_by": resource.held_by
+        }
+        if resource.units > 1:
+            state["units"] = resource.units
+            state["available_units"] = resource.free_units
+            state["holders"] = dict(sorted(resource.holders.items()))
+        return state
+    
+    def has_deadlock(self):
+        """Whether the current state holds a deadlock (cheap unless multi-unit resources exist)"""
+        if self.online_detector.has_deadlock():
+            return True
+        if self.deadlock_detector.multi_unit:
+            return self.analyze_deadlocks(include_graph=False)['has_deadlock']
+        return False
+    
+    def get_processes_by_state(self, state):
+        """Processes in the given state"""
+        return [p for p in self.processes if p.state == state]
+    
     def get_system_statistics(self):
         """Get system statistics"""
         running_processes = len([p for p in self.processes if p.state == "running"])
         waiting_processes = len([p for p in self.processes if p.state == "waiting"])
         available_resources = len([r for r in self.resources if r.available])
         
-        return {
+        statistics = {
             "total_processes": len(self.processes),
             "total_resources": len(self.resources),
             "running_processes": running_processes,
@@ -185,28 +392,38 @@ class SimuLockSimulator:
             "available_resources": available_resources,
             "system_utilization": (running_processes / len(self.processes)) * 100 if self.processes else 0
         }
+        if self.event_kernel is not None:
+            statistics["virtual_time"] = self.event_kernel.metrics()
+        return statistics
+    
+    def get_wait_statistics(self):
+        """Wait-time statistics of every resource's waiting queue under the wakeup policy"""
+        return {
+            "wakeup_policy": self.wakeup_policy,
+            "resources": {r.rid: r.wait_stats() for r in self.resources}
+        }
     
     def record_action(self, action_type, data):
         """Record simulation action for history"""
-        action_record = {
-            "timestamp": datetime.now().isoformat(),
-            "action": action_type,
-            "data": data
-        }
-        self.simulation_history.append(action_record)
+        self.simulation_history.append(action_type, data)
         
-        # Keep only last 200 records
-        if len(self.simulation_history) > 200:
-            self.simulation_history = self.simulation_history[-200:]
+        for listener in self.listeners:
+            listener(action_type, data)
+    
+    def subscribe(self, listener):
+        """Register listener(action_type, data) for every recorded action"""
+        self.listeners.append(listener)
     
     def get_simulation_history(self, limit=50):
         """Get simulation history"""
-        return self.simulation_history[-limit:] if self.simulation_history else []
+        return self.simulation_history.recent(limit)
     
     def reset_simulation(self):
         """Reset the entire simulation"""
         self.processes = []
         self.resources = []
+        self.process_index = {}
+        self.resource_index = {}
         self.next_pid = 1
         self.next_rid = 1
         self.simulation_history.clear()
@@ -215,6 +432,65 @@ class SimuLockSimulator:
         
         return True
     
+    def export_state(self):
+        """Compact snapshot of everything needed to rebuild the simulation"""
+        return {
+            "next_pid": self.next_pid,
+            "next_rid": self.next_rid,
+            "deadlock_policy": self.deadlock_policy,
+            "processes": [[p.pid, p.name, p.state, list(p.allocated_resources), list(p.requested_resources),
+                           p.priority]
+                          for p in self.processes],
+            # multi-unit resources also carry their units, holders and pending requests
+            "resources": [[r.rid, r.name, r.units, sorted(r.holders.items()), sorted(r.pending.items())]
+                          if r.units > 1 else [r.rid, r.name] for r in self.resources]
+        }
+    
+    def load_state(self, state):
+        """Rebuild the simulation from export_state() output
+        
+        Entities are re-created through recorded actions so every listener (detectors,
+        state feed) sees them, then the exact process states are restored.
+        """
+        self.reset_simulation()
+        self.deadlock_policy = state.get("deadlock_policy", self.deadlock_policy)
+        # snapshots from before priorities were exported leave them at the default
+        for pid, name, _, _, _, *priority in state["processes"]:
+            self.next_pid = pid
+            self.add_process(name, *priority)
+        held_units = {}
+        pending_units = {}
+        for rid, name, *counting in state["resources"]:
+            self.next_rid = rid
+            if counting:
+                units, holders, pending = counting
+                self.add_resource(name, units=units)
+                held_units.update(((pid, rid), n) for pid, n in holders)
+                pending_units.update(((pid, rid), n) for pid, n in pending)
+            else:
+                self.add_resource(name)
+        for pid, _, _, allocated, *_ in state["processes"]:
+            for rid in allocated:
+                self.request_resource(pid, rid, held_units.get((pid, rid), 1))
+        for pid, _, _, _, requested, *_ in state["processes"]:
+            # waits are restored as they were, even on resources released since
+            for rid in requested:
+                self.process_index[pid].add_requested(rid)
+                data = {"pid": pid, "rid": rid, "success": False}
+                if (pid, rid) in pending_units:
+                    data["count"] = pending_units[(pid, rid)]
+                self._queue_wait(self.resource_index[rid], pid, data.get("count"))
+                self.record_action("resource_waiting", data)
+        for pid, _, process_state, *_ in state["processes"]:
+            if process_state == "terminated":
+                self.terminate_process(pid)
+            self.process_index[pid].state = process_state
+        # older snapshots can hold waits on units that are free by now; serve them
+        for resource in self.resources:
+            self._hand_over(resource)
+        self.next_pid = state["next_pid"]
+        self.next_rid = state["next_rid"]
+    
     def auto_simulate_deadlock(self):
         """Automatically create a deadlock scenario for demonstration"""
         self.reset_simulation()
@@ -239,54 +515,189 @@ class SimuLockSimulator:
             "resources": [r1.rid, r2.rid]
         }
     
+# 'objects': one CompactProcess/CompactResource per entity; 'table': columnar arrays (needs numpy)
+SIMULATOR_BACKENDS = ('objects', 'table')
+
+def create_simulator(backend='objects', **options):
+    """SimuLockSimulator for the named backend"""
+    if backend == 'objects':
+        return SimuLockSimulator(**options)
+    if backend == 'table':
+        from modules.tables import TableSimulator
+        return TableSimulator(**options)
+    raise ValueError(f"unknown simulator backend: {backend}")
+    
     # backend/modules/simulator.py
+import time
 from threading import Lock
-from modules.banker import ResourceManager, PreventionManager
+from modules.banker import ResourceManager, MatrixResourceManager, PreventionManager
+from modules.metrics import registry, BANKER_DECISIONS, MANAGER_LOCK_WAIT
 
-_manager_lock = Lock()
-_resource_manager = None
-_prevention = None
+class BankerContext:
+    """Banker's state (ResourceManager + PreventionManager) behind its own lock
+    
+    The module-level functions below use one shared default context; sessions that
+    must not contend with each other each get their own.
+    """
+    
+    # admission modes handle_request and handle_requests_batch understand
+    MODES = ('banker', 'prevention', 'direct')
+    
+    def __init__(self):
+        self.lock = Lock()
+        self.resource_manager = None
+        self.prevention = None
+    
+    def init_from_config(self, total, pids, max_claims, matrix=False):
+        manager_cls = MatrixResourceManager if matrix else ResourceManager
+        with self.lock:
+            self.resource_manager = manager_cls(total, pids, max_claims)
+            self.prevention = PreventionManager(self.resource_manager)
+        return True
+    
+    def ensure_initialized(self):
+        if self.resource_manager is None:
+            # default small config; replace or call /api/init from frontend
+            self.init_from_config([3,3], ['P0','P1','P2'], { 'P0':[2,1], 'P1':[1,2], 'P2':[1,1] })
+    
+    def handle_request(self, pid, req, mode='banker'):
+        self.ensure_initialized()
+        started = time.perf_counter() if registry.enabled else None
+        with self.lock:
+            if started is not None:
+                MANAGER_LOCK_WAIT.time(started)
+            if mode == 'banker':
+                verdict = self.resource_manager.request_resources(pid, req)
+            elif mode == 'prevention':
+                verdict = self.prevention.request_with_prevention(pid, req)
+            elif mode == 'direct':
+                verdict = self.prevention.allow_direct_allocate(pid, req)
+            else:
+                verdict = False, 'unknown_mode'
+        if started is not None:
+            BANKER_DECISIONS.time(started, mode, 'granted' if verdict[0] else 'denied')
+        return verdict
+    
+    def handle_requests_batch(self, requests, mode='banker', stop_on_denial=False):
+        """
+        Admit an ordered list of (pid, req) pairs under a single lock acquisition.
+        stop_on_denial: stop at the first request that is not granted.
+        Returns dict with per-request verdicts, how many were processed and the final safe sequence.
+        A batch with an unknown pid or a request vector of the wrong length is refused whole:
+        nothing is admitted and 'error' and 'index' name the first bad item.
+        """
+        self.ensure_initialized()
+        requests = list(requests)
+        safe_sequence = None
+        started = time.perf_counter() if registry.enabled else None
+        with self.lock:
+            if started is not None:
+                MANAGER_LOCK_WAIT.time(started)
+            invalid = self._invalid_batch_item(requests)
+            if invalid is not None:
+                index, error = invalid
+                return {'results': [], 'processed': 0, 'total': len(requests), 'stopped_early': False,
+                        'safe_sequence': None, 'error': error, 'index': index}
+            if mode == 'banker':
+                verdicts, safe_sequence = self.resource_manager.request_resources_batch(requests, stop_on_denial)
+            elif mode in ('prevention', 'direct'):
+                decide = self.prevention.request_with_prevention if mode == 'prevention' else self.prevention.allow_direct_allocate
+                verdicts = []
+                for pid, req in requests:
+                    granted, reason = decide(pid, req)
+                    verdicts.append((pid, granted, reason))
+                    if stop_on_denial and not granted:
+                        break
+            else:
+                return {'results': [], 'processed': 0, 'total': len(requests), 'stopped_early': False,
+                        'safe_sequence': None, 'error': 'unknown_mode'}
+        if started is not None:
+            BANKER_DECISIONS.time(started, mode, 'batch')
+        return {
+            'results': [{'index': k, 'pid': pid, 'granted': granted, 'reason': reason}
+                        for k, (pid, granted, reason) in enumerate(verdicts)],
+            'processed': len(verdicts),
+            'total': len(requests),
+            'stopped_early': len(verdicts) < len(requests),
+            'safe_sequence': safe_sequence
+        }
+    
+    def _invalid_batch_item(self, requests):
+        """(index, reason) of the first request naming an unknown pid or not covering every resource type"""
+        rm = self.resource_manager
+        known = set(rm.processes)
+        for k, (pid, req) in enumerate(requests):
+            if pid not in known:
+                return k, f"unknown pid {pid!r}"
+            if len(req) != rm.m:
+                return k, f"request has {len(req)} entries, expected {rm.m} (one per resource type)"
+        return None
+    
+    def detect_deadlocks(self):
+        self.ensure_initialized()
+        with self.lock:
+            return self.resource_manager.detect_deadlock()
+    
+    def find_deadlocked(self):
+        self.ensure_initialized()
+        with self.lock:
+            return self.resource_manager.find_deadlocked()
+    
+    def recover_deadlock(self, strategy='terminate_lowest', deadlocked_set=None, detection='matrix'):
+        self.ensure_initialized()
+        with self.lock:
+            return self.resource_manager.recover(strategy=strategy, deadlocked_set=deadlocked_set,
+                                                 detection=detection)
+    
+    def set_prevention_policy(self, policy, resource_order=None):
+        self.ensure_initialized()
+        with self.lock:
+            return self.prevention.set_policy(policy, resource_order)
+    
+    def snapshot(self):
+        self.ensure_initialized()
+        with self.lock:
+            return self.resource_manager.snapshot()
+    
+    def safety_stats(self):
+        self.ensure_initialized()
+        with self.lock:
+            return self.resource_manager.get_safety_stats()
+    
+    def size(self):
+        """Rough state size (processes x resource types) used for memory accounting"""
+        rm = self.resource_manager
+        return len(rm.processes) * rm.m if rm is not None else 0
 
-def init_from_config(total, pids, max_claims):
-    global _resource_manager, _prevention
-    with _manager_lock:
-        _resource_manager = ResourceManager(total, pids, max_claims)
-        _prevention = PreventionManager(_resource_manager)
-    return True
+_default_context = BankerContext()
+_manager_lock = _default_context.lock
+
+def init_from_config(total, pids, max_claims, matrix=False):
+    return _default_context.init_from_config(total, pids, max_claims, matrix)
 
 def ensure_initialized():
-    if _resource_manager is None:
-        # default small config; replace or call /api/init from frontend
-        init_from_config([3,3], ['P0','P1','P2'], { 'P0':[2,1], 'P1':[1,2], 'P2':[1,1] })
+    _default_context.ensure_initialized()
 
 def handle_request(pid, req, mode='banker'):
-    ensure_initialized()
-    with _manager_lock:
-        if mode == 'banker':
-            return _resource_manager.request_resources(pid, req)
-        elif mode == 'prevention':
-            return _prevention.request_with_prevention(pid, req)
-        elif mode == 'direct':
-            return _prevention.allow_direct_allocate(pid, req)
-        else:
-            return False, 'unknown_mode'
+    return _default_context.handle_request(pid, req, mode)
+
+def handle_requests_batch(requests, mode='banker', stop_on_denial=False):
+    return _default_context.handle_requests_batch(requests, mode, stop_on_denial)
 
 def detect_deadlocks():
-    ensure_initialized()
-    with _manager_lock:
-        return _resource_manager.detect_deadlock()
+    return _default_context.detect_deadlocks()
 
-def recover_deadlock(strategy='terminate_lowest', deadlocked_set=None):
-    ensure_initialized()
-    with _manager_lock:
-        return _resource_manager.recover(strategy=strategy, deadlocked_set=deadlocked_set)
+def find_deadlocked():
+    return _default_context.find_deadlocked()
+
+def recover_deadlock(strategy='terminate_lowest', deadlocked_set=None, detection='matrix'):
+    return _default_context.recover_deadlock(strategy, deadlocked_set, detection)
 
 def set_prevention_policy(policy, resource_order=None):
-    ensure_initialized()
-    with _manager_lock:
-        return _prevention.set_policy(policy, resource_order)
+    return _default_context.set_prevention_policy(policy, resource_order)
 
 def snapshot():
-    ensure_initialized()
-    with _manager_lock:
-        return _resource_manager.snapshot()
+    return _default_context.snapshot()
+
+def safety_stats():
+    return _default_context.safety_stats()
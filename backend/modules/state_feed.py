@@ -0,0 +1,88 @@
+from collections import deque
+from datetime import datetime
+from threading import RLock
+
+class StateFeed:
+    """Versioned system_update feed for Socket.IO clients
+
+    Clients get a full snapshot (tagged with its sequence number) when they connect,
+    then small deltas holding only the processes/resources touched since the previous
+    delta. Each delta carries base_seq, the version it applies on top of; a client
+    whose version does not match asks for a resync and receives either the deltas it
+    missed (while they are still retained) or a fresh snapshot.
+
+    `lock` guards the pending change sets and every read of the simulator. Pass the
+    lock that the simulator's mutators hold (it is re-entered by handle_event, which
+    runs inside a mutation) so a delta never sees a half-applied action.
+    """
+
+    def __init__(self, simulator, history=256, lock=None):
+        self.sim = simulator
+        self.seq = 0
+        self.changed_pids = set()
+        self.changed_rids = set()
+        self.full_pending = False
+        self.recent = deque(maxlen=history)
+        self.lock = lock or RLock()
+        simulator.subscribe(self.handle_event)
+
+    def handle_event(self, action_type, data):
+        """Note which entities an action touched"""
+        if action_type in ('resource_denied', 'deadlock_detected'):
+            return
+        with self.lock:
+            if action_type == 'system_reset':
+                self.full_pending = True
+                self.changed_pids = set()
+                self.changed_rids = set()
+                return
+            if 'pid' in data:
+                self.changed_pids.add(data['pid'])
+            if 'rid' in data:
+                self.changed_rids.add(data['rid'])
+
+    def snapshot(self):
+        """Full state tagged with the current sequence number"""
+        with self.lock:
+            state = self.sim.get_system_state()
+            state['seq'] = self.seq
+            return state
+
+    def next_delta(self):
+        """Collect changes since the last delta into a new version. Returns None if nothing changed"""
+        with self.lock:
+            if not (self.full_pending or self.changed_pids or self.changed_rids):
+                return None
+            # take the pending changes; anything marked from here on goes into the next delta
+            full, self.full_pending = self.full_pending, False
+            changed_pids, self.changed_pids = self.changed_pids, set()
+            changed_rids, self.changed_rids = self.changed_rids, set()
+            if full:
+                # after a reset the old entities are gone; replace the client's state outright
+                processes = [self.sim.process_state(p) for p in self.sim.processes]
+                resources = [self.sim.resource_state(r) for r in self.sim.resources]
+            else:
+                processes = [self.sim.process_state(self.sim.process_index[pid])
+                             for pid in sorted(changed_pids) if pid in self.sim.process_index]
+                resources = [self.sim.resource_state(self.sim.resource_index[rid])
+                             for rid in sorted(changed_rids) if rid in self.sim.resource_index]
+            delta = {
+                'seq': self.seq + 1,
+                'base_seq': self.seq,
+                'full': full,
+                'processes': processes,
+                'resources': resources,
+                'timestamp': datetime.now().isoformat()
+            }
+            self.seq += 1
+            self.recent.append(delta)
+            return delta
+
+    def deltas_since(self, seq):
+        """Deltas a client at version seq has missed, or None if they are no longer retained"""
+        with self.lock:
+            if seq == self.seq:
+                return []
+            if seq is None or seq > self.seq or not self.recent or self.recent[0]['base_seq'] > seq:
+                return None
+            return [delta for delta in self.recent if delta['seq'] > seq]
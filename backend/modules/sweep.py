@@ -0,0 +1,201 @@
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .event_kernel import EventKernel, Workload
+from .simulator import SimuLockSimulator
+
+# prevention policy -> (simulator deadlock_policy, request resources in rid order)
+PREVENTION_POLICIES = {
+    'none': ('flag', False),  # deadlocks happen and are recovered by killing a victim
+    'reject': ('reject', False),  # a wait that would close a cycle is denied
+    'ordering': ('flag', True)  # resources are always requested in rid order
+}
+
+# every sweep parameter with its default; distributions are make_distribution specs
+TRIAL_DEFAULTS = {
+    'processes': 20,
+    'resources': 10,
+    'requests': ('int', 2, 3),
+    'hold': ('exp', 1.0),
+    'arrival': ('exp', 0.1),
+    'prevention': 'none',
+    'horizon': 3600.0
+}
+
+
+def expand_grid(grid):
+    """Parameter sets for every combination of the grid's values
+
+    grid maps parameter names (see TRIAL_DEFAULTS) to a list of values; a single value
+    counts as a one-element list and missing parameters take their default. Raises
+    ValueError for an unknown parameter, prevention policy or distribution.
+    """
+    unknown = set(grid) - set(TRIAL_DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown sweep parameters: {sorted(unknown)}")
+    names = list(TRIAL_DEFAULTS)
+    axes = []
+    for name in names:
+        values = grid.get(name, [TRIAL_DEFAULTS[name]])
+        if not isinstance(values, list):
+            values = [values]
+        if not values:
+            raise ValueError(f"no values for sweep parameter {name}")
+        axes.append(values)
+    points = [dict(zip(names, combination)) for combination in itertools.product(*axes)]
+    for params in points:
+        if params['prevention'] not in PREVENTION_POLICIES:
+            raise ValueError(f"unknown prevention policy: {params['prevention']}")
+        if params['processes'] < 1 or params['resources'] < 1:
+            raise ValueError(f"a trial needs processes and resources: {params}")
+        _workload(params)
+    return points
+
+
+def _workload(params):
+    return Workload(arrival=params['arrival'], requests=params['requests'], hold=params['hold'],
+                    ordered=PREVENTION_POLICIES[params['prevention']][1],
+                    max_processes=params['processes'])
+
+
+def trial_seed(seed, point, trial):
+    """Seed of one trial, fixed by the sweep seed and the trial's place in the sweep"""
+    return random.Random(f"{seed}:{point}:{trial}").getrandbits(63)
+
+
+def run_trial(params, seed):
+    """One seeded simulation of a parameter set on the event kernel; returns its metrics"""
+    sim = SimuLockSimulator(deadlock_policy=PREVENTION_POLICIES[params['prevention']][0], history_capacity=1)
+    for rid in range(params['resources']):
+        sim.add_resource(f"R{rid + 1}")
+    kernel = EventKernel(sim, _workload(params), seed)
+    return kernel.run(params['horizon'])
+
+
+def run_chunk(params, seeds):
+    """Run trials for each seed and sum their outcomes (a worker task: module level so it pickles)"""
+    totals = {'trials': 0, 'deadlocked': 0, 'deadlocks': 0, 'denials': 0, 'completed': 0, 'woken': 0,
+              'total_wait': 0.0, 'max_wait': 0.0, 'utilization': 0.0, 'virtual_seconds': 0.0}
+    for seed in seeds:
+        metrics = run_trial(params, seed)
+        totals['trials'] += 1
+        totals['deadlocked'] += metrics['deadlocks'] > 0
+        for key in ('deadlocks', 'denials', 'completed', 'utilization', 'virtual_seconds'):
+            totals[key] += metrics[key]
+        wait = metrics['wait']
+        totals['woken'] += wait['woken']
+        totals['total_wait'] += wait['mean_wait'] * wait['woken']
+        totals['max_wait'] = max(totals['max_wait'], wait['max_wait'])
+    return totals
+
+
+def aggregate(params, chunks):
+    """Estimates for one parameter set from its chunk totals (summed in the order given)
+
+    deadlock_probability is the share of trials that hit at least one deadlock, with
+    a 95% Wilson score interval.
+    """
+    totals = {}
+    for chunk in chunks:
+        for key, value in chunk.items():
+            totals[key] = max(totals.get(key, 0.0), value) if key == 'max_wait' else totals.get(key, 0) + value
+    trials = totals.get('trials', 0)
+    if not trials:
+        return {'params': params, 'trials': 0}
+    p = totals['deadlocked'] / trials
+    z = 1.96
+    center = (p + z * z / (2 * trials)) / (1 + z * z / trials)
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / (1 + z * z / trials)
+    return {
+        'params': params,
+        'trials': trials,
+        'deadlock_probability': p,
+        'ci95': [max(0.0, center - margin), min(1.0, center + margin)],
+        'deadlocks_per_trial': totals['deadlocks'] / trials,
+        'denials_per_trial': totals['denials'] / trials,
+        # victims are resubmitted as new processes, so count against the processes asked for
+        'completed_fraction': totals['completed'] / (params['processes'] * trials),
+        'mean_wait': totals['total_wait'] / totals['woken'] if totals['woken'] else 0.0,
+        'max_wait': totals['max_wait'],
+        'utilization': totals['utilization'] / trials,
+        'virtual_seconds': totals['virtual_seconds'] / trials
+    }
+
+
+class MonteCarloSweep:
+    """Deadlock-probability estimates over a parameter grid, run across a process pool
+
+    Each grid point (see expand_grid) gets `trials` independent simulations on the
+    event kernel, seeded from `seed` and the trial's position, so the same seed gives
+    the same results whatever the number of workers or the order chunks finish in.
+    Trials go to a ProcessPoolExecutor with `workers` processes (every core by
+    default; workers=1 runs them in this process) in chunks of chunk_size. Listeners
+    registered with subscribe() get a progress snapshot with the updated estimate of
+    the point after every chunk.
+    """
+
+    def __init__(self, grid, trials=1000, seed=None, workers=None, chunk_size=25):
+        self.points = expand_grid(grid)
+        self.trials = trials
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.listeners = []
+
+    def subscribe(self, listener):
+        """Register listener(snapshot) called as each chunk of trials completes"""
+        self.listeners.append(listener)
+
+    def tasks(self):
+        """(point index, first trial, seeds) for every chunk of the sweep"""
+        for point in range(len(self.points)):
+            for first in range(0, self.trials, self.chunk_size):
+                last = min(first + self.chunk_size, self.trials)
+                yield point, first, [trial_seed(self.seed, point, trial) for trial in range(first, last)]
+
+    def run(self):
+        """Run every trial and return the per-point estimates"""
+        started = time.perf_counter()
+        chunks = [{} for _ in self.points]  # per point: first trial -> chunk totals
+        done = 0
+        if self.workers == 1:
+            for point, first, seeds in self.tasks():
+                chunks[point][first] = run_chunk(self.points[point], seeds)
+                done += len(seeds)
+                self._progress(chunks, point, done, started)
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(run_chunk, self.points[point], seeds): (point, first)
+                           for point, first, seeds in self.tasks()}
+                for future in as_completed(futures):
+                    point, first = futures[future]
+                    chunks[point][first] = future.result()
+                    done += chunks[point][first]['trials']
+                    self._progress(chunks, point, done, started)
+        return {
+            'seed': self.seed,
+            'trials': self.trials,
+            'workers': self.workers,
+            'elapsed': time.perf_counter() - started,
+            'results': [self._estimate(chunks, point) for point in range(len(self.points))]
+        }
+
+    def _estimate(self, chunks, point):
+        finished = chunks[point]
+        return aggregate(self.points[point], [finished[first] for first in sorted(finished)])
+
+    def _progress(self, chunks, point, done, started):
+        if not self.listeners:
+            return
+        snapshot = {
+            'done': done,
+            'total': self.trials * len(self.points),
+            'elapsed': time.perf_counter() - started,
+            'point': point,
+            'estimate': self._estimate(chunks, point)
+        }
+        for listener in self.listeners:
+            listener(snapshot)
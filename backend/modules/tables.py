@@ -0,0 +1,597 @@
+import time
+from modules.simulator import SimuLockSimulator
+from modules.process import ProcessState, STATE_NAMES, STATE_CODES
+from modules.wait_queue import WaitStats, create_wait_queue
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the table backend
+    np = None
+
+NO_HOLDER = 0  # pids start at 1, so 0 marks a free resource / a dead edge
+
+
+def csr(keys, n, tiebreak=None):
+    """CSR grouping of positions by integer key in [0, n]
+    
+    Returns (indptr, order): order[indptr[k]:indptr[k + 1]] are the positions whose key
+    is k, in position order (or tiebreak order when given).
+    """
+    if tiebreak is None:
+        order = np.argsort(keys, kind='stable')
+    else:
+        order = np.lexsort((tiebreak, keys))
+    indptr = np.zeros(n + 2, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n + 1), out=indptr[1:])
+    return indptr, order
+
+
+def gather(indptr, values, rows):
+    """Concatenation of the CSR rows `rows`"""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return values[:0]
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return values[offsets + np.arange(total)]
+
+
+class _Columns:
+    """Growable set of equally long typed columns"""
+    
+    def __init__(self, dtypes, capacity=1024):
+        self.dtypes = dtypes
+        self.size = 0
+        for name, dtype in dtypes.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+    
+    def _append_row(self):
+        capacity = len(getattr(self, next(iter(self.dtypes))))
+        if self.size == capacity:
+            for name in self.dtypes:
+                column = getattr(self, name)
+                grown = np.zeros(capacity * 2, dtype=column.dtype)
+                grown[:capacity] = column
+                setattr(self, name, grown)
+        self.size += 1
+        return self.size - 1
+    
+    def clear(self):
+        self.size = 0
+        for name in self.dtypes:
+            getattr(self, name)[:] = 0
+
+
+class ProcessTable(_Columns):
+    """Process columns; row pid - 1 belongs to process pid"""
+    
+    def __init__(self, capacity=1024):
+        super().__init__({'state': np.int8, 'priority': np.int32,
+                          'created_at': np.float64, 'last_state_change': np.float64}, capacity)
+        self.names = []
+    
+    def append(self, name, priority=1):
+        row = self._append_row()
+        self.names.append(name)
+        self.state[row] = ProcessState.READY
+        self.priority[row] = priority
+        self.created_at[row] = self.last_state_change[row] = time.monotonic()
+        return row + 1
+    
+    def clear(self):
+        super().clear()
+        self.names = []
+
+
+class ResourceTable(_Columns):
+    """Resource columns; row rid - 1 belongs to resource rid. holder is 0 when free"""
+    
+    def __init__(self, capacity=1024):
+        # alloc_seq orders each holder's resources by when they were granted
+        super().__init__({'holder': np.int64, 'alloc_seq': np.int64, 'usage_count': np.int32}, capacity)
+        self.names = []
+        self.types = []
+    
+    def append(self, name, resource_type="binary"):
+        row = self._append_row()
+        self.names.append(name)
+        self.types.append(resource_type)
+        return row + 1
+    
+    def clear(self):
+        super().clear()
+        self.names = []
+        self.types = []
+
+
+class WaitEdges(_Columns):
+    """Pending requests as (pid, rid) edges in arrival order; a removed edge gets pid 0"""
+    
+    def __init__(self, capacity=1024):
+        super().__init__({'pid': np.int64, 'rid': np.int64}, capacity)
+        self.dead = 0
+    
+    def append(self, pid, rid):
+        row = self._append_row()
+        self.pid[row] = pid
+        self.rid[row] = rid
+    
+    def remove_first(self, pid, rid):
+        n = self.size
+        hits = np.flatnonzero((self.pid[:n] == pid) & (self.rid[:n] == rid))
+        if hits.size:
+            self._kill(hits[:1])
+    
+    def remove_process(self, pid):
+        self._kill(np.flatnonzero(self.pid[:self.size] == pid))
+    
+    def _kill(self, rows):
+        self.pid[rows] = NO_HOLDER
+        self.dead += len(rows)
+        if self.dead > 1024 and self.dead * 2 > self.size:
+            # compact, keeping arrival order
+            alive = np.flatnonzero(self.pid[:self.size] != NO_HOLDER)
+            count = len(alive)
+            self.pid[:count] = self.pid[alive]
+            self.rid[:count] = self.rid[alive]
+            self.pid[count:self.size] = NO_HOLDER
+            self.size = count
+            self.dead = 0
+    
+    def clear(self):
+        super().clear()
+        self.dead = 0
+
+
+class ProcessRow:
+    """Process-like view of one ProcessTable row"""
+    __slots__ = ('sim', 'pid')
+    
+    def __init__(self, sim, pid):
+        self.sim = sim
+        self.pid = pid
+    
+    @property
+    def name(self):
+        return self.sim.process_table.names[self.pid - 1]
+    
+    @property
+    def priority(self):
+        return int(self.sim.process_table.priority[self.pid - 1])
+    
+    @property
+    def state(self):
+        return STATE_NAMES[self.sim.process_table.state[self.pid - 1]]
+    
+    @state.setter
+    def state(self, new_state):
+        self.sim.process_table.state[self.pid - 1] = STATE_CODES[new_state]
+        self.sim.process_table.last_state_change[self.pid - 1] = time.monotonic()
+    
+    @property
+    def allocated_resources(self):
+        return self.sim.allocated_of(self.pid)
+    
+    @property
+    def requested_resources(self):
+        return self.sim.requested_of(self.pid)
+    
+    def add_requested(self, resource_id):
+        self.sim.wait_edges.append(self.pid, resource_id)
+        self.sim.changed()
+
+
+class ResourceRow:
+    """Resource-like view of one ResourceTable row"""
+    __slots__ = ('sim', 'rid')
+    units = 1
+    
+    def __init__(self, sim, rid):
+        self.sim = sim
+        self.rid = rid
+    
+    @property
+    def name(self):
+        return self.sim.resource_table.names[self.rid - 1]
+    
+    @property
+    def resource_type(self):
+        return self.sim.resource_table.types[self.rid - 1]
+    
+    @property
+    def held_by(self):
+        holder = int(self.sim.resource_table.holder[self.rid - 1])
+        return holder if holder != NO_HOLDER else None
+    
+    @property
+    def available(self):
+        return bool(self.sim.resource_table.holder[self.rid - 1] == NO_HOLDER)
+    
+    @property
+    def waiting_queue(self):
+        return self.sim.wait_queues.get(self.rid, ())
+    
+    def wait_stats(self):
+        queue = self.sim.wait_queues.get(self.rid)
+        return (queue.stats if queue is not None else WaitStats()).to_dict()
+
+
+class _Rows:
+    """List- and index-like access to the rows of a table by position or by id"""
+    
+    def __init__(self, sim, table, row_class):
+        self.sim = sim
+        self.table = table
+        self.row_class = row_class
+    
+    def __len__(self):
+        return self.table.size
+    
+    def __iter__(self):
+        return (self.row_class(self.sim, i) for i in range(1, self.table.size + 1))
+    
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.row_class(self.sim, i + 1) for i in range(self.table.size)[position]]
+        if position < 0:
+            position += self.table.size
+        if not 0 <= position < self.table.size:
+            raise IndexError(position)
+        return self.row_class(self.sim, position + 1)
+
+
+class _RowIndex:
+    """pid/rid -> row view mapping over a table (ids are 1..size)"""
+    
+    def __init__(self, sim, table, row_class):
+        self.sim = sim
+        self.table = table
+        self.row_class = row_class
+    
+    def __contains__(self, key):
+        return isinstance(key, int) and 1 <= key <= self.table.size
+    
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return self.row_class(self.sim, key)
+    
+    def get(self, key, default=None):
+        return self.row_class(self.sim, key) if key in self else default
+    
+    def __len__(self):
+        return self.table.size
+
+
+class TableSimulator(SimuLockSimulator):
+    """SimuLockSimulator backed by columnar tables instead of one object per entity
+    
+    Process state, priority and timestamps, and resource holders live in typed NumPy
+    columns; pending requests are an edge list. Per-process allocation and request
+    lists are CSR groupings of those arrays, rebuilt lazily after a change. Statistics,
+    get_processes_by_state and the pairwise detect_deadlocks are array reductions.
+    Waiters also sit in a wakeup-policy queue per contended resource, and a release hands
+    the resource to the one the policy serves first, as on the 'objects' backend.
+    analyze_deadlocks first peels off every process that can still finish (a vectorized
+    reduction over the CSR arrays), then runs the SCC detector on the blocked rest only.
+    
+    The simulator API is unchanged: processes / resources and process_index /
+    resource_index hand out lightweight row views, and every action is still recorded
+    for listeners (online detector, state feed, journal). Resources have a single unit
+    (one holder column); multi-unit resources need the 'objects' backend.
+    """
+    
+    # scattered single-row reads scan the columns; after this many the CSR is rebuilt
+    SCAN_READS = 16
+    
+    def __init__(self, deadlock_policy='flag', history_capacity=200, wakeup_policy='fifo', capacity=1024):
+        if np is None:
+            raise ImportError("TableSimulator requires numpy")
+        self.process_table = ProcessTable(capacity)
+        self.resource_table = ResourceTable(capacity)
+        self.wait_edges = WaitEdges(capacity)
+        # rid -> WaitQueue, only for resources something has waited on
+        self.wait_queues = {}
+        self.alloc_counter = 0
+        self.version = 0
+        self._csr = None
+        self._csr_version = -1
+        self._scan_reads = 0
+        super().__init__(deadlock_policy, history_capacity, wakeup_policy)
+        # analysis runs on the tables; an object graph per entity would defeat the layout
+        self.listeners.remove(self.deadlock_detector.handle_event)
+        self.processes = _Rows(self, self.process_table, ProcessRow)
+        self.resources = _Rows(self, self.resource_table, ResourceRow)
+        self.process_index = _RowIndex(self, self.process_table, ProcessRow)
+        self.resource_index = _RowIndex(self, self.resource_table, ResourceRow)
+    
+    def changed(self):
+        self.version += 1
+        self._scan_reads = 0
+    
+    # Adjacency
+    def adjacency(self):
+        """CSR views of the tables, rebuilt if anything changed since the last call
+        
+        alloc_indptr/alloc_rids: rids held by each pid, in grant order
+        req_indptr/req_rids: rids each pid is waiting for, in request order
+        waiters_indptr/waiters_pids: pids waiting for each rid
+        """
+        if self._csr_version != self.version:
+            n, m, e = self.process_table.size, self.resource_table.size, self.wait_edges.size
+            holder = self.resource_table.holder[:m]
+            alloc_indptr, alloc_order = csr(holder, n, self.resource_table.alloc_seq[:m])
+            edge_pid, edge_rid = self.wait_edges.pid[:e], self.wait_edges.rid[:e]
+            req_indptr, req_order = csr(edge_pid, n)
+            waiters_indptr, waiters_order = csr(np.where(edge_pid != NO_HOLDER, edge_rid, 0), m)
+            self._csr = {
+                'alloc_indptr': alloc_indptr, 'alloc_rids': alloc_order + 1,
+                'req_indptr': req_indptr, 'req_rids': edge_rid[req_order],
+                'waiters_indptr': waiters_indptr, 'waiters_pids': edge_pid[waiters_order]
+            }
+            self._csr_version = self.version
+        return self._csr
+    
+    def _fresh_adjacency(self):
+        """The CSR if it is current or worth rebuilding, None to scan instead"""
+        if self._csr_version == self.version:
+            return self._csr
+        self._scan_reads += 1
+        if self._scan_reads > self.SCAN_READS:
+            return self.adjacency()
+        return None
+    
+    def allocated_of(self, pid):
+        adjacency = self._fresh_adjacency()
+        if adjacency is not None:
+            start, end = adjacency['alloc_indptr'][pid], adjacency['alloc_indptr'][pid + 1]
+            return tuple(adjacency['alloc_rids'][start:end].tolist())
+        table = self.resource_table
+        rows = np.flatnonzero(table.holder[:table.size] == pid)
+        rows = rows[np.argsort(table.alloc_seq[rows], kind='stable')]
+        return tuple((rows + 1).tolist())
+    
+    def requested_of(self, pid):
+        adjacency = self._fresh_adjacency()
+        if adjacency is not None:
+            start, end = adjacency['req_indptr'][pid], adjacency['req_indptr'][pid + 1]
+            return tuple(adjacency['req_rids'][start:end].tolist())
+        edges = self.wait_edges
+        return tuple(edges.rid[:edges.size][edges.pid[:edges.size] == pid].tolist())
+    
+    # Process Management
+    def add_process(self, name, priority=1):
+        """Add a new process to the simulation"""
+        pid = self.process_table.append(name, priority)
+        self.next_pid = pid + 1
+        self.changed()
+        self.record_action("process_created", {"pid": pid, "name": name, "priority": priority})
+        return ProcessRow(self, pid)
+    
+    def terminate_process(self, pid):
+        """Terminate a process"""
+        process = self.process_index.get(pid)
+        if not process or self.process_table.state[pid - 1] == ProcessState.TERMINATED:
+            return False
+        # withdraw its waits first, so releasing below cannot hand a resource back to it
+        for rid in self.requested_of(pid):
+            self.wait_queues[rid].remove(pid)
+        self.wait_edges.remove_process(pid)
+        self.changed()
+        for rid in self.allocated_of(pid):
+            self.release_resource(pid, rid)
+        process.state = "terminated"
+        self.changed()
+        self.record_action("process_terminated", {"pid": pid})
+        return True
+    
+    # Resource Management
+    def add_resource(self, name, resource_type="binary", units=1):
+        """Add a new resource to the simulation"""
+        if units != 1:
+            raise ValueError("the table backend only supports single-unit resources")
+        rid = self.resource_table.append(name, resource_type)
+        self.next_rid = rid + 1
+        self.changed()
+        self.record_action("resource_created", {"rid": rid, "name": name, "type": resource_type})
+        return ResourceRow(self, rid)
+    
+    def request_resource(self, process_id, resource_id, count=1):
+        """Request a resource for a process"""
+        process = self.process_index.get(process_id)
+        resource = self.resource_index.get(resource_id)
+        if not process or not resource:
+            return False, "Process or resource not found"
+        if self.process_table.state[process_id - 1] == ProcessState.TERMINATED:
+            return False, f"Process {process.name} is terminated"
+        if count != 1:
+            return False, f"{process.name} cannot request {count} of the 1 unit(s) of {resource.name}"
+        
+        holder = self.resource_table.holder[resource_id - 1]
+        if holder == process_id:
+            return False, f"{process.name} already holds {resource.name}"
+        queue = self.wait_queues.get(resource_id)
+        if queue and process_id in queue:
+            return False, f"{process.name} is already waiting for {resource.name}"
+        # a free resource still goes to queued waiters first (release hands it over)
+        if holder == NO_HOLDER and not queue:
+            self._grant(process_id, resource_id)
+            process.state = "running"
+            message = f"Resource {resource.name} allocated to {process.name}"
+            action_type = "resource_allocated"
+            success = True
+            cycle = self.online_detector.allocate(process_id, resource_id)
+        else:
+            cycle = self.online_detector.request(process_id, resource_id,
+                                                 reject=self.deadlock_policy == 'reject')
+            if cycle is not None and self.deadlock_policy == 'reject':
+                message = f"Request denied: {process.name} waiting for {resource.name} would cause a deadlock"
+                self.record_action("resource_denied", {"pid": process_id, "rid": resource_id, "cycle": cycle})
+                return False, message
+            process.state = "waiting"
+            self.wait_edges.append(process_id, resource_id)
+            self._queue_wait(resource, process_id)
+            message = f"{process.name} waiting for {resource.name}"
+            action_type = "resource_waiting"
+            success = False
+        self.changed()
+        
+        self.record_action(action_type, {"pid": process_id, "rid": resource_id, "success": success})
+        if cycle is not None:
+            self.record_action("deadlock_detected", {"deadlocks": [cycle], "total_deadlocks": 1, "online": True})
+        return success, message
+    
+    def release_resource(self, process_id, resource_id, count=None):
+        """Release a resource from a process"""
+        process = self.process_index.get(process_id)
+        resource = self.resource_index.get(resource_id)
+        if not process or not resource:
+            return False, "Process or resource not found"
+        if self.resource_table.holder[resource_id - 1] != process_id:
+            return False, f"Process {process.name} doesn't hold resource {resource.name}"
+        
+        self.resource_table.holder[resource_id - 1] = NO_HOLDER
+        process.state = "ready"
+        self.changed()
+        self.record_action("resource_released", {"pid": process_id, "rid": resource_id})
+        self._hand_over(resource)
+        return True, f"Resource {resource.name} released by {process.name}"
+    
+    def _grant(self, pid, rid):
+        """Make pid the holder of rid, ending its wait edge for rid if it had one"""
+        table = self.resource_table
+        self.alloc_counter += 1
+        table.holder[rid - 1] = pid
+        table.alloc_seq[rid - 1] = self.alloc_counter
+        table.usage_count[rid - 1] += 1
+        self.wait_edges.remove_first(pid, rid)
+        self.changed()
+    
+    def _queue_wait(self, resource, pid, count=None):
+        """Put pid on resource's wakeup-policy queue at its priority (the wait edge is kept separately)"""
+        queue = self.wait_queues.get(resource.rid)
+        if queue is None:
+            queue = self.wait_queues[resource.rid] = create_wait_queue(self.wakeup_policy)
+        queue.append(pid, int(self.process_table.priority[pid - 1]))
+    
+    def _hand_over(self, resource):
+        """Grant a free resource to the waiter the wakeup policy serves first"""
+        queue = self.wait_queues.get(resource.rid)
+        if not queue or self.resource_table.holder[resource.rid - 1] != NO_HOLDER:
+            return
+        pid = queue.popleft()
+        self._grant(pid, resource.rid)
+        process = ProcessRow(self, pid)
+        process.state = "waiting" if self.requested_of(pid) else "running"
+        cycle = self.online_detector.allocate(pid, resource.rid)
+        self.record_action("resource_allocated", {"pid": pid, "rid": resource.rid, "success": True, "handoff": True})
+        if cycle is not None:
+            self.record_action("deadlock_detected", {"deadlocks": [cycle], "total_deadlocks": 1, "online": True})
+    
+    # Queries
+    def get_processes_by_state(self, state):
+        """Processes in the given state"""
+        table = self.process_table
+        pids = np.flatnonzero(table.state[:table.size] == STATE_CODES[state]) + 1
+        return [ProcessRow(self, pid) for pid in pids.tolist()]
+    
+    def get_system_statistics(self):
+        """Get system statistics"""
+        states = np.bincount(self.process_table.state[:self.process_table.size], minlength=len(STATE_NAMES))
+        total_processes = self.process_table.size
+        running_processes = int(states[ProcessState.RUNNING])
+        statistics = {
+            "total_processes": total_processes,
+            "total_resources": self.resource_table.size,
+            "running_processes": running_processes,
+            "waiting_processes": int(states[ProcessState.WAITING]),
+            "available_resources": int(np.count_nonzero(self.resource_table.holder[:self.resource_table.size] == NO_HOLDER)),
+            "system_utilization": (running_processes / total_processes) * 100 if total_processes else 0
+        }
+        if self.event_kernel is not None:
+            statistics["virtual_time"] = self.event_kernel.metrics()
+        return statistics
+    
+    # Deadlock Detection
+    def detect_deadlocks(self):
+        """Detect deadlocks in the current system state (waiting process -> waiting holder pairs)"""
+        adjacency = self.adjacency()
+        state = self.process_table.state
+        counts = np.diff(adjacency['req_indptr'])
+        waiters = np.repeat(np.arange(len(counts)), counts)
+        holders = self.resource_table.holder[adjacency['req_rids'] - 1]
+        # same order as the object backend: by waiting pid, then by request order
+        pairs = (waiters != NO_HOLDER) & (holders != NO_HOLDER)
+        pairs[pairs] = (state[waiters[pairs] - 1] == ProcessState.WAITING) & (state[holders[pairs] - 1] == ProcessState.WAITING)
+        names = self.process_table.names
+        deadlocks = [[names[p - 1], names[h - 1]] for p, h in zip(waiters[pairs].tolist(), holders[pairs].tolist())]
+        
+        result = {'has_deadlock': len(deadlocks) > 0, 'deadlocks': deadlocks}
+        if result['has_deadlock']:
+            self.record_action("deadlock_detected", {
+                "deadlocks": result['deadlocks'],
+                "total_deadlocks": len(result['deadlocks'])
+            })
+        return result
+    
+    def blocked_processes(self):
+        """Pids that can never finish: the deadlocked ones and those waiting on them
+        
+        A process can finish once every resource it waits for is free or held by a process
+        that can finish. Finishing processes are peeled off frontier by frontier, each
+        frontier handled with whole-array operations.
+        """
+        adjacency = self.adjacency()
+        n = self.process_table.size
+        counts = np.diff(adjacency['req_indptr'])
+        waiters = np.repeat(np.arange(len(counts)), counts)
+        holders = self.resource_table.holder[adjacency['req_rids'] - 1]
+        blocked_edges = (waiters != NO_HOLDER) & (holders != NO_HOLDER)
+        pending = np.bincount(waiters[blocked_edges], minlength=n + 1)
+        finished = pending == 0
+        frontier = np.flatnonzero(finished[1:]) + 1
+        while frontier.size:
+            held = gather(adjacency['alloc_indptr'], adjacency['alloc_rids'], frontier)
+            woken = gather(adjacency['waiters_indptr'], adjacency['waiters_pids'], held)
+            if not woken.size:
+                break
+            np.subtract.at(pending, woken, 1)
+            woken = np.unique(woken)
+            frontier = woken[(pending[woken] == 0) & ~finished[woken]]
+            finished[frontier] = True
+        return np.flatnonzero(~finished[1:]) + 1
+    
+    def analyze_deadlocks(self, include_graph=True):
+        """Wait-for graph deadlock analysis, run on the blocked processes only"""
+        blocked = self.blocked_processes().tolist()
+        processes = [ProcessRow(self, pid) for pid in blocked]
+        rids = sorted({rid for p in processes for rid in p.allocated_resources + p.requested_resources})
+        resources = [ResourceRow(self, rid) for rid in rids]
+        # every cycle lies among blocked processes and the resources they hold or want
+        result = self.deadlock_detector.detect_deadlocks(processes, resources)
+        table = self.process_table
+        result['total_processes'] = int(np.count_nonzero(table.state[:table.size] != ProcessState.TERMINATED))
+        result['total_resources'] = self.resource_table.size
+        result['blocked_processes'] = len(blocked)
+        if include_graph:
+            self.deadlock_detector.build_wait_for_graph(self.processes, self.resources)
+            result['wait_for_graph'] = self.deadlock_detector.get_graph_data()
+        else:
+            result.pop('wait_for_graph', None)
+        return result
+    
+    # System State Management
+    def reset_simulation(self):
+        """Reset the entire simulation"""
+        self.process_table.clear()
+        self.resource_table.clear()
+        self.wait_edges.clear()
+        self.wait_queues = {}
+        self.alloc_counter = 0
+        self.next_pid = 1
+        self.next_rid = 1
+        self.changed()
+        self.simulation_history.clear()
+        self.record_action("system_reset", {})
+        return True
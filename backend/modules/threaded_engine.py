@@ -0,0 +1,292 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from .deadlock_detector import DeadlockDetector
+
+# program steps: ('acquire', rid[, count]), ('hold', seconds), ('release', rid[, count])
+STEP_TYPES = ('acquire', 'hold', 'release')
+
+
+def check_program(program, units):
+    """Validate a step program against the units of each resource; returns it as a list of tuples
+
+    Raises ValueError for an unknown step or resource, or for a program that takes more
+    units than exist or releases units it does not hold.
+    """
+    program = [tuple(step) for step in program]
+    held = {}
+    for step in program:
+        kind = step[0]
+        if kind not in STEP_TYPES:
+            raise ValueError(f"unknown step: {step}")
+        if kind == 'hold':
+            continue
+        rid = step[1]
+        count = step[2] if len(step) > 2 else 1
+        if rid not in units:
+            raise ValueError(f"no semaphore for resource {rid}")
+        if count < 1:
+            raise ValueError(f"bad unit count in step {step}")
+        held[rid] = held.get(rid, 0) + (count if kind == 'acquire' else -count)
+        if held[rid] < 0 or held[rid] > units[rid]:
+            raise ValueError(f"step {step} does not match the units held")
+    return program
+
+
+class UnitLock:
+    """Real lock with `units` units that are taken and returned several at a time
+
+    threading.Semaphore can only take one unit per call, so a multi-unit request would
+    hold part of what it asked for while waiting for the rest. acquire(count) takes all
+    count units at once or none, like CountingSemaphore.wait.
+    """
+
+    def __init__(self, units, free=None):
+        self.units = units
+        self.free = units if free is None else free
+        self.cond = threading.Condition()
+
+    def acquire(self, count=1, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(lambda: self.free >= count, timeout) and self._take(count)
+
+    def _take(self, count):
+        self.free -= count
+        return True
+
+    def release(self, count=1):
+        with self.cond:
+            self.free += count
+            self.cond.notify_all()
+
+
+class BinaryLock:
+    """threading.Lock with the UnitLock interface"""
+
+    units = 1
+
+    def __init__(self, available=True):
+        self.lock = threading.Lock()
+        if not available:
+            self.lock.acquire()
+
+    def acquire(self, count=1, timeout=None):
+        return self.lock.acquire(timeout=-1 if timeout is None else timeout)
+
+    def release(self, count=1):
+        self.lock.release()
+
+
+class ScriptedProcess:
+    """A simulated process: a step program plus what its worker thread has done so far"""
+
+    def __init__(self, pid, name, program, priority=1):
+        self.pid = pid
+        self.name = name
+        self.program = program
+        self.priority = priority
+        self.state = 'ready'
+        self.held = {}  # rid -> units held right now
+        self.abort = threading.Event()
+        self.restarts = 0
+        self.acquisitions = 0
+        self.wait_time = 0.0
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'pid': self.pid,
+            'name': self.name,
+            'state': self.state,
+            'priority': self.priority,
+            'held': dict(self.held),
+            'restarts': self.restarts,
+            'acquisitions': self.acquisitions,
+            'wait_time': self.wait_time
+        }
+
+
+class ThreadedEngine:
+    """Runs scripted processes as worker threads against real locks
+
+    Every semaphore of the SemaphoreManager becomes a real lock (a BinaryLock, or a
+    UnitLock for counting semaphores) starting with the same free units. Each process
+    added with add_process() runs its program on a thread pool worker: acquire blocks
+    on the real lock, hold sleeps, release returns the units.
+
+    Workers report every wait, grant and release to a DeadlockDetector, so the
+    wait-for graph follows the live threads. A watchdog thread checks it every
+    watch_interval seconds; for each deadlock it aborts one victim (lowest priority,
+    newest among equals), which drops everything it holds, backs off for a random
+    time around restart_backoff * 2**restarts seconds (real locks are not fair, so
+    without it the victim tends to grab its first lock straight back) and starts its
+    program over, up to max_restarts times before it gives up. Listeners registered with
+    subscribe() get the same (action_type, data) events as simulator listeners.
+    """
+
+    def __init__(self, semaphore_manager, max_workers=32, watch_interval=0.01, max_restarts=3,
+                 restart_backoff=0.01, poll_interval=0.005):
+        self.max_workers = max_workers
+        self.watch_interval = watch_interval
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        # how often a blocked worker wakes up to see whether it was picked as a victim
+        self.poll_interval = poll_interval
+        self.locks = {}
+        self.units = {}
+        self.processes = []
+        self.process_index = {}
+        self.next_pid = 1
+        self.listeners = []
+        self.detector = DeadlockDetector()
+        self.graph_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.stats = {'completed': 0, 'aborted': 0, 'restarts': 0, 'deadlocks': 0,
+                      'acquisitions': 0, 'checks': 0}
+        self.deadlocks = []
+        self.subscribe(self.detector.handle_event)
+        for rid, semaphore in semaphore_manager.semaphores.items():
+            units = getattr(semaphore, 'units', 1)
+            if units > 1:
+                lock = UnitLock(units, semaphore.value)
+            else:
+                lock = BinaryLock(semaphore.value == 1)
+            self.locks[rid] = lock
+            self.units[rid] = units
+            self.record_action('resource_created', {'rid': rid, 'name': f"R{rid}", 'units': units})
+
+    def add_process(self, name, program, priority=1):
+        """Register a process running program (a list of steps, see STEP_TYPES and check_program)"""
+        program = check_program(program, self.units)
+        process = ScriptedProcess(self.next_pid, name, program, priority)
+        self.processes.append(process)
+        self.process_index[process.pid] = process
+        self.next_pid += 1
+        self.record_action('process_created', {'pid': process.pid, 'name': name, 'priority': priority})
+        return process
+
+    def record_action(self, action_type, data):
+        """Feed one event to the listeners (the detector among them) under the graph lock"""
+        with self.graph_lock:
+            for listener in self.listeners:
+                listener(action_type, data)
+
+    def subscribe(self, listener):
+        """Register listener(action_type, data) for every engine event"""
+        self.listeners.append(listener)
+
+    def run(self, timeout=None):
+        """Run every process to completion (or until timeout seconds pass) and return the report"""
+        self.stop_event.clear()
+        watchdog = threading.Thread(target=self._watch, daemon=True)
+        started = time.perf_counter()
+        watchdog.start()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._run_process, process) for process in self.processes
+                       if process.state == 'ready']
+            wait(futures, timeout)
+            # after a timeout, abort whatever is left so the pool can shut down
+            self.stop_event.set()
+            for process in self.processes:
+                process.abort.set()
+        watchdog.join()
+        elapsed = time.perf_counter() - started
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        """Throughput, deadlock and wait figures of the last run"""
+        finished = [p for p in self.processes if p.state == 'completed']
+        return dict(self.stats,
+                    elapsed=elapsed,
+                    throughput=len(finished) / elapsed if elapsed else 0.0,
+                    deadlock_rate=self.stats['deadlocks'] / elapsed if elapsed else 0.0,
+                    mean_wait=sum(p.wait_time for p in self.processes) / len(self.processes) if self.processes else 0.0,
+                    processes=[p.to_dict() for p in self.processes],
+                    deadlock_samples=self.deadlocks[:20])
+
+    def _run_process(self, process):
+        """Worker body: run the program, starting over after each abort"""
+        while True:
+            process.state = 'running'
+            if self._run_program(process):
+                process.state = 'completed'
+                process.finished_at = time.perf_counter()
+                with self.graph_lock:
+                    self.stats['completed'] += 1
+                return
+            self._release_all(process)
+            backoff = self.restart_backoff * 2 ** process.restarts * random.uniform(0.5, 1.5)
+            if process.restarts >= self.max_restarts or self.stop_event.wait(backoff):
+                process.state = 'aborted'
+                with self.graph_lock:
+                    self.stats['aborted'] += 1
+                return
+            process.restarts += 1
+            with self.graph_lock:
+                self.stats['restarts'] += 1
+            process.abort.clear()
+
+    def _run_program(self, process):
+        """Carry out the steps. Returns False if the process was aborted part way"""
+        for step in process.program:
+            kind = step[0]
+            if kind == 'hold':
+                if process.abort.wait(step[1]):
+                    return False
+            elif kind == 'acquire':
+                if not self._acquire(process, step[1], step[2] if len(step) > 2 else 1):
+                    return False
+            else:
+                self._release(process, step[1], step[2] if len(step) > 2 else 1)
+        return True
+
+    def _acquire(self, process, rid, count):
+        lock = self.locks[rid]
+        data = {'pid': process.pid, 'rid': rid, 'count': count}
+        if not lock.acquire(count, timeout=0):
+            process.state = 'waiting'
+            self.record_action('resource_waiting', dict(data, success=False))
+            since = time.perf_counter()
+            while not lock.acquire(count, timeout=self.poll_interval):
+                if process.abort.is_set():
+                    process.wait_time += time.perf_counter() - since
+                    self.record_action('request_withdrawn', data)
+                    return False
+            process.wait_time += time.perf_counter() - since
+            process.state = 'running'
+        process.held[rid] = process.held.get(rid, 0) + count
+        process.acquisitions += 1
+        self.record_action('resource_allocated', dict(data, success=True))
+        with self.graph_lock:
+            self.stats['acquisitions'] += 1
+        return True
+
+    def _release(self, process, rid, count):
+        process.held[rid] -= count
+        if not process.held[rid]:
+            del process.held[rid]
+        # the edge goes first, so the watchdog never sees units as held after they are free
+        self.record_action('resource_released', {'pid': process.pid, 'rid': rid, 'count': count})
+        self.locks[rid].release(count)
+
+    def _release_all(self, process):
+        for rid, count in list(process.held.items()):
+            self._release(process, rid, count)
+
+    def _watch(self):
+        """Watchdog: look for deadlocks in the live wait-for graph and break them"""
+        while not self.stop_event.wait(self.watch_interval):
+            with self.graph_lock:
+                self.stats['checks'] += 1
+                result = self.detector.detect_incremental(include_graph=False)
+                for deadlock in result['deadlocks']:
+                    members = [self.process_index[pid] for pid in deadlock['processes_involved']]
+                    if any(p.abort.is_set() for p in members):
+                        continue  # already being broken
+                    victim = min(members, key=lambda p: (p.priority, -p.pid))
+                    victim.abort.set()
+                    self.stats['deadlocks'] += 1
+                    self.deadlocks.append({'processes': sorted(p.pid for p in members),
+                                           'victim': victim.pid,
+                                           'at': time.perf_counter()})
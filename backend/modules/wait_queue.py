@@ -0,0 +1,231 @@
+import heapq
+import time
+from collections import deque
+
+class WaitStats:
+    """How long the processes woken from one queue waited (seconds)
+    
+    Totals cover every wakeup; percentiles come from the most recent `sample_size`.
+    """
+    
+    def __init__(self, sample_size=1024):
+        self.woken = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent = deque(maxlen=sample_size)
+    
+    def record(self, waited):
+        self.woken += 1
+        self.total_wait += waited
+        if waited > self.max_wait:
+            self.max_wait = waited
+        self.recent.append(waited)
+    
+    def percentile(self, q):
+        """q-th percentile (0-100) of the recent wait times, nearest rank"""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+    
+    def to_dict(self):
+        return {
+            "woken": self.woken,
+            "cancelled": self.cancelled,
+            "mean_wait": self.total_wait / self.woken if self.woken else 0.0,
+            "max_wait": self.max_wait,
+            "p50_wait": self.percentile(50),
+            "p95_wait": self.percentile(95),
+            "p99_wait": self.percentile(99)
+        }
+
+
+class WaitQueue:
+    """FIFO queue of distinct process ids with O(1) append, pop, membership and cancel
+    
+    Entries sit in a deque as (ticket, pid) and a dict maps each queued pid to its
+    current ticket. Cancelling only drops the dict entry; the stale deque entry is
+    skipped when it reaches the front (and the deque is compacted once stale entries
+    outnumber live ones), so a pid that cancels and re-queues goes to the back.
+    
+    This is the 'fifo' wakeup policy; subclasses only change how entries are ordered.
+    Every queue keeps WaitStats of the waits it ended, timed with `clock`.
+    """
+    policy = 'fifo'
+    
+    def __init__(self, items=(), clock=time.monotonic):
+        self.clock = clock
+        self.stats = WaitStats()
+        self._entries = self._empty()
+        self._tickets = {}
+        self._enqueued_at = {}
+        self._next_ticket = 0
+        self._stale = 0
+        for pid in items:
+            self.append(pid)
+    
+    # Ordering (overridden by the other policies); the last two fields of an entry are ticket, pid
+    def _empty(self):
+        return deque()
+    
+    def _entry(self, ticket, pid, priority, now):
+        return (ticket, pid)
+    
+    def _push(self, entry):
+        self._entries.append(entry)
+    
+    def _pop_entry(self):
+        return self._entries.popleft()
+    
+    def _in_order(self):
+        return self._entries
+    
+    def _rebuild(self, entries):
+        return deque(entries)
+    
+    # Queue operations
+    def append(self, pid, priority=0):
+        """Queue pid (priority is ignored by FIFO). Returns False if it is already waiting"""
+        if pid in self._tickets:
+            return False
+        self._next_ticket += 1
+        now = self.clock()
+        self._tickets[pid] = self._next_ticket
+        self._enqueued_at[pid] = now
+        self._push(self._entry(self._next_ticket, pid, priority, now))
+        return True
+    
+    def remove(self, pid):
+        """Cancel pid's wait. Returns False if it was not waiting"""
+        if self._discard(pid) is None:
+            return False
+        self.stats.cancelled += 1
+        return True
+    
+    def take(self, pid):
+        """End pid's wait because it was granted out of turn; counted as a wakeup, unlike remove"""
+        since = self._discard(pid)
+        if since is None:
+            return False
+        self.stats.record(self.clock() - since)
+        return True
+    
+    def _discard(self, pid):
+        """Drop pid's entry lazily and return when it was queued (None if it was not)"""
+        if self._tickets.pop(pid, None) is None:
+            return None
+        self._stale += 1
+        if self._stale > 32 and self._stale > len(self._tickets):
+            self._entries = self._rebuild(entry for entry in self._entries if self._live(entry))
+            self._stale = 0
+        return self._enqueued_at.pop(pid)
+    
+    def _live(self, entry):
+        return self._tickets.get(entry[-1]) == entry[-2]
+    
+    def _drop_stale_front(self):
+        entries = self._entries
+        while entries and not self._live(entries[0]):
+            self._pop_entry()
+            self._stale -= 1
+    
+    def popleft(self):
+        """Remove and return the pid the policy wakes next (IndexError if empty)"""
+        self._drop_stale_front()
+        pid = self._pop_entry()[-1]
+        del self._tickets[pid]
+        self.stats.record(self.clock() - self._enqueued_at.pop(pid))
+        return pid
+    
+    def peek(self):
+        """The pid the policy would wake next without removing it, or None"""
+        self._drop_stale_front()
+        return self._entries[0][-1] if self._entries else None
+    
+    def waiting_time(self, pid):
+        """Seconds pid has been queued so far (None if it is not waiting)"""
+        since = self._enqueued_at.get(pid)
+        return None if since is None else self.clock() - since
+    
+    def clear(self):
+        self._entries = self._empty()
+        self._tickets.clear()
+        self._enqueued_at.clear()
+        self._stale = 0
+    
+    def __contains__(self, pid):
+        return pid in self._tickets
+    
+    def __len__(self):
+        return len(self._tickets)
+    
+    def __iter__(self):
+        """Queued pids in wakeup order"""
+        tickets = self._tickets
+        return (entry[-1] for entry in self._in_order() if tickets.get(entry[-1]) == entry[-2])
+    
+    def __repr__(self):
+        return f"{type(self).__name__}({list(self)})"
+
+
+class PriorityWaitQueue(WaitQueue):
+    """Strict priority: the highest priority waiter is woken first, FIFO among equals
+    
+    Entries live in a binary heap keyed (-priority, ticket), so append and popleft are
+    O(log n); cancelling is still O(1) with the same lazy deletion as WaitQueue.
+    """
+    policy = 'priority'
+    
+    def _empty(self):
+        return []
+    
+    def _entry(self, ticket, pid, priority, now):
+        return (-priority, ticket, pid)
+    
+    def _push(self, entry):
+        heapq.heappush(self._entries, entry)
+    
+    def _pop_entry(self):
+        return heapq.heappop(self._entries)
+    
+    def _in_order(self):
+        return sorted(self._entries)
+    
+    def _rebuild(self, entries):
+        entries = list(entries)
+        heapq.heapify(entries)
+        return entries
+
+
+class AgingWaitQueue(PriorityWaitQueue):
+    """Priority plus aging_rate per second waited, so low priorities are not starved
+    
+    Every waiter ages at the same rate, so ranking by priority + aging_rate * waited is
+    ranking by priority - aging_rate * enqueue time: a key fixed at enqueue time, and
+    the heap needs no rekeying as time passes.
+    """
+    policy = 'aging'
+    
+    def __init__(self, items=(), clock=time.monotonic, aging_rate=1.0):
+        self.aging_rate = aging_rate
+        super().__init__(items, clock)
+    
+    def _entry(self, ticket, pid, priority, now):
+        return (self.aging_rate * now - priority, ticket, pid)
+
+
+# wakeup policy name -> queue class
+WAKEUP_POLICIES = {
+    'fifo': WaitQueue,
+    'priority': PriorityWaitQueue,
+    'aging': AgingWaitQueue
+}
+
+def create_wait_queue(policy='fifo', **options):
+    """Empty wait queue for a wakeup policy: a name from WAKEUP_POLICIES or a factory"""
+    if callable(policy):
+        return policy(**options)
+    if policy not in WAKEUP_POLICIES:
+        raise ValueError(f"unknown wakeup policy: {policy}")
+    return WAKEUP_POLICIES[policy](**options)
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from threading import RLock
+from modules.simulator import BankerContext, create_simulator
+from modules.journal import Journal
+from modules.state_feed import StateFeed
+from broadcast_scheduler import BroadcastScheduler
+
+class SimulationSession:
+    """Everything one user works on: simulator, state feed, broadcaster and Banker's context"""
+
+    def __init__(self, session_id, socketio, window, journal_dir=None, journal_options=None, backend='objects'):
+        self.session_id = session_id
+        # held by whoever mutates or reads the simulator (routes, socket handlers and the
+        # broadcast task through the state feed), which is not thread-safe on its own
+        self.lock = RLock()
+        self.sim = create_simulator(backend)
+        self.journal = None
+        if journal_dir:
+            # bring back whatever this session had before a restart or eviction
+            self.journal = Journal(os.path.join(journal_dir, journal_name(session_id)), **(journal_options or {}))
+            self.journal.replay(self.sim)
+            self.journal.attach(self.sim)
+        self.state_feed = StateFeed(self.sim, lock=self.lock)
+        # each session broadcasts to its own Socket.IO room, named after the session id
+        self.broadcaster = BroadcastScheduler(socketio, self.state_feed, window=window, room=session_id)
+        self.banker = BankerContext()
+        self.last_used = time.monotonic()
+        # entity count the pool last added to its total for this session, and the pool
+        # callback told when actions change it (set once the session is in the pool)
+        self.counted = 0
+        self.on_resize = None
+        self.sim.subscribe(self._resized)
+
+    def _resized(self, action_type, data):
+        if action_type in RESIZING_ACTIONS and self.on_resize is not None:
+            self.on_resize(self)
+
+    def size(self):
+        """Entity count used as the memory proxy for the pool's cap"""
+        return len(self.sim.processes) + len(self.sim.resources) + self.banker.size()
+
+    def close(self):
+        """Flush and stop the journal (if any); the session is being dropped from memory"""
+        if self.journal is not None:
+            self.journal.close()
+
+
+RESIZING_ACTIONS = ('process_created', 'resource_created', 'process_terminated', 'system_reset')
+
+
+def journal_name(session_id):
+    """Directory name for a session's journal (hashed unless it is already filesystem safe)"""
+    if re.fullmatch(r'[A-Za-z0-9_-]{1,64}', session_id):
+        return session_id
+    return hashlib.sha1(session_id.encode()).hexdigest()
+
+
+class SessionPool:
+    """Bounded LRU pool of per-session simulators
+
+    Sessions idle for longer than idle_ttl seconds are dropped, and the least recently
+    used ones are evicted while the pool holds more than max_sessions sessions or more
+    than max_entities simulated entities in total. The session being accessed is never
+    evicted by its own lookup. With a journal_dir every session journals its actions
+    there, so an evicted or pre-restart session is restored on its next lookup.
+    """
+
+    def __init__(self, socketio, window=0.03, max_sessions=256, idle_ttl=1800, max_entities=500000,
+                 journal_dir=None, journal_options=None, backend='objects'):
+        self.socketio = socketio
+        self.backend = backend
+        self.window = window
+        self.journal_dir = journal_dir
+        self.journal_options = journal_options
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_entities = max_entities
+        self.sessions = OrderedDict()
+        # re-entrant: a session created under the lock reports its size through _resized
+        self.lock = RLock()
+        self.evictions = 0
+        # sum of the sessions' counted sizes, kept current instead of re-summed per lookup
+        self.entities = 0
+
+    def get(self, session_id):
+        """Return the session for session_id, creating it on first use"""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = SimulationSession(session_id, self.socketio, self.window,
+                                            self.journal_dir, self.journal_options, self.backend)
+                self.sessions[session_id] = session
+                session.on_resize = self._resized
+            else:
+                self.sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            # O(1), and catches size changes no action reports (the Banker's context)
+            self._recount(session)
+            self._evict(keep=session_id)
+            return session
+
+    def peek(self, session_id):
+        """Return the session without creating it or refreshing its LRU position"""
+        with self.lock:
+            return self.sessions.get(session_id)
+
+    def discard(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+            if session is not None:
+                self.entities -= session.counted
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def close_all(self):
+        """Close every session (flushes their journals)"""
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+            self.entities = 0
+        for session in sessions:
+            session.close()
+
+    def _resized(self, session):
+        with self.lock:
+            if self.sessions.get(session.session_id) is session:
+                self._recount(session)
+
+    def _recount(self, session):
+        size = session.size()
+        self.entities += size - session.counted
+        session.counted = size
+
+    def _drop(self, session_id):
+        session = self.sessions.pop(session_id)
+        self.entities -= session.counted
+        session.close()
+        self.evictions += 1
+
+    def _evict(self, keep):
+        now = time.monotonic()
+        # the oldest sessions come first in LRU order, so the idle ones form a prefix
+        idle = []
+        for session_id, session in self.sessions.items():
+            if now - session.last_used <= self.idle_ttl:
+                break
+            if session_id != keep:
+                idle.append(session_id)
+        for session_id in idle:
+            self._drop(session_id)
+        while len(self.sessions) > 1 and (len(self.sessions) > self.max_sessions or self.entities > self.max_entities):
+            session_id = next(iter(self.sessions))
+            if session_id == keep:
+                break
+            self._drop(session_id)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'sessions': len(self.sessions),
+                'entities': self.entities,
+                'evictions': self.evictions,
+                'max_sessions': self.max_sessions,
+                'max_entities': self.max_entities,
+                'idle_ttl': self.idle_ttl,
+                'journal_dir': self.journal_dir,
+                'backend': self.backend
+            }
@@ -0,0 +1,69 @@
+import itertools
+
+import pytest
+
+from app import app, sessions
+
+session_ids = itertools.count()
+
+
+@pytest.fixture
+def client():
+    """Test client bound to a session of its own"""
+    client = app.test_client()
+    client.environ_base['HTTP_X_SESSION_ID'] = f"test-api-{next(session_ids)}"
+    return client
+
+
+def holder_of_units(client):
+    """P1 holding 2 of the 3 units of R1"""
+    client.post('/api/add_process', json={'name': 'P1'})
+    client.post('/api/add_resource', json={'name': 'R1', 'units': 3})
+    response = client.post('/api/request_resource', json={'process_id': 1, 'resource_id': 1, 'count': 2})
+    assert response.get_json()['status'] == 'success'
+
+
+@pytest.mark.parametrize('count', ["2", 0, -2, True, 1.5])
+def test_request_resource_rejects_bad_counts(client, count):
+    holder_of_units(client)
+    response = client.post('/api/request_resource', json={'process_id': 1, 'resource_id': 1, 'count': count})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('count', ["2", 0, -2, True, 1.5])
+def test_release_resource_rejects_bad_counts(client, count):
+    holder_of_units(client)
+    response = client.post('/api/release_resource', json={'process_id': 1, 'resource_id': 1, 'count': count})
+    assert response.status_code == 400
+    resource = client.get('/api/snapshot').get_json()['resources'][0]
+    assert resource['available_units'] == 1 and resource['holders'] == {'1': 2}
+
+
+def test_release_resource_returns_some_units(client):
+    holder_of_units(client)
+    response = client.post('/api/release_resource', json={'process_id': 1, 'resource_id': 1, 'count': 1})
+    assert response.get_json()['status'] == 'success'
+    assert client.get('/api/snapshot').get_json()['resources'][0]['available_units'] == 2
+
+
+@pytest.mark.parametrize('bad, error', [
+    ({'pid': 'P1', 'request': [1]}, "expected 2"),
+    ({'pid': 'P1', 'request': [1, 0, 0]}, "expected 2"),
+    ({'pid': 'P9', 'request': [1, 0]}, "unknown pid"),
+])
+def test_request_batch_refuses_the_whole_batch_for_a_bad_item(client, bad, error):
+    banker = sessions.get(client.environ_base['HTTP_X_SESSION_ID']).banker
+    before = banker.snapshot()
+    response = client.post('/api/request/batch', json={'requests': [{'pid': 'P0', 'request': [1, 0]}, bad]})
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['index'] == 1 and error in body['message']
+    # the valid first item was not admitted either
+    assert banker.snapshot() == before
+
+
+def test_request_batch_admits_valid_items(client):
+    response = client.post('/api/request/batch', json={'requests': [{'pid': 'P0', 'request': [1, 0]},
+                                                                    {'pid': 'P1', 'request': [0, 1]}]})
+    assert response.status_code == 200
+    assert [item['granted'] for item in response.get_json()['results']] == [True, True]
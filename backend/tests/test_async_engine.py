@@ -0,0 +1,34 @@
+import random
+
+from modules.async_engine import AsyncEngine, random_scenario
+from modules.semaphore import SemaphoreManager
+
+
+def inversion(units=1):
+    manager = SemaphoreManager(compact=True)
+    manager.create_semaphore(1, units=units)
+    manager.create_semaphore(2, units=units)
+    engine = AsyncEngine(manager, watch_interval=0.5)
+    engine.rng = random.Random(7)
+    first = engine.add_process("first", [('acquire', 1, units), ('hold', 1.0), ('acquire', 2, units),
+                                         ('release', 2, units), ('release', 1, units)], priority=2)
+    second = engine.add_process("second", [('acquire', 2, units), ('hold', 1.0), ('acquire', 1, units),
+                                           ('release', 1, units), ('release', 2, units)], priority=1)
+    return engine, first, second
+
+
+def test_lock_order_inversion_is_broken_once():
+    for units in (1, 2):
+        engine, first, second = inversion(units)
+        report = engine.run_sync()
+        assert report['deadlocks'] == 1 and report['restarts'] == 1
+        assert report['completed'] == 2 and report['aborted'] == 0 and not report['stalled']
+        assert report['deadlock_samples'][0] == {'processes': [first.pid, second.pid], 'victim': second.pid,
+                                                 'at': 1.5}
+        assert not any(semaphore.locked() for semaphore in engine.semaphores.values())
+
+
+def test_same_seed_gives_the_same_run():
+    reports = [random_scenario(processes=60, resources=8, spread=5.0, seed=11).run_sync() for _ in range(2)]
+    assert reports[0] == reports[1]
+    assert reports[0]['completed'] + reports[0]['aborted'] == 60
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from modules.simulator import create_simulator
+
+
+def action_script(seed, steps=150):
+    """Random requests, releases, terminations and snapshot round trips over 6 processes and 4 resources"""
+    rng = random.Random(seed)
+    script = [('add_process', f"P{k}", rng.randint(1, 5)) for k in range(6)]
+    script += [('add_resource', f"R{k}") for k in range(4)]
+    for _ in range(steps):
+        roll = rng.random()
+        pid, rid = rng.randint(1, 6), rng.randint(1, 4)
+        if roll < 0.5:
+            script.append(('request_resource', pid, rid))
+        elif roll < 0.9:
+            script.append(('release_resource', pid, rid))
+        elif roll < 0.95:
+            script.append(('terminate_process', pid))
+        else:
+            script.append(('reload',))
+    return script
+
+
+def play(backend, policy, script):
+    sim = create_simulator(backend, wakeup_policy=policy)
+    results = []
+    for name, *args in script:
+        if name == 'reload':
+            sim.load_state(sim.export_state())
+            continue
+        result = getattr(sim, name)(*args)
+        # the entity objects differ by backend, the outcome of an action must not
+        results.append(None if name.startswith('add_') else result)
+    state = sim.get_system_state()
+    del state['timestamp']
+    return results, state, sim.analyze_deadlocks(include_graph=False)['has_deadlock']
+
+
+@pytest.mark.parametrize('policy', ['fifo', 'priority'])
+@pytest.mark.parametrize('seed', range(20))
+def test_table_backend_matches_objects_backend(seed, policy):
+    script = action_script(seed)
+    assert play('table', policy, script) == play('objects', policy, script)
@@ -0,0 +1,153 @@
+import random
+
+import numpy as np
+import pytest
+
+from modules.banker import MatrixResourceManager, ResourceManager
+
+
+def random_config(rng, n=6, m=3):
+    total = [rng.randint(2, 8) for _ in range(m)]
+    pids = [f"P{k}" for k in range(n)]
+    max_claims = {pid: [rng.randint(0, units) for units in total] for pid in pids}
+    return total, pids, max_claims
+
+
+def random_stream(rng, pids, total, steps=200, terminations=0):
+    """Requests within each resource's total, with the odd checkpoint rollback and preemption
+    
+    terminations: how many processes are terminated as victims along the way
+    """
+    stream = []
+    victims = rng.sample(pids, terminations)
+    at = sorted(rng.sample(range(steps), terminations))
+    for k in range(steps):
+        if at and at[0] == k:
+            at.pop(0)
+            stream.append(('terminate', victims.pop()))
+            continue
+        roll = rng.random()
+        pid = rng.choice(pids)
+        if roll < 0.85:
+            stream.append(('request', pid, [rng.randint(0, max(1, units // 2)) for units in total]))
+        elif roll < 0.93:
+            stream.append(('rollback', pid))
+        else:
+            stream.append(('preempt', pid))
+    return stream
+
+
+def apply(manager, step):
+    """Run one stream step; returns what the step decided"""
+    action, pid, *args = step
+    if action == 'request':
+        return manager.request_resources(pid, *args)[0]
+    if action == 'rollback':
+        return manager.rollback_to_checkpoint(pid)
+    if action == 'terminate':
+        return manager.terminate_victim(pid)
+    return manager.preempt_resources(pid)
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_incremental_safety_check_matches_the_full_algorithm(seed):
+    rng = random.Random(seed)
+    total, pids, max_claims = random_config(rng)
+    incremental = ResourceManager(total, pids, max_claims, incremental=True)
+    full = ResourceManager(total, pids, max_claims, incremental=False)
+    for step in random_stream(rng, pids, total):
+        assert apply(incremental, step) == apply(full, step)
+        assert incremental.snapshot() == full.snapshot()
+        # whatever sequence the fast path kept must still be a safe one
+        if incremental._safe_seq is not None:
+            assert sorted(incremental._safe_seq) == sorted(pids)
+            work = list(incremental.available)
+            for pid in incremental._safe_seq:
+                assert all(need <= free for need, free in zip(incremental.need[pid], work))
+                work = [free + held for free, held in zip(work, incremental.allocation[pid])]
+    assert full.fast_path_hits == 0
+    assert incremental.full_safety_checks <= full.full_safety_checks
+
+
+def test_incremental_safety_check_takes_the_fast_path():
+    hits = 0
+    for seed in range(25):
+        rng = random.Random(seed)
+        total, pids, max_claims = random_config(rng)
+        manager = ResourceManager(total, pids, max_claims)
+        for step in random_stream(rng, pids, total):
+            apply(manager, step)
+        hits += manager.fast_path_hits
+    assert hits > 0
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_matrix_manager_matches_list_manager(seed):
+    rng = random.Random(seed)
+    total, pids, max_claims = random_config(rng)
+    matrix = MatrixResourceManager(total, pids, max_claims)
+    lists = ResourceManager(total, pids, max_claims)
+    for step in random_stream(rng, pids, total, terminations=3):
+        if step[1] not in lists.processes:
+            continue
+        assert apply(matrix, step) == apply(lists, step)
+        assert matrix.snapshot() == lists.snapshot()
+        assert sorted(matrix.processes) == sorted(lists.processes)
+        # terminate_victim moves the last row into the gap; every pid must still find its own row
+        assert {pid: matrix.row_pids[row] for pid, row in matrix.index.items()} == {pid: pid for pid in lists.processes}
+        assert matrix.is_safe_state()[0] == lists.is_safe_state()[0]
+        assert sorted(matrix.find_deadlocked()) == sorted(lists.find_deadlocked())
+
+
+def random_holdings(rng, pids, total):
+    """Random allocation within total, and random outstanding requests"""
+    available = list(total)
+    allocation, request = {}, {}
+    for pid in rng.sample(pids, len(pids)):
+        allocation[pid] = [rng.randint(0, free) if rng.random() < 0.6 else 0 for free in available]
+        available = [free - held for free, held in zip(available, allocation[pid])]
+        request[pid] = [rng.randint(0, units // 2 + 1) if rng.random() < 0.5 else 0 for units in total]
+    return available, allocation, request
+
+
+def finishable(available, allocation, request, rng):
+    """Processes that can finish, letting them go one at a time in random order"""
+    work = list(available)
+    left = set(allocation)
+    done = set()
+    while True:
+        runnable = [pid for pid in sorted(left) if all(r <= w for r, w in zip(request[pid], work))]
+        if not runnable:
+            return done
+        pid = rng.choice(runnable)
+        work = [w + a for w, a in zip(work, allocation[pid])]
+        left.remove(pid)
+        done.add(pid)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_find_deadlocked_returns_exactly_the_processes_that_cannot_finish(seed):
+    rng = random.Random(seed)
+    total, pids, max_claims = random_config(rng, n=8)
+    available, allocation, request = random_holdings(rng, pids, total)
+    # holding nothing, a process cannot block anybody and is never reported
+    expected = {pid for pid in pids if any(allocation[pid])} - finishable(available, allocation, request, rng)
+    for manager_class in (ResourceManager, MatrixResourceManager):
+        manager = manager_class(total, pids, {pid: list(total) for pid in pids})
+        manager.available = available if manager_class is ResourceManager else np.array(available)
+        for pid in pids:
+            manager.allocation[pid] = list(allocation[pid])
+            manager.request[pid] = list(request[pid])
+        assert set(manager.find_deadlocked()) == expected
+
+
+def test_find_deadlocked_reports_a_circular_wait():
+    manager = ResourceManager([1, 1], ['P0', 'P1', 'P2'], {'P0': [1, 1], 'P1': [1, 1], 'P2': [1, 1]})
+    # outside the Banker's algorithm, e.g. granted in 'direct' mode
+    manager.available = [0, 0]
+    manager.allocation['P0'] = [1, 0]
+    manager.allocation['P1'] = [0, 1]
+    manager.request['P0'] = [0, 1]
+    manager.request['P1'] = [1, 0]
+    manager.request['P2'] = [1, 1]
+    assert sorted(manager.find_deadlocked()) == ['P0', 'P1']
@@ -0,0 +1,35 @@
+import pytest
+
+from modules.resource import CountingResource
+from modules.simulator import SimuLockSimulator
+
+
+@pytest.mark.parametrize('count', [0, -2, "1", True])
+def test_counting_resource_release_rejects_non_positive_counts(count):
+    resource = CountingResource(1, "R", units=3)
+    resource.allocate(1, 2)
+    with pytest.raises(ValueError):
+        resource.release(1, count)
+    assert resource.free_units == 1 and resource.holders == {1: 2}
+
+
+@pytest.mark.parametrize('count', [0, -2])
+def test_release_resource_refuses_bad_counts_without_releasing(count):
+    sim = SimuLockSimulator()
+    process = sim.add_process("P")
+    resource = sim.add_resource("R", units=3)
+    sim.request_resource(process.pid, resource.rid, 2)
+    released = []
+    sim.subscribe(lambda action, data: released.append(data) if action == "resource_released" else None)
+    success, message = sim.release_resource(process.pid, resource.rid, count)
+    assert not success and "positive integer" in message
+    assert resource.free_units == 1 and process.state == "running" and not released
+
+
+def test_release_resource_caps_the_count_at_the_units_held():
+    sim = SimuLockSimulator()
+    process = sim.add_process("P")
+    resource = sim.add_resource("R", units=3)
+    sim.request_resource(process.pid, resource.rid, 2)
+    assert sim.release_resource(process.pid, resource.rid, 5) == (True, "2 unit(s) of R released by P")
+    assert resource.free_units == 3 and resource.rid not in process.allocated_resources
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from modules.deadlock_detector import DeadlockDetector
+from modules.simulator import SimuLockSimulator
+
+
+def random_steps(sim, rng, steps, processes=8, resources=6):
+    """Yield after each random request, release or termination on sim"""
+    for _ in range(steps):
+        roll = rng.random()
+        pid, rid = rng.randint(1, processes), rng.randint(1, resources)
+        if roll < 0.6:
+            units = sim.resource_index[rid].units
+            sim.request_resource(pid, rid, rng.randint(1, units))
+        elif roll < 0.95:
+            sim.release_resource(pid, rid)
+        else:
+            sim.terminate_process(pid)
+        yield
+
+
+def build(rng, processes=8, resources=6, max_units=1):
+    sim = SimuLockSimulator()
+    for k in range(processes):
+        sim.add_process(f"P{k}")
+    for k in range(resources):
+        sim.add_resource(f"R{k}", units=rng.randint(1, max_units))
+    return sim
+
+
+def deadlocked_sets(result):
+    return sorted(sorted(deadlock['processes_involved']) for deadlock in result['deadlocks'])
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_scc_detection_matches_cycle_enumeration(seed):
+    rng = random.Random(seed)
+    sim = build(rng)
+    detector = DeadlockDetector()
+    for _ in random_steps(sim, rng, 60):
+        components = detector.detect_deadlocks(sim.processes, sim.resources, mode='scc')
+        cycles = detector.detect_deadlocks(sim.processes, sim.resources, mode='cycles')
+        assert components['has_deadlock'] == cycles['has_deadlock']
+        # every deadlock cycle lies inside exactly one component, and together they cover it
+        covered = {tuple(component): set() for component in deadlocked_sets(components)}
+        for cycle in cycles['deadlocks']:
+            owners = [component for component in covered if set(cycle['processes_involved']) <= set(component)]
+            assert len(owners) == 1
+            covered[owners[0]].update(cycle['processes_involved'])
+        assert all(set(component) == seen for component, seen in covered.items())
+
+
+@pytest.mark.parametrize('max_units', [1, 3])
+@pytest.mark.parametrize('seed', range(20))
+def test_incremental_detection_matches_a_full_rebuild(seed, max_units):
+    rng = random.Random(seed)
+    sim = build(rng, max_units=max_units)
+    for step, _ in enumerate(random_steps(sim, rng, 80)):
+        if step % 25 == 24:
+            # a snapshot round trip resets the graph and replays it as events
+            sim.load_state(sim.export_state())
+        incremental = sim.analyze_deadlocks(include_graph=False)
+        full = DeadlockDetector().detect_deadlocks(sim.processes, sim.resources)
+        assert deadlocked_sets(incremental) == deadlocked_sets(full)
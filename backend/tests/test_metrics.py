@@ -0,0 +1,50 @@
+from app import app
+from modules.metrics import Registry, registry
+
+
+def test_render_prometheus_text():
+    metrics = Registry()
+    requests = metrics.counter('requests_total', "Requests", ('route',))
+    latency = metrics.histogram('latency_seconds', "Latency", buckets=(0.1, 1.0))
+    metrics.gauge('sessions', "Sessions", lambda: 3)
+    metrics.gauge('queue_length', "Queued", lambda: {(('queue', 'a"b'),): 2})
+    requests.inc('/x')
+    requests.inc('/x', amount=2)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5.0)
+    assert metrics.render() == '\n'.join([
+        '# HELP requests_total Requests',
+        '# TYPE requests_total counter',
+        'requests_total{route="/x"} 3',
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1.0"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        'latency_seconds_sum 5.55',
+        'latency_seconds_count 3',
+        '# HELP sessions Sessions',
+        '# TYPE sessions gauge',
+        'sessions 3',
+        '# HELP queue_length Queued',
+        '# TYPE queue_length gauge',
+        'queue_length{queue="a\\"b"} 2',
+    ]) + '\n'
+
+
+def test_metrics_route_turns_collection_on():
+    enabled = registry.enabled
+    client = app.test_client()
+    try:
+        registry.enabled = False
+        first = client.get('/metrics')
+        assert first.status_code == 200 and first.mimetype == 'text/plain'
+        assert registry.enabled
+        client.get('/api/sessions')
+        body = client.get('/metrics').get_data(as_text=True)
+        assert '# TYPE simulock_http_request_duration_seconds histogram' in body
+        assert 'simulock_http_request_duration_seconds_count{route="/api/sessions",method="GET",status="200"}' in body
+        assert '# TYPE simulock_sessions gauge' in body
+    finally:
+        registry.enabled = enabled
@@ -0,0 +1,29 @@
+from modules.online_detector import OnlineDeadlockDetector
+from modules.simulator import SimuLockSimulator
+
+
+def test_waiting_on_own_resource_is_not_a_cycle():
+    detector = OnlineDeadlockDetector()
+    assert detector.allocate(3, 4) is None
+    assert detector.request(3, 4, reject=True) is None
+    assert not detector.has_deadlock()
+
+
+def test_two_process_cycle_is_still_found():
+    detector = OnlineDeadlockDetector()
+    detector.allocate(1, 1)
+    detector.allocate(2, 2)
+    assert detector.request(1, 2) is None
+    assert detector.request(2, 1) is not None
+    assert detector.has_deadlock()
+
+
+def test_rerequest_of_held_resource_is_refused_not_a_deadlock():
+    sim = SimuLockSimulator(deadlock_policy='reject')
+    process = sim.add_process("P")
+    resource = sim.add_resource("R")
+    assert sim.request_resource(process.pid, resource.rid)[0]
+    granted, message = sim.request_resource(process.pid, resource.rid)
+    assert not granted and "already holds" in message
+    assert process.state == "running"
+    assert not sim.analyze_deadlocks(include_graph=False)['has_deadlock']
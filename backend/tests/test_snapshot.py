@@ -0,0 +1,45 @@
+from modules.journal import Journal
+from modules.simulator import SimuLockSimulator
+
+
+def build():
+    sim = SimuLockSimulator()
+    sim.add_process("low", priority=1)
+    sim.add_process("high", priority=7)
+    sim.add_resource("R")
+    return sim
+
+
+def priorities(sim):
+    return {p.pid: p.priority for p in sim.processes}
+
+
+def test_export_load_keeps_priority():
+    sim = build()
+    restored = SimuLockSimulator()
+    restored.load_state(sim.export_state())
+    assert priorities(restored) == {1: 1, 2: 7}
+
+
+def test_load_state_accepts_snapshots_without_priority():
+    state = build().export_state()
+    state["processes"] = [record[:5] for record in state["processes"]]
+    restored = SimuLockSimulator()
+    restored.load_state(state)
+    assert priorities(restored) == {1: 1, 2: 1}
+
+
+def test_journal_snapshot_replay_keeps_priority(tmp_path):
+    journal = Journal(str(tmp_path / "session"), snapshot_every=1, fsync=False)
+    sim = SimuLockSimulator()
+    journal.attach(sim)
+    sim.add_process("low", priority=1)
+    sim.add_process("high", priority=7)
+    sim.add_resource("R")
+    journal.close()
+    journal = Journal(str(tmp_path / "session"), fsync=False)
+    restored = SimuLockSimulator()
+    journal.replay(restored)
+    journal.close()
+    assert journal.snapshot_seq > 0
+    assert priorities(restored) == {1: 1, 2: 7}
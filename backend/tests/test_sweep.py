@@ -0,0 +1,27 @@
+import pytest
+
+from modules.sweep import MonteCarloSweep, expand_grid
+
+GRID = {'processes': 8, 'resources': 3, 'prevention': ['none', 'ordering'], 'horizon': 300.0}
+
+
+def results(workers):
+    sweep = MonteCarloSweep(GRID, trials=12, seed=42, workers=workers, chunk_size=5)
+    return sweep.run()['results']
+
+
+def test_equal_seeds_give_equal_results_whatever_the_worker_count():
+    serial = results(workers=1)
+    assert serial == results(workers=2)
+    none, ordering = serial
+    assert none['trials'] == ordering['trials'] == 12
+    assert none['deadlock_probability'] > 0
+    # requesting in rid order rules out circular waits
+    assert ordering['deadlock_probability'] == 0
+
+
+def test_expand_grid_rejects_unknown_parameters():
+    with pytest.raises(ValueError):
+        expand_grid({'threads': [1, 2]})
+    with pytest.raises(ValueError):
+        expand_grid({'prevention': 'pray'})
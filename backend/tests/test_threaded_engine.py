@@ -0,0 +1,21 @@
+from modules.semaphore import SemaphoreManager
+from modules.threaded_engine import ThreadedEngine
+
+
+def test_lock_order_inversion_is_broken_once():
+    manager = SemaphoreManager()
+    manager.create_semaphore(1)
+    manager.create_semaphore(2)
+    engine = ThreadedEngine(manager, restart_backoff=0.05)
+    # each takes one lock and holds it long enough for the other to take the second
+    first = engine.add_process("first", [('acquire', 1), ('hold', 0.1), ('acquire', 2),
+                                         ('release', 2), ('release', 1)], priority=2)
+    second = engine.add_process("second", [('acquire', 2), ('hold', 0.1), ('acquire', 1),
+                                           ('release', 1), ('release', 2)], priority=1)
+    report = engine.run(timeout=10)
+    assert report['deadlocks'] == 1 and report['restarts'] == 1
+    assert report['completed'] == 2 and report['aborted'] == 0
+    assert report['deadlock_samples'][0]['processes'] == [first.pid, second.pid]
+    assert report['deadlock_samples'][0]['victim'] == second.pid
+    assert (first.restarts, second.restarts) == (0, 1)
+    assert all(lock.acquire(timeout=0) for lock in engine.locks.values())
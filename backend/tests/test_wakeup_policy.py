@@ -0,0 +1,106 @@
+import pytest
+
+from modules.journal import Journal
+from modules.simulator import SimuLockSimulator, create_simulator
+
+backends = pytest.mark.parametrize('backend', ['objects', 'table'])
+
+
+def contended(policy, units=1, backend='objects'):
+    """One holder and three waiters of increasing priority on one resource"""
+    sim = create_simulator(backend, wakeup_policy=policy)
+    holder = sim.add_process("holder")
+    waiters = [sim.add_process(f"W{k}", priority=k) for k in (1, 5, 3)]
+    resource = sim.add_resource("R", units=units)
+    assert sim.request_resource(holder.pid, resource.rid, units)[0]
+    for process in waiters:
+        assert not sim.request_resource(process.pid, resource.rid, units)[0]
+    return sim, holder, waiters, resource
+
+
+def grant_order(sim, resource, units=1):
+    order = []
+    while True:
+        holder = next((p for p in sim.processes if resource.rid in p.allocated_resources), None)
+        if holder is None:
+            return order
+        order.append(holder.name)
+        sim.release_resource(holder.pid, resource.rid)
+
+
+@backends
+def test_priority_policy_hands_the_resource_to_the_highest_priority_waiter(backend):
+    sim, holder, waiters, resource = contended('priority', backend=backend)
+    assert grant_order(sim, resource) == ["holder", "W5", "W3", "W1"]
+    assert all(p.state == "ready" for p in waiters)
+    stats = sim.get_wait_statistics()["resources"][resource.rid]
+    assert stats["woken"] == 3 and stats["max_wait"] > 0
+
+
+@backends
+def test_fifo_policy_hands_over_in_arrival_order(backend):
+    sim, holder, waiters, resource = contended('fifo', backend=backend)
+    assert grant_order(sim, resource) == ["holder", "W1", "W5", "W3"]
+
+
+def test_handoff_for_multi_unit_resources_in_strict_order():
+    sim, holder, waiters, resource = contended('priority', units=2)
+    assert grant_order(sim, resource) == ["holder", "W5", "W3", "W1"]
+    assert sim.get_wait_statistics()["resources"][resource.rid]["woken"] == 3
+
+
+def test_free_resource_does_not_go_past_queued_waiters():
+    sim, holder, waiters, resource = contended('priority', units=2)
+    sim.release_resource(holder.pid, resource.rid, 1)
+    # one unit is free, but W5 (next in line) needs two
+    late = sim.add_process("late", priority=9)
+    assert not sim.request_resource(late.pid, resource.rid, 1)[0]
+    assert resource.free_units == 1
+
+
+@backends
+def test_released_resource_goes_to_the_waiter_not_to_a_newcomer(backend):
+    sim, holder, waiters, resource = contended('fifo', backend=backend)
+    sim.release_resource(holder.pid, resource.rid)
+    assert waiters[0].state == "running" and resource.held_by == waiters[0].pid
+    assert not sim.request_resource(holder.pid, resource.rid)[0]
+    assert sim.request_resource(waiters[1].pid, resource.rid)[1].endswith("already waiting for R")
+
+
+def test_handoff_updates_state_and_detectors():
+    sim, holder, waiters, resource = contended('priority')
+    sim.release_resource(holder.pid, resource.rid)
+    top = waiters[1]
+    assert top.state == "running" and resource.held_by == top.pid
+    graph = sim.deadlock_detector.wait_for_graph
+    assert graph.has_edge(f"R{resource.rid}", f"P{top.pid}")
+    assert not graph.has_edge(f"P{top.pid}", f"R{resource.rid}")
+    assert f"P{top.pid}" in sim.online_detector.succ.get(f"R{resource.rid}", ())
+
+
+@backends
+def test_terminating_a_waiter_withdraws_it_from_the_queue(backend):
+    sim, holder, waiters, resource = contended('priority', backend=backend)
+    sim.terminate_process(waiters[1].pid)
+    assert grant_order(sim, resource) == ["holder", "W3", "W1"]
+
+
+def test_journal_replay_reproduces_handoffs(tmp_path):
+    journal = Journal(str(tmp_path / "session"), fsync=False)
+    sim = SimuLockSimulator(wakeup_policy='priority')
+    journal.attach(sim)
+    holder = sim.add_process("holder")
+    low = sim.add_process("low", priority=1)
+    high = sim.add_process("high", priority=5)
+    resource = sim.add_resource("R", units=2)
+    sim.request_resource(holder.pid, resource.rid, 2)
+    sim.request_resource(low.pid, resource.rid, 1)
+    sim.request_resource(high.pid, resource.rid, 2)
+    sim.release_resource(holder.pid, resource.rid)
+    journal.close()
+    restored = SimuLockSimulator(wakeup_policy='priority')
+    journal = Journal(str(tmp_path / "session"), fsync=False)
+    journal.replay(restored)
+    journal.close()
+    assert restored.resource_index[resource.rid].holders == {high.pid: 2}
+    assert list(restored.resource_index[resource.rid].waiting_queue) == [low.pid]
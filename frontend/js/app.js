@@ -1,5 +1,18 @@
+// Per-tab simulator session: the server keeps one simulator per session id
+const SESSION_ID = sessionStorage.getItem('simulockSession') ||
+    (crypto.randomUUID ? crypto.randomUUID() : String(Date.now()) + Math.random().toString(16).slice(2));
+sessionStorage.setItem('simulockSession', SESSION_ID);
+
+const nativeFetch = window.fetch.bind(window);
+window.fetch = (url, options = {}) => {
+    if (typeof url === 'string' && url.startsWith('/api/')) {
+        options = { ...options, headers: { ...(options.headers || {}), 'X-Session-Id': SESSION_ID } };
+    }
+    return nativeFetch(url, options);
+};
+
 // Socket.IO connection
-const socket = io('http://localhost:5004');
+const socket = io('http://localhost:5004', { query: { session: SESSION_ID } });
 
 // Global state
 let systemState = {
@@ -29,16 +42,56 @@ socket.on('disconnect', () => {
     addLog('❌ Disconnected from simulator', 'error');
 });
 
-// System updates
+// System updates: a full snapshot on connect, then versioned deltas
 socket.on('system_update', (data) => {
     systemState = data;
     updateUI();
 });
 
+socket.on('system_delta', (delta) => {
+    if (delta.base_seq !== systemState.seq) {
+        // missed an update: ask the server for what we lack
+        socket.emit('resync', { seq: systemState.seq });
+        return;
+    }
+    applyDelta(delta);
+    updateUI();
+});
+
+function mergeById(items, changed, key) {
+    const index = new Map(items.map((item, i) => [item[key], i]));
+    changed.forEach(item => {
+        if (index.has(item[key])) {
+            items[index.get(item[key])] = item;
+        } else {
+            index.set(item[key], items.length);
+            items.push(item);
+        }
+    });
+    return items;
+}
+
+function applyDelta(delta) {
+    if (delta.full) {
+        systemState.processes = delta.processes;
+        systemState.resources = delta.resources;
+    } else {
+        mergeById(systemState.processes, delta.processes, 'pid');
+        mergeById(systemState.resources, delta.resources, 'rid');
+    }
+    systemState.seq = delta.seq;
+    systemState.timestamp = delta.timestamp;
+}
+
 socket.on('log_message', (data) => {
     addLog(data.message, data.type || 'info');
 });
 
+// Coalesced log lines from one broadcast window
+socket.on('log_messages', (batch) => {
+    batch.forEach(data => addLog(data.message, data.type || 'info'));
+});
+
 socket.on('deadlock_detected', (data) => {
     showDeadlockAlert(data);
     if (data.has_deadlock) {